@@ -0,0 +1,90 @@
+"""Shrink the data column of existing rows for DATA_COLUMN_MODE=lean.
+
+Usage:
+    python -m api.compact            # strip typed columns out of every data copy
+    python -m api.compact --full     # ...then rewrite the tables to release space
+    python -m api.compact --sizes    # only report table, index and data sizes
+
+Rows are rewritten in batches of ``--batch-size`` ids, each committed on its
+own, and every table is vacuumed afterwards so the freed space is reused.
+A plain vacuum leaves the table files at their size (rewriting every row can
+even grow them), so the saving shows in the data column size. ``--full``
+runs VACUUM FULL instead, which shrinks the files but locks each table
+against reads and writes while it is rewritten.
+"""
+
+import argparse
+import asyncio
+import logging
+
+from api.db import backend, base
+
+logger = logging.getLogger(__name__)
+
+# Looked up when called, so DB_BACKEND picks the database to compact
+REPOSITORIES = (
+    backend.user_repository,
+    backend.book_repository,
+    backend.review_repository,
+)
+
+
+async def log_sizes() -> None:
+    for repository in REPOSITORIES:
+        async with repository() as db:
+            sizes = await db.relation_sizes()
+            logger.info(
+                "%s: table %.1f MiB, indexes %.1f MiB, data column %.1f MiB",
+                db.table,
+                sizes["table"] / 2**20,
+                sizes["indexes"] / 2**20,
+                sizes["data"] / 2**20,
+            )
+
+
+async def compact(
+    batch_size: int, sizes_only: bool = False, full: bool = False
+) -> None:
+    await backend.open_database()
+    try:
+        await log_sizes()
+        if sizes_only:
+            return
+
+        for repository in REPOSITORIES:
+            async with repository() as db:
+                compacted = await db.compact_data(batch_size)
+                await db.vacuum(full=full)
+                logger.info("%s: compacted %s rows", db.table, compacted)
+
+        await log_sizes()
+    finally:
+        await backend.close_database()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", action="store_true", help="report sizes without rewriting rows"
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="VACUUM FULL afterwards; locks each table while it is rewritten",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=1000, help="rows rewritten per transaction"
+    )
+    args = parser.parse_args()
+
+    # In full mode new writes would keep storing complete copies, and readers
+    # of the data column may still expect them
+    if not args.sizes and base.DATA_COLUMN_MODE != "lean":
+        parser.error("set DATA_COLUMN_MODE=lean before compacting the data column")
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    asyncio.run(compact(args.batch_size, sizes_only=args.sizes, full=args.full))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""The repositories handed to services, by the ``DB_BACKEND`` setting.
+
+Services only call repository methods, so any backend's classes can be
+passed to them. Code that opens a repository for a request or a background
+job goes through these functions rather than naming a class.
+"""
+
+from api.db import pool, sqlite
+from api.db.books import BookRepository
+from api.db.leaderboards import LeaderboardRepository
+from api.db.memory import (
+    MemoryBookRepository,
+    MemoryLeaderboardRepository,
+    MemoryReviewRepository,
+    MemoryUserRepository,
+)
+from api.db.pool import DB_BACKEND
+from api.db.reviews import ReviewRepository
+from api.db.sqlite import (
+    SqliteBookRepository,
+    SqliteLeaderboardRepository,
+    SqliteReviewRepository,
+    SqliteUserRepository,
+)
+from api.db.users import UserRepository
+
+
+async def open_database() -> None:
+    """Open the connections the backend needs; called on startup."""
+    if DB_BACKEND == "postgres":
+        await pool.init_pool()
+    elif DB_BACKEND == "sqlite":
+        await sqlite.init_db()
+
+
+async def close_database() -> None:
+    await pool.close_pool()
+    await sqlite.close_db()
+
+
+def book_repository() -> BookRepository:
+    if DB_BACKEND == "memory":
+        return MemoryBookRepository()
+    if DB_BACKEND == "sqlite":
+        return SqliteBookRepository()
+
+    return BookRepository()
+
+
+def user_repository() -> UserRepository:
+    if DB_BACKEND == "memory":
+        return MemoryUserRepository()
+    if DB_BACKEND == "sqlite":
+        return SqliteUserRepository()
+
+    return UserRepository()
+
+
+def review_repository() -> ReviewRepository:
+    if DB_BACKEND == "memory":
+        return MemoryReviewRepository()
+    if DB_BACKEND == "sqlite":
+        return SqliteReviewRepository()
+
+    return ReviewRepository()
+
+
+def leaderboard_repository() -> LeaderboardRepository:
+    if DB_BACKEND == "memory":
+        return MemoryLeaderboardRepository()
+    if DB_BACKEND == "sqlite":
+        return SqliteLeaderboardRepository()
+
+    return LeaderboardRepository()
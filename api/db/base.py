@@ -0,0 +1,264 @@
+import functools
+import inspect
+import json
+import os
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from api.db.pool import InstrumentedPool, get_pool, get_replica_pools
+from api.db.replicas import replica_router
+from api.metrics import METRICS_ENABLED, db_errors, db_latency
+from api.tracing import QueryTiming, query_timing, record_query, tracer
+
+# "full" stores a JSON copy of every record in the data column, "lean" only
+# the attributes that have no typed column of their own
+DATA_COLUMN_MODE = os.getenv("DATA_COLUMN_MODE", "full").lower()
+if DATA_COLUMN_MODE not in ("full", "lean"):
+    raise ValueError("DATA_COLUMN_MODE must be 'full' or 'lean'")
+
+# Read-only methods, routed to a replica when there are any, and the
+# methods after which the primary's WAL position is handed to the client
+READ_PREFIX = "get_"
+WRITE_PREFIXES = ("create_", "update_", "delete_", "rebuild_")
+
+# The replica chosen for the get_* call in progress
+routed_pool: ContextVar[Optional[InstrumentedPool]] = ContextVar(
+    "routed_pool", default=None
+)
+
+
+def _row_count(result: Any) -> Optional[int]:
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, int) and not isinstance(result, bool):
+        return result
+    return 1 if result else 0
+
+
+def _timed(repository: str, name: str, method):
+    labels = (repository, name)
+    query = f"{repository}.{name}"
+
+    @functools.wraps(method)
+    async def timed(*args, **kwargs):
+        timing = QueryTiming()
+        token = query_timing.set(timing)
+        started = time.perf_counter()
+        result = None
+        with tracer.span(query) as span:
+            try:
+                result = await method(*args, **kwargs)
+                return result
+            except Exception:
+                if METRICS_ENABLED:
+                    db_errors.inc(labels)
+                raise
+            finally:
+                query_timing.reset(token)
+                duration = time.perf_counter() - started
+                if METRICS_ENABLED:
+                    db_latency.observe(labels, duration)
+                record_query(
+                    query,
+                    duration * 1000,
+                    timing.acquire_ms,
+                    _row_count(result),
+                    span,
+                )
+
+    return timed
+
+
+def _routed(method):
+    @functools.wraps(method)
+    async def routed(self, *args, **kwargs):
+        primary = getattr(self, "_primary", None)
+        if primary is None or not get_replica_pools():
+            return await method(self, *args, **kwargs)
+
+        token = routed_pool.set(await replica_router.read_pool(primary))
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            routed_pool.reset(token)
+
+    return routed
+
+
+def _recorded(method):
+    @functools.wraps(method)
+    async def recorded(self, *args, **kwargs):
+        result = await method(self, *args, **kwargs)
+        primary = getattr(self, "_primary", None)
+        if primary is not None:
+            await replica_router.record_write(primary)
+
+        return result
+
+    return recorded
+
+
+class PostgresDb:
+    """Base class of the per-entity repositories.
+
+    Each repository lists its SQL in ``statements`` under a stable name and
+    runs it through the helpers below. asyncpg caches prepared statements per
+    connection, keyed by query text, so keeping the text fixed means each
+    statement is parsed and planned once per pooled connection and reused by
+    every request after that. Statements select the columns the API returns
+    rather than ``*``, which keeps the ``data`` JSONB copy of each row off
+    the wire.
+    """
+
+    table: str
+    # Keys stored in typed columns, left out of data in lean mode
+    fields: Tuple[str, ...] = ()
+    statements: Mapping[str, str] = {}
+    lean_data: bool = DATA_COLUMN_MODE == "lean"
+
+    def __init_subclass__(cls, **kwargs):
+        """Time each public coroutine a repository defines, by method name.
+
+        Each call feeds the query histogram, a tracing span and the slow-query
+        log, with the wait for a connection told apart from the rest. Streaming
+        methods (async generators) are left alone; their duration is that of
+        the whole export. So are overrides of the helpers defined here, which
+        other backends reimplement and which already run inside a timed call.
+
+        ``get_*`` methods run against the replica picked for them, which
+        ``pool`` returns for the duration of the call; writes note the WAL
+        position the client needs to read them back.
+        """
+        super().__init_subclass__(**kwargs)
+        for name, attr in list(vars(cls).items()):
+            if (
+                not name.startswith("_")
+                and not hasattr(PostgresDb, name)
+                and inspect.iscoroutinefunction(attr)
+            ):
+                if name.startswith(READ_PREFIX):
+                    attr = _routed(attr)
+                elif name.startswith(WRITE_PREFIXES):
+                    attr = _recorded(attr)
+                setattr(cls, name, _timed(cls.__name__, name, attr))
+
+    @property
+    def pool(self) -> InstrumentedPool:
+        return routed_pool.get() or self._primary
+
+    @pool.setter
+    def pool(self, pool: InstrumentedPool) -> None:
+        self._primary = pool
+
+    @staticmethod
+    def datetime_serialize(obj):
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        raise TypeError(f"Type {type(obj)} is not serializable")
+
+    def data_json(self, record: Dict[str, Any]) -> str:
+        """Serialize the part of ``record`` that goes into the data column."""
+        if self.lean_data:
+            record = {
+                key: value for key, value in record.items() if key not in self.fields
+            }
+
+        return json.dumps(record, default=PostgresDb.datetime_serialize)
+
+    async def __aenter__(self):
+        self.pool = get_pool()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # The pool is shared across requests and closed on application shutdown
+        pass
+
+    async def fetch(self, statement: str, *args: Any) -> List[Dict[str, Any]]:
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(self.statements[statement], *args)
+
+        return [dict(row) for row in rows]
+
+    async def fetchrow(self, statement: str, *args: Any) -> Optional[Dict[str, Any]]:
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(self.statements[statement], *args)
+
+        return dict(row) if row else None
+
+    async def fetchval(self, statement: str, *args: Any) -> Any:
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval(self.statements[statement], *args)
+
+    async def execute(self, statement: str, *args: Any) -> int:
+        """Run a write statement, returning the number of rows it affected."""
+        async with self.pool.acquire() as conn:
+            status = await conn.execute(self.statements[statement], *args)
+
+        return int(status.split()[-1])
+
+    async def compact_data(self, batch_size: int = 1000) -> int:
+        """Strip the typed columns out of existing data copies, in id order.
+
+        Each batch commits on its own so the table is never locked for the
+        whole rewrite. Returns the number of rows rewritten.
+        """
+        keys = list(self.fields)
+        compacted = 0
+        after = ""
+        async with self.pool.acquire() as conn:
+            while True:
+                rows = await conn.fetch(
+                    f"SELECT id FROM {self.table} WHERE id > $1 ORDER BY id LIMIT $2",
+                    after,
+                    batch_size,
+                )
+                if not rows:
+                    return compacted
+
+                ids = [row["id"] for row in rows]
+                status = await conn.execute(
+                    f"""
+                    UPDATE {self.table}
+                    SET data = data - $2::text[]
+                    WHERE id = ANY($1::varchar[]) AND data ?| $2::text[]
+                    """,
+                    ids,
+                    keys,
+                )
+                compacted += int(status.split()[-1])
+                after = ids[-1]
+
+    async def vacuum(self, full: bool = False) -> None:
+        """Make the space of dead rows reusable and refresh planner statistics.
+
+        A plain vacuum keeps the table file at its size. ``full`` rewrites the
+        table and its indexes into new files, returning the space to the
+        operating system, but holds an ACCESS EXCLUSIVE lock that blocks
+        reads and writes of the table until it is done.
+        """
+        options = "FULL, ANALYZE" if full else "ANALYZE"
+        async with self.pool.acquire() as conn:
+            await conn.execute(f"VACUUM ({options}) {self.table}")
+
+    async def relation_sizes(self) -> Dict[str, int]:
+        """Bytes used by the table (with TOAST), its indexes and its data values.
+
+        ``data`` sums the stored size of every live row's data column, so it
+        shrinks as soon as rows are compacted, while the table only does
+        after a full vacuum.
+        """
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(
+                f"""
+                SELECT
+                    pg_table_size($1::regclass) AS table,
+                    pg_indexes_size($1::regclass) AS indexes,
+                    (SELECT coalesce(sum(pg_column_size(data)), 0) FROM {self.table})
+                        AS data
+                """,
+                self.table,
+            )
+
+        return dict(row)
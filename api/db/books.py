@@ -1,131 +1,223 @@
-import json
-import os
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional
 from uuid import uuid4
 
-import asyncpg
-from dotenv import load_dotenv
-
-load_dotenv()
-
-DATABASE_URL = os.getenv("POSTGRES_URL")
-if not DATABASE_URL:
-    raise ValueError(
-        "Database string connection not found. Please include it in the '.env' file"
-    )
+from api.db.base import PostgresDb
+from api.db.pagination import DEFAULT_PAGE_SIZE, Keyset
+from api.db.updates import build_set_clause
+
+EXPORT_BATCH_SIZE = 1000
+
+UPDATABLE_COLUMNS = ("title", "author", "isbn", "updated_at")
+
+BOOK_FIELDS = ("id", "title", "author", "isbn", "created_at", "updated_at")
+BOOK_COLUMNS = ", ".join(BOOK_FIELDS)
+
+
+class BookRepository(PostgresDb):
+    table = "books"
+    fields = BOOK_FIELDS
+    statements = {
+        "create_book": """
+            INSERT INTO books(id, title, author, isbn, data, created_at, updated_at)
+            VALUES ($1, $2, $3, $4, $5, $6, $7)
+        """,
+        "get_book": f"""
+            SELECT {BOOK_COLUMNS} FROM books WHERE id = $1
+        """,
+        "get_books": f"""
+            SELECT {BOOK_COLUMNS} FROM books
+            ORDER BY created_at, id
+            LIMIT $1
+        """,
+        "get_books_after": f"""
+            SELECT {BOOK_COLUMNS} FROM books
+            WHERE (created_at, id) > ($1, $2)
+            ORDER BY created_at, id
+            LIMIT $3
+        """,
+        "iter_books": f"""
+            SELECT {BOOK_COLUMNS} FROM books
+            ORDER BY created_at, id
+        """,
+        "iter_books_since": f"""
+            SELECT {BOOK_COLUMNS} FROM books
+            WHERE created_at >= $1
+            ORDER BY created_at, id
+        """,
+        "iter_book_titles": """
+            SELECT id, title, author FROM books
+        """,
+        # word_similarity scores how well the text matches part of the column,
+        # which suits partially typed input; <% is served by the trigram indexes
+        "find_similar_books": """
+            SELECT
+                id,
+                title,
+                author,
+                GREATEST(word_similarity($1, title), word_similarity($1, author)) AS score
+            FROM books
+            WHERE $1 <% title OR $1 <% author
+            ORDER BY score DESC, id
+            LIMIT $2
+        """,
+        "get_book_stats": """
+            SELECT
+                b.id AS book_id,
+                COALESCE(s.review_count, 0) AS review_count,
+                COALESCE(s.rating_sum, 0) AS rating_sum,
+                COALESCE(s.stars_1, 0) AS stars_1,
+                COALESCE(s.stars_2, 0) AS stars_2,
+                COALESCE(s.stars_3, 0) AS stars_3,
+                COALESCE(s.stars_4, 0) AS stars_4,
+                COALESCE(s.stars_5, 0) AS stars_5
+            FROM books b
+            LEFT JOIN book_rating_stats s ON s.book_id = b.id
+            WHERE b.id = $1
+        """,
+        # {set_clause} only ever lists UPDATABLE_COLUMNS, so the statement
+        # cache holds at most one entry per combination of updated columns
+        "update_book": f"""
+            UPDATE books
+            SET {{set_clause}}
+            WHERE id = $1
+            RETURNING {BOOK_COLUMNS}
+        """,
+        "delete_book": """
+            DELETE FROM books
+            WHERE id = $1
+            RETURNING id
+        """,
+        "delete_books": """
+            DELETE FROM books
+        """,
+    }
 
+    async def create_book(self, book_data: Dict[str, Any]) -> Dict[str, Any]:
+        if not book_data["id"]:
+            book_data = {**book_data, "id": str(uuid4())}
+
+        await self.execute(
+            "create_book",
+            book_data["id"],
+            book_data["title"],
+            book_data["author"],
+            book_data["isbn"],
+            self.data_json(book_data),
+            book_data["created_at"],
+            book_data["updated_at"],
+        )
+
+        # Every column comes from the caller, so reading the row back is unneeded
+        return book_data
+
+    async def create_books(self, books: List[Dict[str, Any]]) -> None:
+        records = [
+            (
+                book["id"],
+                book["title"],
+                book["author"],
+                book["isbn"],
+                self.data_json(book),
+                book["created_at"],
+                book["updated_at"],
+            )
+            for book in books
+        ]
 
-class PostgresDb:
-    @staticmethod
-    def datetime_serialize(obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        raise TypeError(f"Type {type(obj)} is not serializable")
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.copy_records_to_table(
+                    "books",
+                    records=records,
+                    columns=[
+                        "id",
+                        "title",
+                        "author",
+                        "isbn",
+                        "data",
+                        "created_at",
+                        "updated_at",
+                    ],
+                )
 
-    async def __aenter__(self):
-        self.pool = await asyncpg.create_pool(DATABASE_URL)
-        return self
+    async def get_book(self, book_id: str) -> Optional[Dict[str, Any]]:
+        return await self.fetchrow("get_book", book_id)
 
-    async def __aexit__(self, exc_type, exc, tb):
-        await self.pool.close()
+    async def get_books(
+        self, limit: int = DEFAULT_PAGE_SIZE, after: Optional[Keyset] = None
+    ) -> List[Dict[str, Any]]:
+        if after is None:
+            return await self.fetch("get_books", limit)
 
-    async def create_book(self, book_data: Dict[str, Any]) -> Dict[str, Any]:
-        book_id = book_data["id"] or str(uuid4())
-        data_json = json.dumps(book_data, default=PostgresDb.datetime_serialize)
+        return await self.fetch("get_books_after", after[0], after[1], limit)
 
+    async def iter_books(
+        self, since: Optional[datetime] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
         async with self.pool.acquire() as conn:
-            query = """
-                INSERT INTO books(id, title, author, isbn, data, created_at)
-                VALUES ($1, $2, $3, $4, $5, $6)
-                RETURNING *
-            """
-            row = await conn.fetchrow(
-                query,
-                book_id,
-                book_data["title"],
-                book_data["author"],
-                book_data["isbn"],
-                data_json,
-                book_data["created_at"],
-            )
-            if row:
-                return {
-                    "id": row["id"],
-                    "title": row["title"],
-                    "author": row["author"],
-                    "isbn": row["isbn"],
-                    "created_at": row["created_at"],
-                }
-
-            return {}
-
-    async def get_book(self, book_id: str) -> Dict[str, Any]:
+            # Server-side cursors only live inside a transaction
+            async with conn.transaction():
+                if since is None:
+                    cursor = conn.cursor(
+                        self.statements["iter_books"], prefetch=EXPORT_BATCH_SIZE
+                    )
+                else:
+                    cursor = conn.cursor(
+                        self.statements["iter_books_since"],
+                        since,
+                        prefetch=EXPORT_BATCH_SIZE,
+                    )
+                async for row in cursor:
+                    yield dict(row)
+
+    async def iter_book_titles(self) -> AsyncIterator[Dict[str, Any]]:
         async with self.pool.acquire() as conn:
-            query = """
-                SELECT * FROM books WHERE id = $1
-            """
-            row = await conn.fetchrow(query, book_id)
-            if row:
-                return {
-                    "id": row["id"],
-                    "title": row["title"],
-                    "author": row["author"],
-                    "isbn": row["isbn"],
-                    "created_at": row["created_at"],
-                }
-
-            return None
-
-    async def get_books(self) -> List[Dict[str, Any]]:
-        async with self.pool.acquire() as conn:
-            query = """
-                SELECT * FROM books
-            """
-            rows = await conn.fetch(query)
-            users = []
-            for row in rows:
-                users.append(
-                    {
-                        "id": row["id"],
-                        "title": row["title"],
-                        "author": row["author"],
-                        "isbn": row["isbn"],
-                        "created_at": row["created_at"],
-                    }
+            async with conn.transaction():
+                cursor = conn.cursor(
+                    self.statements["iter_book_titles"], prefetch=EXPORT_BATCH_SIZE
                 )
-
-            return users
-
-    async def update_book(self, book_id: str, update_entry: Dict[str, Any]) -> None:
-        data_json = json.dumps(update_entry, default=PostgresDb.datetime_serialize)
+                async for row in cursor:
+                    yield dict(row)
+
+    async def find_similar_books(
+        self, text: str, limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """Typo-tolerant title and author matches, closest first."""
+        return await self.fetch("find_similar_books", text, limit)
+
+    async def get_book_stats(self, book_id: str) -> Optional[Dict[str, Any]]:
+        row = await self.fetchrow("get_book_stats", book_id)
+        if row:
+            count = row["review_count"]
+            return {
+                "book_id": row["book_id"],
+                "review_count": count,
+                "average_rating": (
+                    round(float(row["rating_sum"]) / count, 2) if count else None
+                ),
+                "histogram": {
+                    str(stars): row[f"stars_{stars}"] for stars in range(1, 6)
+                },
+            }
+
+        return None
+
+    async def update_book(
+        self, book_id: str, update_entry: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        set_clause, params = build_set_clause(
+            update_entry, UPDATABLE_COLUMNS, merge_data=not self.lean_data
+        )
+        query = self.statements["update_book"].format(set_clause=set_clause)
 
         async with self.pool.acquire() as conn:
-            query = """
-                UPDATE books
-                SET title = $2, author = $3, isbn = $4, data = $5
-                WHERE id = $1
-            """
-            await conn.execute(
-                query,
-                book_id,
-                update_entry["title"],
-                update_entry["author"],
-                update_entry["isbn"],
-                data_json,
-            )
+            row = await conn.fetchrow(query, book_id, *params)
 
-    async def delete_book(self, book_id: str) -> None:
-        async with self.pool.acquire() as conn:
-            query = """
-                DELETE FROM books
-                WHERE id = $1
-            """
-            await conn.execute(query, book_id)
+        return dict(row) if row else None
 
-    async def delete_books(self) -> None:
-        async with self.pool.acquire() as conn:
-            query = """
-                DELETE FROM books
-            """
-            await conn.execute(query)
+    async def delete_book(self, book_id: str) -> Optional[str]:
+        return await self.fetchval("delete_book", book_id)
+
+    async def delete_books(self) -> int:
+        return await self.execute("delete_books")
@@ -0,0 +1,162 @@
+import os
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from api.db.base import PostgresDb
+
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", "100"))
+# Bayesian average: every book starts with this many phantom reviews at the
+# catalogue-wide mean, so a single 5-star review does not top the list
+TOP_PRIOR_WEIGHT = float(os.getenv("LEADERBOARD_PRIOR_WEIGHT", "10"))
+TRENDING_WINDOW_DAYS = float(os.getenv("TRENDING_WINDOW_DAYS", "7"))
+# A review's contribution to the trending score halves every half-life
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "48"))
+
+BOARDS = ("top", "trending")
+
+# Held for the duration of a refresh so workers do not rebuild a board at once
+REFRESH_LOCK_KEY = zlib.crc32(b"book_leaderboards")
+
+LEADERBOARD_COLUMNS = """
+    l.position, b.id, b.title, b.author, b.isbn,
+    l.score, l.review_count, l.average_rating
+"""
+
+
+class LeaderboardRepository(PostgresDb):
+    table = "book_leaderboards"
+    statements = {
+        "get_board": f"""
+            SELECT {LEADERBOARD_COLUMNS}
+            FROM book_leaderboards l
+            JOIN books b ON b.id = l.book_id
+            WHERE l.board = $1 AND l.position > $2
+            ORDER BY l.position
+            LIMIT $3
+        """,
+        "get_refreshed_at": """
+            SELECT refreshed_at FROM leaderboard_refreshes WHERE board = $1
+        """,
+        "try_refresh_lock": """
+            SELECT pg_try_advisory_xact_lock($1)
+        """,
+        "clear_board": """
+            DELETE FROM book_leaderboards WHERE board = $1
+        """,
+        # Reads the per-book aggregates, never the reviews themselves
+        "fill_top": """
+            INSERT INTO book_leaderboards
+                (board, position, book_id, score, review_count, average_rating)
+            SELECT
+                'top',
+                row_number() OVER (ORDER BY score DESC, book_id),
+                book_id,
+                score,
+                review_count,
+                average_rating
+            FROM (
+                SELECT
+                    s.book_id,
+                    s.review_count,
+                    (s.rating_sum / s.review_count)::float AS average_rating,
+                    (($1::float * overall.mean + s.rating_sum) / ($1::float + s.review_count))::float
+                        AS score
+                FROM book_rating_stats s,
+                    (
+                        SELECT sum(rating_sum) / NULLIF(sum(review_count), 0) AS mean
+                        FROM book_rating_stats
+                    ) AS overall
+                WHERE s.review_count > 0
+                ORDER BY score DESC, s.book_id
+                LIMIT $2
+            ) AS ranked
+        """,
+        # Each review in the window counts 0.5 ** (age / half-life)
+        "fill_trending": """
+            INSERT INTO book_leaderboards
+                (board, position, book_id, score, review_count, average_rating)
+            SELECT
+                'trending',
+                row_number() OVER (ORDER BY score DESC, book_id),
+                book_id,
+                score,
+                review_count,
+                average_rating
+            FROM (
+                SELECT
+                    book_id,
+                    count(*) AS review_count,
+                    avg(rating)::float AS average_rating,
+                    sum(power(0.5, extract(epoch FROM $1::timestamp - created_at) / $3::float))::float
+                        AS score
+                FROM reviews
+                WHERE created_at >= $2
+                GROUP BY book_id
+                ORDER BY score DESC, book_id
+                LIMIT $4
+            ) AS ranked
+        """,
+        "set_refreshed_at": """
+            INSERT INTO leaderboard_refreshes (board, refreshed_at)
+            VALUES ($1, $2)
+            ON CONFLICT (board) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at
+        """,
+    }
+
+    async def get_board(
+        self, board: str, limit: int, offset: int = 0
+    ) -> Dict[str, Any]:
+        """One page of a board, with when it was last rebuilt (None if never)."""
+        async with self.pool.acquire() as conn:
+            books = await conn.fetch(self.statements["get_board"], board, offset, limit)
+            refreshed_at = await conn.fetchval(
+                self.statements["get_refreshed_at"], board
+            )
+
+        return {
+            "board": board,
+            "refreshed_at": refreshed_at,
+            "books": [dict(book) for book in books],
+        }
+
+    async def refresh(
+        self, now: datetime, min_age: timedelta = timedelta(0)
+    ) -> List[str]:
+        """Rebuild every board last refreshed more than ``min_age`` before ``now``.
+
+        Each board is replaced in one transaction, so readers see either the
+        old ranking or the new one. Returns the boards that were rebuilt; none
+        are while another connection holds the refresh lock.
+        """
+        refreshed = []
+        async with self.pool.acquire() as conn, conn.transaction():
+            if not await conn.fetchval(
+                self.statements["try_refresh_lock"], REFRESH_LOCK_KEY
+            ):
+                return refreshed
+
+            for board in BOARDS:
+                last: Optional[datetime] = await conn.fetchval(
+                    self.statements["get_refreshed_at"], board
+                )
+                if last is not None and now - last < min_age:
+                    continue
+
+                await conn.execute(self.statements["clear_board"], board)
+                if board == "top":
+                    await conn.execute(
+                        self.statements["fill_top"], TOP_PRIOR_WEIGHT, LEADERBOARD_SIZE
+                    )
+                else:
+                    await conn.execute(
+                        self.statements["fill_trending"],
+                        now,
+                        now - timedelta(days=TRENDING_WINDOW_DAYS),
+                        TRENDING_HALF_LIFE_HOURS * 3600,
+                        LEADERBOARD_SIZE,
+                    )
+                await conn.execute(self.statements["set_refreshed_at"], board, now)
+                refreshed.append(board)
+
+        return refreshed
@@ -0,0 +1,729 @@
+"""In-process storage implementing the repository interface without Postgres.
+
+Selected with ``DB_BACKEND=memory`` (see api/db/backend.py). Everything lives
+in one MemoryStore per worker process and is lost when it exits, so this is
+for local development and for benchmarking the HTTP and serialization layers
+with the database taken out of the picture.
+
+Rows are kept in dicts by id, next to the indexes the Postgres queries rely
+on: a sorted ``(created_at, id)`` list per table for pages and exports, the
+same per book for its review pages, review ids per user for the foreign key
+check, a word index for review search and a trigram index for fuzzy book
+matches. No method awaits between reading and writing the store, so on the
+event loop each call is atomic and concurrent tasks need no lock. Foreign
+keys and primary keys are enforced as in the schema and violations raise
+IntegrityError.
+"""
+
+import asyncio
+import heapq
+import re
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import uuid4
+
+from api.db.base import PostgresDb
+from api.db.books import BOOK_FIELDS
+from api.db.books import UPDATABLE_COLUMNS as BOOK_UPDATABLE_COLUMNS
+from api.db.leaderboards import (
+    BOARDS,
+    LEADERBOARD_SIZE,
+    TOP_PRIOR_WEIGHT,
+    TRENDING_HALF_LIFE_HOURS,
+    TRENDING_WINDOW_DAYS,
+)
+from api.db.pagination import DEFAULT_PAGE_SIZE, Keyset, RankKeyset
+from api.db.reviews import EXPORT_BATCH_SIZE, REVIEW_FIELDS
+from api.db.reviews import UPDATABLE_COLUMNS as REVIEW_UPDATABLE_COLUMNS
+from api.db.reviews import rating_deltas
+from api.db.users import UPDATABLE_COLUMNS as USER_UPDATABLE_COLUMNS
+from api.db.users import USER_FIELDS
+
+# Default of pg_trgm.word_similarity_threshold, which <% compares against
+SIMILARITY_THRESHOLD = 0.6
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class IntegrityError(Exception):
+    """A write that would break a primary or foreign key, like asyncpg's."""
+
+
+def _words(text: Optional[str]) -> List[str]:
+    return WORD_PATTERN.findall(text.lower()) if text else []
+
+
+def trigrams(text: str) -> Set[str]:
+    """pg_trgm's trigrams: each word padded with two spaces before, one after."""
+    grams = set()
+    for word in _words(text):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+
+    return grams
+
+
+def similarity(query: Set[str], text: str) -> float:
+    # Share of the query's trigrams found in the text, as word_similarity
+    # measures it when the text contains the query's words whole
+    return len(query & trigrams(text)) / len(query) if query else 0.0
+
+
+class MemoryTable:
+    """Rows by id plus their ``(created_at, id)`` order."""
+
+    def __init__(self, name: str, fields: Tuple[str, ...]):
+        self.name = name
+        self.fields = fields
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.order: List[Keyset] = []
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _row(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        if record["id"] in self.rows:
+            raise IntegrityError(
+                f'duplicate key value violates unique constraint "{self.name}_pkey"'
+            )
+
+        return {field: record.get(field) for field in self.fields}
+
+    def insert(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        row = self._row(record)
+        self.rows[row["id"]] = row
+        insort(self.order, (row["created_at"], row["id"]))
+
+        return row
+
+    def insert_many(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        rows = [self._row(record) for record in records]
+        if len({row["id"] for row in rows}) < len(rows):
+            raise IntegrityError(
+                f'duplicate key value violates unique constraint "{self.name}_pkey"'
+            )
+
+        for row in rows:
+            self.rows[row["id"]] = row
+        # One sort of the appended run is far cheaper than an insort per row
+        self.order.extend((row["created_at"], row["id"]) for row in rows)
+        self.order.sort()
+
+        return rows
+
+    def update(
+        self, row_id: str, fields: Dict[str, Any], columns: Tuple[str, ...]
+    ) -> Optional[Dict[str, Any]]:
+        row = self.rows.get(row_id)
+        if row is None:
+            return None
+
+        row.update({column: fields[column] for column in columns if column in fields})
+        return row
+
+    def remove(self, row_id: str) -> Optional[Dict[str, Any]]:
+        row = self.rows.pop(row_id, None)
+        if row is not None:
+            del self.order[bisect_left(self.order, (row["created_at"], row_id))]
+
+        return row
+
+    def clear(self) -> int:
+        count = len(self.rows)
+        self.rows.clear()
+        self.order.clear()
+
+        return count
+
+    def page(self, limit: int, after: Optional[Keyset] = None) -> List[Dict[str, Any]]:
+        start = 0 if after is None else bisect_right(self.order, after)
+        return [dict(self.rows[key[1]]) for key in self.order[start : start + limit]]
+
+    def ids_since(self, since: Optional[datetime] = None) -> List[str]:
+        start = 0 if since is None else bisect_left(self.order, (since,))
+        return [key[1] for key in self.order[start:]]
+
+    async def iterate(self, since: Optional[datetime] = None):
+        """Yield copies of the rows in order, from a snapshot of the ids.
+
+        Rows deleted while the export runs are skipped. The loop yields to
+        other tasks between batches, as waiting on a cursor would.
+        """
+        for count, row_id in enumerate(self.ids_since(since), 1):
+            row = self.rows.get(row_id)
+            if row is not None:
+                yield dict(row)
+            if count % EXPORT_BATCH_SIZE == 0:
+                await asyncio.sleep(0)
+
+
+class MemoryStore:
+    """Every table and index of one worker's in-memory database."""
+
+    def __init__(self):
+        self.users = MemoryTable("users", USER_FIELDS)
+        self.books = MemoryTable("books", BOOK_FIELDS)
+        self.reviews = MemoryTable("reviews", REVIEW_FIELDS)
+        # (created_at, id) of each book's reviews, in order
+        self.book_reviews: Dict[str, List[Keyset]] = defaultdict(list)
+        self.user_reviews: Dict[str, Set[str]] = defaultdict(set)
+        # Comment word -> ids of the reviews using it
+        self.review_words: Dict[str, Set[str]] = defaultdict(set)
+        # Trigram -> ids of books whose title or author has it. Entries are
+        # only ever appended; candidates are rescored against the current row
+        self.book_trigrams: Dict[str, List[str]] = defaultdict(list)
+        # [review_count, rating_sum, stars_1, ..., stars_5] per book
+        self.rating_stats: Dict[str, List[Any]] = {}
+        self.boards: Dict[str, List[Dict[str, Any]]] = {board: [] for board in BOARDS}
+        self.refreshed_at: Dict[str, datetime] = {}
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def index_book(self, book: Dict[str, Any]) -> None:
+        for gram in trigrams(f"{book['title']} {book['author']}"):
+            self.book_trigrams[gram].append(book["id"])
+
+    def index_review(self, review: Dict[str, Any], in_order: bool = True) -> None:
+        """Add a review to the per-book, per-user and word indexes.
+
+        With ``in_order=False`` its key is appended to the book's list and the
+        caller sorts the lists it touched once the whole batch is in.
+        """
+        keys = self.book_reviews[review["book_id"]]
+        if in_order:
+            insort(keys, (review["created_at"], review["id"]))
+        else:
+            keys.append((review["created_at"], review["id"]))
+        self.user_reviews[review["user_id"]].add(review["id"])
+        for word in set(_words(review["comment"])):
+            self.review_words[word].add(review["id"])
+
+    def unindex_words(self, review: Dict[str, Any]) -> None:
+        for word in set(_words(review["comment"])):
+            ids = self.review_words.get(word)
+            if ids is not None:
+                ids.discard(review["id"])
+                if not ids:
+                    del self.review_words[word]
+
+    def apply_rating_deltas(self, deltas: Dict[str, List[Any]]) -> None:
+        for book_id, delta in deltas.items():
+            stats = self.rating_stats.setdefault(book_id, [0] * len(delta))
+            for i, value in enumerate(delta):
+                stats[i] += value
+
+    def check_references(self, reviews: Iterable[Dict[str, Any]]) -> None:
+        for review in reviews:
+            if review["user_id"] not in self.users.rows:
+                raise IntegrityError(
+                    'insert or update on table "reviews" violates foreign key'
+                    f' constraint: user "{review["user_id"]}" does not exist'
+                )
+            if review["book_id"] not in self.books.rows:
+                raise IntegrityError(
+                    'insert or update on table "reviews" violates foreign key'
+                    f' constraint: book "{review["book_id"]}" does not exist'
+                )
+
+
+memory_store = MemoryStore()
+
+
+class MemoryDb(PostgresDb):
+    """Base of the in-memory repositories; the store stands in for the pool.
+
+    Subclassing PostgresDb keeps the per-method timing, spans and slow-query
+    log, so /metrics and traces look the same on either backend.
+    """
+
+    def __init__(self, store: MemoryStore = memory_store):
+        self.store = store
+
+    async def __aenter__(self):
+        return self
+
+    async def compact_data(self, batch_size: int = 1000) -> int:
+        # There is no data column to compact
+        return 0
+
+    async def vacuum(self, full: bool = False) -> None:
+        pass
+
+    async def relation_sizes(self) -> Dict[str, int]:
+        return {"table": 0, "indexes": 0, "data": 0}
+
+
+class MemoryBookRepository(MemoryDb):
+    table = "books"
+    fields = BOOK_FIELDS
+
+    async def create_book(self, book_data: Dict[str, Any]) -> Dict[str, Any]:
+        if not book_data["id"]:
+            book_data = {**book_data, "id": str(uuid4())}
+
+        self.store.index_book(self.store.books.insert(book_data))
+
+        return book_data
+
+    async def create_books(self, books: List[Dict[str, Any]]) -> None:
+        for book in self.store.books.insert_many(books):
+            self.store.index_book(book)
+
+    async def get_book(self, book_id: str) -> Optional[Dict[str, Any]]:
+        book = self.store.books.rows.get(book_id)
+        return dict(book) if book else None
+
+    async def get_books(
+        self, limit: int = DEFAULT_PAGE_SIZE, after: Optional[Keyset] = None
+    ) -> List[Dict[str, Any]]:
+        return self.store.books.page(limit, after)
+
+    def iter_books(
+        self, since: Optional[datetime] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        return self.store.books.iterate(since)
+
+    async def iter_book_titles(self) -> AsyncIterator[Dict[str, Any]]:
+        for book in list(self.store.books.rows.values()):
+            yield {"id": book["id"], "title": book["title"], "author": book["author"]}
+
+    async def find_similar_books(
+        self, text: str, limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """Typo-tolerant title and author matches, closest first."""
+        query = trigrams(text)
+        if not query:
+            return []
+
+        hits = Counter()
+        for gram in query:
+            hits.update(set(self.store.book_trigrams.get(gram, ())))
+        # A book sharing fewer trigrams than the threshold cannot match
+        needed = SIMILARITY_THRESHOLD * len(query)
+
+        matches = []
+        for book_id, count in hits.items():
+            book = self.store.books.rows.get(book_id)
+            if count < needed or book is None:
+                continue
+            score = max(
+                similarity(query, book["title"]), similarity(query, book["author"])
+            )
+            if score >= SIMILARITY_THRESHOLD:
+                matches.append(
+                    {
+                        "id": book_id,
+                        "title": book["title"],
+                        "author": book["author"],
+                        "score": score,
+                    }
+                )
+
+        return heapq.nsmallest(limit, matches, key=lambda m: (-m["score"], m["id"]))
+
+    async def get_book_stats(self, book_id: str) -> Optional[Dict[str, Any]]:
+        if book_id not in self.store.books.rows:
+            return None
+
+        stats = self.store.rating_stats.get(book_id) or [0, 0, 0, 0, 0, 0, 0]
+        count = stats[0]
+        return {
+            "book_id": book_id,
+            "review_count": count,
+            "average_rating": round(float(stats[1]) / count, 2) if count else None,
+            "histogram": {str(stars): stats[1 + stars] for stars in range(1, 6)},
+        }
+
+    async def update_book(
+        self, book_id: str, update_entry: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        book = self.store.books.update(book_id, update_entry, BOOK_UPDATABLE_COLUMNS)
+        if book is None:
+            return None
+
+        if "title" in update_entry or "author" in update_entry:
+            self.store.index_book(book)
+        return dict(book)
+
+    async def delete_book(self, book_id: str) -> Optional[str]:
+        if self.store.book_reviews.get(book_id):
+            raise IntegrityError(
+                'update or delete on table "books" violates foreign key constraint'
+                f' on table "reviews": book "{book_id}" still has reviews'
+            )
+
+        book = self.store.books.remove(book_id)
+        if book is None:
+            return None
+
+        # book_rating_stats and book_leaderboards cascade
+        self.store.rating_stats.pop(book_id, None)
+        for board in self.store.boards.values():
+            board[:] = [entry for entry in board if entry["book_id"] != book_id]
+        return book_id
+
+    async def delete_books(self) -> int:
+        if len(self.store.reviews):
+            raise IntegrityError(
+                'update or delete on table "books" violates foreign key constraint'
+                ' on table "reviews"'
+            )
+
+        self.store.book_trigrams.clear()
+        self.store.rating_stats.clear()
+        for board in self.store.boards.values():
+            board.clear()
+        return self.store.books.clear()
+
+
+class MemoryUserRepository(MemoryDb):
+    table = "users"
+    fields = USER_FIELDS
+
+    async def create_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        if not user_data["id"]:
+            user_data = {**user_data, "id": str(uuid4())}
+
+        self.store.users.insert(user_data)
+
+        return user_data
+
+    async def create_users(self, users: List[Dict[str, Any]]) -> None:
+        self.store.users.insert_many(users)
+
+    async def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        user = self.store.users.rows.get(user_id)
+        return dict(user) if user else None
+
+    async def get_users(
+        self, limit: int = DEFAULT_PAGE_SIZE, after: Optional[Keyset] = None
+    ) -> List[Dict[str, Any]]:
+        return self.store.users.page(limit, after)
+
+    def iter_users(
+        self, since: Optional[datetime] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        return self.store.users.iterate(since)
+
+    async def update_user(
+        self, user_id: str, update_entry: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        user = self.store.users.update(user_id, update_entry, USER_UPDATABLE_COLUMNS)
+        return dict(user) if user else None
+
+    async def delete_user(self, user_id: str) -> Optional[str]:
+        if self.store.user_reviews.get(user_id):
+            raise IntegrityError(
+                'update or delete on table "users" violates foreign key constraint'
+                f' on table "reviews": user "{user_id}" still has reviews'
+            )
+
+        return user_id if self.store.users.remove(user_id) else None
+
+    async def delete_users(self) -> int:
+        if len(self.store.reviews):
+            raise IntegrityError(
+                'update or delete on table "users" violates foreign key constraint'
+                ' on table "reviews"'
+            )
+
+        return self.store.users.clear()
+
+
+class MemoryReviewRepository(MemoryDb):
+    table = "reviews"
+    fields = REVIEW_FIELDS
+
+    async def create_review(self, review_data: Dict[str, Any]) -> Dict[str, Any]:
+        if not review_data["id"]:
+            review_data = {**review_data, "id": str(uuid4())}
+        self.store.check_references([review_data])
+
+        review = self.store.reviews.insert(review_data)
+        self.store.index_review(review)
+        self.store.apply_rating_deltas(
+            rating_deltas([(review["book_id"], review["rating"], 1)])
+        )
+
+        return dict(review)
+
+    async def find_missing_references(
+        self, user_ids: List[str], book_ids: List[str]
+    ) -> Tuple[Set[str], Set[str]]:
+        """Return the user and book ids that do not exist."""
+        return (
+            {user_id for user_id in user_ids if user_id not in self.store.users.rows},
+            {book_id for book_id in book_ids if book_id not in self.store.books.rows},
+        )
+
+    async def create_reviews(self, reviews: List[Dict[str, Any]]) -> None:
+        # Checked up front so a bad row leaves the store untouched, as a
+        # rolled back COPY would
+        self.store.check_references(reviews)
+
+        touched = set()
+        for review in self.store.reviews.insert_many(reviews):
+            self.store.index_review(review, in_order=False)
+            touched.add(review["book_id"])
+        for book_id in touched:
+            self.store.book_reviews[book_id].sort()
+        self.store.apply_rating_deltas(
+            rating_deltas(
+                [(review["book_id"], review["rating"], 1) for review in reviews]
+            )
+        )
+
+    async def get_review(self, review_id: str) -> Dict[str, Any]:
+        review = self.store.reviews.rows.get(review_id)
+        return dict(review) if review else {}
+
+    async def get_book_reviews(
+        self,
+        book_id: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        after: Optional[Keyset] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        keys = self.store.book_reviews.get(book_id, [])
+        start = 0 if after is None else bisect_right(keys, after)
+        rows = self.store.reviews.rows
+
+        return [dict(rows[key[1]]) for key in keys[start : start + limit]] or None
+
+    def iter_reviews(
+        self, since: Optional[datetime] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        return self.store.reviews.iterate(since)
+
+    async def search_reviews(
+        self,
+        query: str,
+        book_id: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        after: Optional[RankKeyset] = None,
+    ) -> List[Dict[str, Any]]:
+        """Reviews whose comment has every word of ``query``, best first.
+
+        Words prefixed with ``-`` must not appear. There is no stemming or
+        stop word list, and the rank is the number of times the query's
+        words occur in the comment rather than ts_rank's score.
+        """
+        required = set()
+        excluded = set()
+        for term in query.split():
+            words = _words(term)
+            if term.startswith("-"):
+                excluded.update(words)
+            elif term.lower() != "or":
+                required.update(words)
+        if not required:
+            return []
+
+        index = self.store.review_words
+        postings = sorted((index.get(word, set()) for word in required), key=len)
+        candidates = set.intersection(*postings)
+        for word in excluded:
+            candidates -= index.get(word, set())
+
+        matches = []
+        for review_id in candidates:
+            review = self.store.reviews.rows[review_id]
+            if book_id is not None and review["book_id"] != book_id:
+                continue
+            rank = float(sum(w in required for w in _words(review["comment"])))
+            if (
+                after is None
+                or rank < after[0]
+                or (rank == after[0] and review_id > after[1])
+            ):
+                matches.append({**review, "rank": rank})
+
+        return heapq.nsmallest(limit, matches, key=lambda r: (-r["rank"], r["id"]))
+
+    async def update_review(
+        self, review_id: str, update_entry: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        review = self.store.reviews.rows.get(review_id)
+        if review is None:
+            return None
+
+        old_rating = review["rating"]
+        if "comment" in update_entry:
+            self.store.unindex_words(review)
+        self.store.reviews.update(review_id, update_entry, REVIEW_UPDATABLE_COLUMNS)
+        if "comment" in update_entry:
+            for word in set(_words(review["comment"])):
+                self.store.review_words[word].add(review_id)
+        if "rating" in update_entry:
+            self.store.apply_rating_deltas(
+                rating_deltas(
+                    [
+                        (review["book_id"], old_rating, -1),
+                        (review["book_id"], review["rating"], 1),
+                    ]
+                )
+            )
+
+        return dict(review)
+
+    async def delete_review(self, review_id: str) -> Optional[str]:
+        review = self.store.reviews.remove(review_id)
+        if review is None:
+            return None
+
+        keys = self.store.book_reviews[review["book_id"]]
+        del keys[bisect_left(keys, (review["created_at"], review_id))]
+        self.store.user_reviews[review["user_id"]].discard(review_id)
+        self.store.unindex_words(review)
+        self.store.apply_rating_deltas(
+            rating_deltas([(review["book_id"], review["rating"], -1)])
+        )
+
+        return review_id
+
+    async def delete_reviews(self) -> int:
+        self.store.book_reviews.clear()
+        self.store.user_reviews.clear()
+        self.store.review_words.clear()
+        self.store.rating_stats.clear()
+
+        return self.store.reviews.clear()
+
+    def _actual_rating_stats(self) -> Dict[str, List[Any]]:
+        return rating_deltas(
+            [
+                (review["book_id"], review["rating"], 1)
+                for review in self.store.reviews.rows.values()
+            ]
+        )
+
+    async def find_rating_stats_drift(self) -> List[Dict[str, Any]]:
+        """Compare the stored stats against a full recomputation from reviews."""
+        actual = self._actual_rating_stats()
+        stored = self.store.rating_stats
+        drift = []
+        for book_id in sorted(actual.keys() | stored.keys()):
+            expected, kept = actual.get(book_id), stored.get(book_id)
+            if expected == kept or not (expected or kept)[0]:
+                continue
+            drift.append(
+                {
+                    "book_id": book_id,
+                    "expected_count": expected[0] if expected else None,
+                    "stored_count": kept[0] if kept else None,
+                    "expected_sum": expected[1] if expected else None,
+                    "stored_sum": kept[1] if kept else None,
+                }
+            )
+
+        return drift
+
+    async def rebuild_rating_stats(self) -> int:
+        """Recompute the stats from scratch, returning the number of books."""
+        self.store.rating_stats = self._actual_rating_stats()
+        return len(self.store.rating_stats)
+
+
+class MemoryLeaderboardRepository(MemoryDb):
+    table = "book_leaderboards"
+
+    async def get_board(
+        self, board: str, limit: int, offset: int = 0
+    ) -> Dict[str, Any]:
+        """One page of a board, with when it was last rebuilt (None if never)."""
+        books = []
+        for entry in self.store.boards.get(board, []):
+            if entry["position"] <= offset:
+                continue
+            if len(books) == limit:
+                break
+            book = self.store.books.rows[entry["book_id"]]
+            books.append(
+                {
+                    "position": entry["position"],
+                    "id": book["id"],
+                    "title": book["title"],
+                    "author": book["author"],
+                    "isbn": book["isbn"],
+                    "score": entry["score"],
+                    "review_count": entry["review_count"],
+                    "average_rating": entry["average_rating"],
+                }
+            )
+
+        return {
+            "board": board,
+            "refreshed_at": self.store.refreshed_at.get(board),
+            "books": books,
+        }
+
+    def _rank_top(self) -> List[Tuple[str, float, int, float]]:
+        stats = [s for s in self.store.rating_stats.items() if s[1][0] > 0]
+        count = sum(s[0] for _, s in stats)
+        mean = float(sum(s[1] for _, s in stats)) / count if count else 0.0
+        return [
+            (
+                book_id,
+                (TOP_PRIOR_WEIGHT * mean + float(s[1])) / (TOP_PRIOR_WEIGHT + s[0]),
+                s[0],
+                float(s[1]) / s[0],
+            )
+            for book_id, s in stats
+        ]
+
+    def _rank_trending(self, now: datetime) -> List[Tuple[str, float, int, float]]:
+        since = now - timedelta(days=TRENDING_WINDOW_DAYS)
+        half_life = TRENDING_HALF_LIFE_HOURS * 3600
+        # book_id -> [score, review_count, rated_count, rating_sum]
+        books = defaultdict(lambda: [0.0, 0, 0, 0.0])
+        rows = self.store.reviews.rows
+        for review_id in self.store.reviews.ids_since(since):
+            review = rows[review_id]
+            totals = books[review["book_id"]]
+            age = (now - review["created_at"]).total_seconds()
+            totals[0] += 0.5 ** (age / half_life)
+            totals[1] += 1
+            if review["rating"] is not None:
+                totals[2] += 1
+                totals[3] += float(review["rating"])
+
+        return [
+            (book_id, t[0], t[1], t[3] / t[2] if t[2] else None)
+            for book_id, t in books.items()
+        ]
+
+    async def refresh(
+        self, now: datetime, min_age: timedelta = timedelta(0)
+    ) -> List[str]:
+        """Rebuild every board last refreshed more than ``min_age`` before ``now``."""
+        refreshed = []
+        for board in BOARDS:
+            last = self.store.refreshed_at.get(board)
+            if last is not None and now - last < min_age:
+                continue
+
+            ranked = self._rank_top() if board == "top" else self._rank_trending(now)
+            best = heapq.nsmallest(
+                LEADERBOARD_SIZE, ranked, key=lambda r: (-r[1], r[0])
+            )
+            self.store.boards[board] = [
+                {
+                    "position": position,
+                    "book_id": book_id,
+                    "score": score,
+                    "review_count": review_count,
+                    "average_rating": average_rating,
+                }
+                for position, (
+                    book_id,
+                    score,
+                    review_count,
+                    average_rating,
+                ) in enumerate(best, 1)
+            ]
+            self.store.refreshed_at[board] = now
+            refreshed.append(board)
+
+        return refreshed
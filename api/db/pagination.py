@@ -0,0 +1,67 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+Keyset = Tuple[datetime, str]
+# Search results are ordered by (rank DESC, id)
+RankKeyset = Tuple[float, str]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode(key: str, row_id: str) -> str:
+    raw = f"{key}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: str, parse_key: Callable[[str], Any]) -> Tuple[Any, str]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        key, row_id = raw.split("|", 1)
+        return parse_key(key), row_id
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    return _encode(created_at.isoformat(), row_id)
+
+
+def decode_cursor(cursor: str) -> Keyset:
+    return _decode(cursor, datetime.fromisoformat)
+
+
+def encode_rank_cursor(rank: float, row_id: str) -> str:
+    # repr round-trips the float exactly, so the keyset comparison is stable
+    return _encode(repr(rank), row_id)
+
+
+def decode_rank_cursor(cursor: str) -> RankKeyset:
+    return _decode(cursor, float)
+
+
+def next_cursor(items: Optional[List[Dict[str, Any]]], limit: int) -> Optional[str]:
+    """Return the cursor for the page after ``items``, or None on the last page."""
+    if not items or len(items) < limit:
+        return None
+
+    last = items[-1]
+    return encode_cursor(last["created_at"], last["id"])
+
+
+def next_rank_cursor(
+    items: Optional[List[Dict[str, Any]]], limit: int
+) -> Optional[str]:
+    """Like next_cursor, for pages ordered by search rank."""
+    if not items or len(items) < limit:
+        return None
+
+    last = items[-1]
+    return encode_rank_cursor(last["rank"], last["id"])
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import asyncpg
+from dotenv import load_dotenv
+
+from api.metrics import pool_acquire_latency
+from api.tracing import query_timing
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "postgres", "sqlite" for the embedded database in api/db/sqlite.py, or
+# "memory" for the in-process store in api/db/memory.py
+DB_BACKEND = os.getenv("DB_BACKEND", "postgres").lower()
+if DB_BACKEND not in ("postgres", "sqlite", "memory"):
+    raise ValueError("DB_BACKEND must be 'postgres', 'sqlite' or 'memory'")
+
+DATABASE_URL = os.getenv("POSTGRES_URL")
+if not DATABASE_URL and DB_BACKEND == "postgres":
+    raise ValueError(
+        "Database string connection not found. Please include it in the '.env' file"
+    )
+
+POOL_MIN_SIZE = int(os.getenv("POSTGRES_POOL_MIN_SIZE", "5"))
+POOL_MAX_SIZE = int(os.getenv("POSTGRES_POOL_MAX_SIZE", "20"))
+POOL_MAX_QUERIES = int(os.getenv("POSTGRES_POOL_MAX_QUERIES", "50000"))
+POOL_MAX_IDLE_SECONDS = float(os.getenv("POSTGRES_POOL_MAX_IDLE_SECONDS", "300"))
+POOL_CLOSE_TIMEOUT = float(os.getenv("POSTGRES_POOL_CLOSE_TIMEOUT", "10"))
+# Prepared statements kept per connection; room for every repository
+# statement plus the per-column-set variants of the UPDATE statements
+STATEMENT_CACHE_SIZE = int(os.getenv("POSTGRES_STATEMENT_CACHE_SIZE", "256"))
+# Streaming replicas of the primary, comma-separated; each gets a pool of
+# the same size, and get_* repository reads are routed to them (see
+# api/db/replicas.py)
+REPLICA_URLS = [
+    url.strip()
+    for url in os.getenv("POSTGRES_REPLICA_URLS", "").split(",")
+    if url.strip()
+]
+
+
+class InstrumentedPool:
+    """The asyncpg pool as handed to repositories, timing every acquire.
+
+    It also counts the callers currently waiting for a connection, which
+    asyncpg does not expose. Everything else is passed through to the pool.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self._pool = pool
+        self.waiting = 0
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[asyncpg.Connection]:
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            conn = await self._pool.acquire()
+        finally:
+            self.waiting -= 1
+        waited = time.perf_counter() - started
+        pool_acquire_latency.observe((), waited)
+        timing = query_timing.get()
+        if timing is not None:
+            timing.acquire_ms += waited * 1000
+        try:
+            yield conn
+        finally:
+            await self._pool.release(conn)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pool, name)
+
+
+_pool: Optional[InstrumentedPool] = None
+_replicas: List[InstrumentedPool] = []
+
+
+async def _create_pool(url: str) -> InstrumentedPool:
+    return InstrumentedPool(
+        await asyncpg.create_pool(
+            url,
+            min_size=POOL_MIN_SIZE,
+            max_size=POOL_MAX_SIZE,
+            max_queries=POOL_MAX_QUERIES,
+            max_inactive_connection_lifetime=POOL_MAX_IDLE_SECONDS,
+            statement_cache_size=STATEMENT_CACHE_SIZE,
+        )
+    )
+
+
+async def init_pool() -> InstrumentedPool:
+    """Create the process-wide connection pools shared by every repository."""
+    global _pool, _replicas
+    if _pool is None:
+        _pool = await _create_pool(DATABASE_URL)
+        _replicas = [await _create_pool(url) for url in REPLICA_URLS]
+        logger.info(
+            "Database pool created (min_size=%s, max_size=%s, replicas=%s)",
+            POOL_MIN_SIZE,
+            POOL_MAX_SIZE,
+            len(_replicas),
+        )
+
+    return _pool
+
+
+async def _drain(pool: InstrumentedPool) -> None:
+    try:
+        await asyncio.wait_for(pool.close(), timeout=POOL_CLOSE_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(
+            "Database pool did not drain within %ss, terminating", POOL_CLOSE_TIMEOUT
+        )
+        pool.terminate()
+
+
+async def close_pool() -> None:
+    """Drain the pools, waiting for in-flight queries before terminating."""
+    global _pool, _replicas
+    if _pool is None:
+        return
+
+    pools, _pool, _replicas = [_pool, *_replicas], None, []
+    await asyncio.gather(*(_drain(pool) for pool in pools))
+    logger.info("Database pool closed")
+
+
+def get_pool() -> InstrumentedPool:
+    if _pool is None:
+        raise RuntimeError(
+            "Database pool is not initialized. It is created on application startup"
+        )
+
+    return _pool
+
+
+def get_replica_pools() -> List[InstrumentedPool]:
+    """The replica pools, empty before startup or when none are configured."""
+    return _replicas
+
+
+def pool_stats() -> Optional[Dict[str, int]]:
+    """Connection counts for the metrics endpoint, None before startup."""
+    if _pool is None:
+        return None
+
+    return {
+        "size": _pool.get_size(),
+        "idle": _pool.get_idle_size(),
+        "max_size": _pool.get_max_size(),
+        "waiting": _pool.waiting,
+    }
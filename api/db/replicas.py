@@ -0,0 +1,203 @@
+"""Routing of read-only repository calls to streaming replicas.
+
+With ``POSTGRES_REPLICA_URLS`` set, every ``get_*`` repository method runs
+on a replica pool, picked round-robin or by fewest busy connections
+(``REPLICA_SELECTION``); everything else stays on the primary.
+
+Replicas lag the primary, so a client could write and then not see its
+own write. Writes made while serving a request therefore answer with the
+primary's WAL position in the ``X-Consistency-Token`` header. A client that
+sends the token back gets reads that reflect at least that position: a
+replica is used once it has replayed that far, waiting up to
+``REPLICA_MAX_WAIT_MS`` for it, and the primary after that. Replay
+positions seen are remembered per replica, so once a replica has caught up
+the check costs nothing.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from starlette.responses import JSONResponse
+
+from api.db.pool import InstrumentedPool, get_replica_pools
+
+logger = logging.getLogger(__name__)
+
+REPLICA_SELECTION = os.getenv("REPLICA_SELECTION", "round_robin").lower()
+if REPLICA_SELECTION not in ("round_robin", "least_busy"):
+    raise ValueError("REPLICA_SELECTION must be 'round_robin' or 'least_busy'")
+
+# 0 sends token-bearing reads straight to the primary when the replica lags
+REPLICA_MAX_WAIT_MS = float(os.getenv("REPLICA_MAX_WAIT_MS", "100"))
+REPLAY_POLL_SECONDS = 0.005
+
+TOKEN_HEADER = b"x-consistency-token"
+
+
+class InvalidToken(ValueError):
+    """A consistency token that is not a WAL position."""
+
+
+def parse_lsn(text: str) -> int:
+    """A WAL position as Postgres prints it (``16/B374D848``) to a number."""
+    try:
+        high, low = text.split("/")
+        return (int(high, 16) << 32) + int(low, 16)
+    except ValueError:
+        raise InvalidToken(f"Invalid consistency token: {text!r}") from None
+
+
+def format_lsn(lsn: int) -> str:
+    return f"{lsn >> 32:X}/{lsn & 0xFFFFFFFF:X}"
+
+
+class Consistency:
+    """What one request needs from replicas and what it wrote."""
+
+    def __init__(self, read_after: Optional[int] = None):
+        # Reads must reflect the primary at least up to this position
+        self.read_after = read_after
+        self.written: Optional[int] = None
+
+    @property
+    def required(self) -> Optional[int]:
+        # A request also reads its own writes
+        positions = [lsn for lsn in (self.read_after, self.written) if lsn]
+        return max(positions) if positions else None
+
+
+consistency: ContextVar[Optional[Consistency]] = ContextVar("consistency", default=None)
+
+
+def consistency_required() -> bool:
+    """Whether the current request carries a token or has written.
+
+    Reads that do must not be answered from anything that may predate the
+    write, such as another request's in-flight query or a cached row.
+    """
+    state = consistency.get()
+    return state is not None and state.required is not None
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        selection: str = REPLICA_SELECTION,
+        max_wait_ms: float = REPLICA_MAX_WAIT_MS,
+    ):
+        self.selection = selection
+        self.max_wait = max_wait_ms / 1000
+        self._turn = itertools.count()
+        # Highest replay position seen per replica pool
+        self._replayed: Dict[int, int] = {}
+        self.reads: Dict[str, int] = {"replica": 0, "primary": 0, "waited": 0}
+
+    def _pick(self, replicas: List[InstrumentedPool]) -> InstrumentedPool:
+        if self.selection == "least_busy":
+            return min(
+                replicas,
+                key=lambda pool: pool.get_size() - pool.get_idle_size() + pool.waiting,
+            )
+
+        return replicas[next(self._turn) % len(replicas)]
+
+    async def _replay_lsn(self, replica: InstrumentedPool) -> int:
+        async with replica.acquire() as conn:
+            text = await conn.fetchval("SELECT pg_last_wal_replay_lsn()::text")
+        # NULL when the server is not a standby; treat it as never caught up
+        lsn = parse_lsn(text) if text else 0
+        if lsn > self._replayed.get(id(replica), 0):
+            self._replayed[id(replica)] = lsn
+
+        return lsn
+
+    async def read_pool(self, primary: InstrumentedPool) -> InstrumentedPool:
+        """The pool a read should use: a replica that is current enough, or ``primary``."""
+        replicas = get_replica_pools()
+        if not replicas:
+            return primary
+
+        replica = self._pick(replicas)
+        state = consistency.get()
+        required = state.required if state else None
+        if required is None or self._replayed.get(id(replica), 0) >= required:
+            self.reads["replica"] += 1
+            return replica
+
+        deadline = time.monotonic() + self.max_wait
+        while await self._replay_lsn(replica) < required:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.debug(
+                    "Replica has not replayed %s, reading from the primary",
+                    format_lsn(required),
+                )
+                self.reads["primary"] += 1
+                return primary
+            await asyncio.sleep(min(REPLAY_POLL_SECONDS, remaining))
+        self.reads["waited"] += 1
+        self.reads["replica"] += 1
+
+        return replica
+
+    async def record_write(self, primary: InstrumentedPool) -> None:
+        """Note the primary's WAL position after a write made for a request."""
+        state = consistency.get()
+        if state is None or not get_replica_pools():
+            return
+
+        async with primary.acquire() as conn:
+            lsn = parse_lsn(await conn.fetchval("SELECT pg_current_wal_lsn()::text"))
+        state.written = max(state.written or 0, lsn)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"selection": self.selection, **self.reads}
+
+
+replica_router = ReplicaRouter()
+
+
+class ConsistencyMiddleware:
+    """ASGI middleware reading and issuing ``X-Consistency-Token``.
+
+    The token sent with a request bounds how stale its reads may be; a
+    response to a request that wrote carries the token for its writes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        read_after = None
+        for name, value in scope["headers"]:
+            if name == TOKEN_HEADER:
+                try:
+                    read_after = parse_lsn(value.decode("latin-1"))
+                except InvalidToken as exc:
+                    response = JSONResponse({"detail": str(exc)}, status_code=400)
+                    await response(scope, receive, send)
+                    return
+                break
+        state = Consistency(read_after)
+        token = consistency.set(state)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and state.written:
+                message["headers"] = list(message.get("headers", [])) + [
+                    (TOKEN_HEADER, format_lsn(state.required).encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            consistency.reset(token)
@@ -1,137 +1,403 @@
-import json
-import os
+from collections import defaultdict
 from datetime import datetime
-from typing import Any, Dict
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
 from uuid import uuid4
 
-import asyncpg
-from dotenv import load_dotenv
+from api.db.base import PostgresDb
+from api.db.pagination import DEFAULT_PAGE_SIZE, Keyset, RankKeyset
+from api.db.updates import build_set_clause
 
-load_dotenv()
+EXPORT_BATCH_SIZE = 1000
 
-DATABASE_URL = os.getenv("POSTGRES_URL")
-if not DATABASE_URL:
-    raise ValueError(
-        "Database string connection not found. Please include it in the '.env' file"
-    )
+UPDATABLE_COLUMNS = ("rating", "comment", "updated_at")
 
+REVIEW_FIELDS = (
+    "id",
+    "user_id",
+    "book_id",
+    "rating",
+    "comment",
+    "created_at",
+    "updated_at",
+)
+REVIEW_COLUMNS = ", ".join(REVIEW_FIELDS)
 
-class PostgresDb:
-    @staticmethod
-    def datetime_serialize(obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        raise TypeError(f"Type {type(obj)} is not serializable")
+# Mirrors star_bucket: ROUND on numeric rounds halves away from zero
+RATING_STATS_QUERY = """
+    SELECT
+        book_id,
+        count(*) AS review_count,
+        sum(rating) AS rating_sum,
+        count(*) FILTER (WHERE LEAST(5, GREATEST(1, ROUND(rating))) = 1) AS stars_1,
+        count(*) FILTER (WHERE LEAST(5, GREATEST(1, ROUND(rating))) = 2) AS stars_2,
+        count(*) FILTER (WHERE LEAST(5, GREATEST(1, ROUND(rating))) = 3) AS stars_3,
+        count(*) FILTER (WHERE LEAST(5, GREATEST(1, ROUND(rating))) = 4) AS stars_4,
+        count(*) FILTER (WHERE LEAST(5, GREATEST(1, ROUND(rating))) = 5) AS stars_5
+    FROM reviews
+    WHERE rating IS NOT NULL
+    GROUP BY book_id
+"""
 
-    async def __aenter__(self):
-        self.pool = await asyncpg.create_pool(DATABASE_URL)
-        return self
 
-    async def __aexit__(self, exc_type, exc, tb):
-        await self.pool.close()
+def _search_statement(by_book: bool, paged: bool) -> str:
+    """Ranked full-text search over comments, ordered by (rank DESC, id).
 
-    async def create_review(self, review_data: Dict[str, Any]) -> Dict[str, Any]:
-        review_id = review_data["id"] or str(uuid4())
-        data_json = json.dumps(review_data, default=PostgresDb.datetime_serialize)
+    The GIN index on comment_tsv finds the matches; every match is then
+    ranked, so the cost grows with how many reviews the query matches.
+    """
+    params = iter(range(2, 6))
+    conditions = ["comment_tsv @@ query"]
+    if by_book:
+        conditions.append(f"book_id = ${next(params)}")
+    keyset = ""
+    if paged:
+        rank, row_id = next(params), next(params)
+        keyset = f"WHERE rank < ${rank} OR (rank = ${rank} AND id > ${row_id})"
 
-        async with self.pool.acquire() as conn:
-            query = """
-                INSERT INTO reviews(id, user_id, book_id, rating, comment, data, created_at, updated_at)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-                RETURNING *
-            """
+    return f"""
+        SELECT {REVIEW_COLUMNS}, rank FROM (
+            SELECT {REVIEW_COLUMNS}, ts_rank(comment_tsv, query) AS rank
+            FROM reviews, websearch_to_tsquery('english', $1) AS query
+            WHERE {" AND ".join(conditions)}
+        ) AS matches
+        {keyset}
+        ORDER BY rank DESC, id
+        LIMIT ${next(params)}
+    """
+
+
+def star_bucket(rating: Any) -> int:
+    """Map a rating such as 3.5 to the 1-5 histogram bucket it is counted in."""
+    rounded = Decimal(str(rating)).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+    return min(5, max(1, int(rounded)))
+
+
+def rating_deltas(
+    changes: List[Tuple[str, Any, int]],
+) -> Dict[str, List[Any]]:
+    """Fold (book_id, rating, +1/-1) changes into per-book stats deltas.
+
+    Each delta is [review_count, rating_sum, stars_1, ..., stars_5].
+    """
+    deltas = defaultdict(lambda: [0, Decimal(0), 0, 0, 0, 0, 0])
+    for book_id, rating, sign in changes:
+        if rating is None:
+            continue
+        delta = deltas[book_id]
+        delta[0] += sign
+        delta[1] += Decimal(str(rating)) * sign
+        delta[1 + star_bucket(rating)] += sign
+
+    return {
+        book_id: delta
+        for book_id, delta in deltas.items()
+        if delta[0] or any(delta[1:])
+    }
+
+
+async def apply_rating_deltas(conn, deltas: Dict[str, List[Any]]) -> None:
+    """Add per-book deltas to book_rating_stats; must run inside the review write's transaction."""
+    if not deltas:
+        return
+
+    query = """
+        INSERT INTO book_rating_stats
+            (book_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5, updated_at)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, now())
+        ON CONFLICT (book_id) DO UPDATE SET
+            review_count = book_rating_stats.review_count + EXCLUDED.review_count,
+            rating_sum = book_rating_stats.rating_sum + EXCLUDED.rating_sum,
+            stars_1 = book_rating_stats.stars_1 + EXCLUDED.stars_1,
+            stars_2 = book_rating_stats.stars_2 + EXCLUDED.stars_2,
+            stars_3 = book_rating_stats.stars_3 + EXCLUDED.stars_3,
+            stars_4 = book_rating_stats.stars_4 + EXCLUDED.stars_4,
+            stars_5 = book_rating_stats.stars_5 + EXCLUDED.stars_5,
+            updated_at = EXCLUDED.updated_at
+    """
+    # Sorted so concurrent writers touching the same books lock rows in the same order
+    await conn.executemany(
+        query, [(book_id, *deltas[book_id]) for book_id in sorted(deltas)]
+    )
+
+
+class ReviewRepository(PostgresDb):
+    table = "reviews"
+    fields = REVIEW_FIELDS
+    statements = {
+        "create_review": f"""
+            INSERT INTO reviews(id, user_id, book_id, rating, comment, data, created_at, updated_at)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+            RETURNING {REVIEW_COLUMNS}
+        """,
+        "existing_users": """
+            SELECT id FROM users WHERE id = ANY($1::varchar[])
+        """,
+        "existing_books": """
+            SELECT id FROM books WHERE id = ANY($1::varchar[])
+        """,
+        "get_review": f"""
+            SELECT {REVIEW_COLUMNS} FROM reviews WHERE id = $1
+        """,
+        "get_book_reviews": f"""
+            SELECT {REVIEW_COLUMNS} FROM reviews
+            WHERE book_id = $1
+            ORDER BY created_at, id
+            LIMIT $2
+        """,
+        "get_book_reviews_after": f"""
+            SELECT {REVIEW_COLUMNS} FROM reviews
+            WHERE book_id = $1 AND (created_at, id) > ($2, $3)
+            ORDER BY created_at, id
+            LIMIT $4
+        """,
+        "iter_reviews": f"""
+            SELECT {REVIEW_COLUMNS} FROM reviews
+            ORDER BY created_at, id
+        """,
+        "iter_reviews_since": f"""
+            SELECT {REVIEW_COLUMNS} FROM reviews
+            WHERE created_at >= $1
+            ORDER BY created_at, id
+        """,
+        "search_reviews": _search_statement(by_book=False, paged=False),
+        "search_reviews_after": _search_statement(by_book=False, paged=True),
+        "search_book_reviews": _search_statement(by_book=True, paged=False),
+        "search_book_reviews_after": _search_statement(by_book=True, paged=True),
+        # The self-join hands back the pre-update rating for the stats delta
+        "update_review": """
+            UPDATE reviews
+            SET {set_clause}
+            FROM (SELECT id, rating FROM reviews WHERE id = $1 FOR UPDATE) AS old
+            WHERE reviews.id = old.id
+            RETURNING
+                reviews.id, reviews.user_id, reviews.book_id, reviews.rating,
+                reviews.comment, reviews.created_at, reviews.updated_at,
+                old.rating AS old_rating
+        """,
+        "delete_review": """
+            DELETE FROM reviews
+            WHERE id = $1
+            RETURNING id, book_id, rating
+        """,
+        "delete_reviews": """
+            DELETE FROM reviews
+        """,
+        "delete_rating_stats": """
+            DELETE FROM book_rating_stats
+        """,
+        "rating_stats_drift": f"""
+            WITH actual AS ({RATING_STATS_QUERY})
+            SELECT
+                COALESCE(a.book_id, s.book_id) AS book_id,
+                a.review_count AS expected_count,
+                s.review_count AS stored_count,
+                a.rating_sum AS expected_sum,
+                s.rating_sum AS stored_sum
+            FROM actual a
+            FULL OUTER JOIN book_rating_stats s ON s.book_id = a.book_id
+            WHERE (a.review_count, a.rating_sum, a.stars_1, a.stars_2, a.stars_3, a.stars_4, a.stars_5)
+                IS DISTINCT FROM
+                (s.review_count, s.rating_sum, s.stars_1, s.stars_2, s.stars_3, s.stars_4, s.stars_5)
+                AND COALESCE(a.review_count, s.review_count) <> 0
+        """,
+        "rebuild_rating_stats": f"""
+            INSERT INTO book_rating_stats
+                (book_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5, updated_at)
+            SELECT
+                book_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5, now()
+            FROM ({RATING_STATS_QUERY}) AS actual
+        """,
+    }
+
+    async def create_review(self, review_data: Dict[str, Any]) -> Dict[str, Any]:
+        async with self.pool.acquire() as conn, conn.transaction():
             row = await conn.fetchrow(
-                query,
-                review_id,
+                self.statements["create_review"],
+                review_data["id"] or str(uuid4()),
                 review_data["user_id"],
                 review_data["book_id"],
                 review_data["rating"],
                 review_data["comment"],
-                data_json,
+                self.data_json(review_data),
                 review_data["created_at"],
                 review_data["updated_at"],
             )
             if row:
-                return {
-                    "id": row["id"],
-                    "user_id": row["user_id"],
-                    "book_id": row["book_id"],
-                    "rating": row["rating"],
-                    "comment": row["comment"],
-                    "created_at": row["created_at"],
-                    "updated_at": row["updated_at"],
-                }
+                await apply_rating_deltas(
+                    conn, rating_deltas([(row["book_id"], row["rating"], 1)])
+                )
+                return dict(row)
 
             return {}
 
-    async def get_review(self, review_id: str) -> Dict[str, Any]:
+    async def find_missing_references(
+        self, user_ids: List[str], book_ids: List[str]
+    ) -> Tuple[Set[str], Set[str]]:
+        """Return the user and book ids that do not exist."""
         async with self.pool.acquire() as conn:
-            query = """
-                SELECT * FROM reviews WHERE id = $1
-            """
-            row = await conn.fetchrow(query, review_id)
-            if row:
-                return {
-                    "id": row["id"],
-                    "user_id": row["user_id"],
-                    "book_id": row["book_id"],
-                    "rating": row["rating"],
-                    "comment": row["comment"],
-                    "created_at": row["created_at"],
-                    "updated_at": row["updated_at"],
-                }
+            users = {
+                row["id"]
+                for row in await conn.fetch(self.statements["existing_users"], user_ids)
+            }
+            books = {
+                row["id"]
+                for row in await conn.fetch(self.statements["existing_books"], book_ids)
+            }
 
-            return {}
+        return set(user_ids) - users, set(book_ids) - books
+
+    async def create_reviews(self, reviews: List[Dict[str, Any]]) -> None:
+        records = [
+            (
+                review["id"],
+                review["user_id"],
+                review["book_id"],
+                review["rating"],
+                review["comment"],
+                self.data_json(review),
+                review["created_at"],
+                review["updated_at"],
+            )
+            for review in reviews
+        ]
 
-    async def get_book_reviews(self, book_id: str) -> list[Dict[str, Any]]:
         async with self.pool.acquire() as conn:
-            query = """
-                SELECT * FROM reviews WHERE book_id = $1
-            """
-            rows = await conn.fetch(query, book_id)
-            reviews = []
-            if rows:
-                for row in rows:
-                    reviews.append(
-                        {
-                            "id": row["id"],
-                            "user_id": row["user_id"],
-                            "book_id": row["book_id"],
-                            "rating": row["rating"],
-                            "comment": row["comment"],
-                            "created_at": row["created_at"],
-                            "updated_at": row["updated_at"],
-                        }
-                    )
+            async with conn.transaction():
+                await conn.copy_records_to_table(
+                    "reviews",
+                    records=records,
+                    columns=[
+                        "id",
+                        "user_id",
+                        "book_id",
+                        "rating",
+                        "comment",
+                        "data",
+                        "created_at",
+                        "updated_at",
+                    ],
+                )
+                await apply_rating_deltas(
+                    conn,
+                    rating_deltas(
+                        [(review["book_id"], review["rating"], 1) for review in reviews]
+                    ),
+                )
 
-                return reviews
+    async def get_review(self, review_id: str) -> Dict[str, Any]:
+        return await self.fetchrow("get_review", review_id) or {}
 
-            return None
+    async def get_book_reviews(
+        self,
+        book_id: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        after: Optional[Keyset] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        if after is None:
+            reviews = await self.fetch("get_book_reviews", book_id, limit)
+        else:
+            reviews = await self.fetch(
+                "get_book_reviews_after", book_id, after[0], after[1], limit
+            )
 
-    async def update_review(self, review_id: str, update_entry: Dict[str, Any]) -> None:
-        data_json = json.dumps(update_entry, default=PostgresDb.datetime_serialize)
+        return reviews or None
 
+    async def iter_reviews(
+        self, since: Optional[datetime] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
         async with self.pool.acquire() as conn:
-            query = """
-                UPDATE reviews
-                SET user_id = $2, book_id = $3, rating = $4, comment = $5, data = $6, updated_at = $7
-                WHERE id = $1
-            """
-            await conn.execute(
-                query,
-                review_id,
-                update_entry["user_id"],
-                update_entry["book_id"],
-                update_entry["rating"],
-                update_entry["comment"],
-                data_json,
-                update_entry["updated_at"],
+            # Server-side cursors only live inside a transaction
+            async with conn.transaction():
+                if since is None:
+                    cursor = conn.cursor(
+                        self.statements["iter_reviews"], prefetch=EXPORT_BATCH_SIZE
+                    )
+                else:
+                    cursor = conn.cursor(
+                        self.statements["iter_reviews_since"],
+                        since,
+                        prefetch=EXPORT_BATCH_SIZE,
+                    )
+                async for row in cursor:
+                    yield dict(row)
+
+    async def search_reviews(
+        self,
+        query: str,
+        book_id: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        after: Optional[RankKeyset] = None,
+    ) -> List[Dict[str, Any]]:
+        """Reviews whose comment matches a web-style search ``query``, best first."""
+        statement = "search_reviews"
+        args: List[Any] = [query]
+        if book_id is not None:
+            statement = "search_book_reviews"
+            args.append(book_id)
+        if after is not None:
+            statement += "_after"
+            args.extend(after)
+
+        return await self.fetch(statement, *args, limit)
+
+    async def update_review(
+        self, review_id: str, update_entry: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        set_clause, params = build_set_clause(
+            update_entry, UPDATABLE_COLUMNS, merge_data=not self.lean_data
+        )
+        query = self.statements["update_review"].format(set_clause=set_clause)
+
+        async with self.pool.acquire() as conn, conn.transaction():
+            row = await conn.fetchrow(query, review_id, *params)
+            if not row:
+                return None
+
+            review = dict(row)
+            old_rating = review.pop("old_rating")
+            if "rating" in update_entry:
+                await apply_rating_deltas(
+                    conn,
+                    rating_deltas(
+                        [
+                            (review["book_id"], old_rating, -1),
+                            (review["book_id"], review["rating"], 1),
+                        ]
+                    ),
+                )
+
+            return review
+
+    async def delete_review(self, review_id: str) -> Optional[str]:
+        async with self.pool.acquire() as conn, conn.transaction():
+            row = await conn.fetchrow(self.statements["delete_review"], review_id)
+            if not row:
+                return None
+
+            await apply_rating_deltas(
+                conn, rating_deltas([(row["book_id"], row["rating"], -1)])
             )
 
-    async def delete_review(self, review_id: str) -> None:
-        async with self.pool.acquire() as conn:
-            query = """
-                DELETE FROM reviews
-                WHERE id = $1
-            """
-            await conn.execute(query, review_id)
+            return row["id"]
+
+    async def delete_reviews(self) -> int:
+        async with self.pool.acquire() as conn, conn.transaction():
+            status = await conn.execute(self.statements["delete_reviews"])
+            await conn.execute(self.statements["delete_rating_stats"])
+
+            return int(status.split()[-1])
+
+    async def find_rating_stats_drift(self) -> List[Dict[str, Any]]:
+        """Compare book_rating_stats against a full recomputation from reviews."""
+        return await self.fetch("rating_stats_drift")
+
+    async def rebuild_rating_stats(self) -> int:
+        """Recompute book_rating_stats from scratch, returning the number of books."""
+        async with self.pool.acquire() as conn, conn.transaction():
+            # Block review writes so no delta lands between the delete and the insert
+            await conn.execute("LOCK TABLE reviews IN SHARE MODE")
+            await conn.execute(self.statements["delete_rating_stats"])
+            status = await conn.execute(self.statements["rebuild_rating_stats"])
+
+            return int(status.split()[-1])
@@ -0,0 +1,1185 @@
+"""Embedded SQLite storage for single-node deployments.
+
+Selected with ``DB_BACKEND=sqlite``; the database is the file at
+``SQLITE_PATH``, created with the schema in api/migrations/sqlite on startup.
+The journal is in WAL mode, so readers never block the writer or each other.
+Each worker process holds one writer connection and ``SQLITE_READERS`` reader
+connections, each run by aiosqlite on its own thread. Every write goes
+through the writer, one ``BEGIN IMMEDIATE`` transaction at a time, so writes
+are serialized while reads run concurrently on the readers. Writers in
+other processes wait up to ``SQLITE_BUSY_TIMEOUT_MS`` for the file lock.
+
+The repositories here have the same methods and return the same shapes as
+the PostgreSQL ones. Review search uses FTS5 (Porter stemming, bm25 rank)
+instead of tsvector, and fuzzy book matches use an FTS5 trigram index whose
+candidates are scored like pg_trgm's word_similarity. Needs SQLite 3.39 or
+newer for RETURNING, the trigram tokenizer and FULL OUTER JOIN.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+from uuid import uuid4
+
+import aiosqlite
+
+from api.db.base import PostgresDb
+from api.db.books import BOOK_FIELDS
+from api.db.books import UPDATABLE_COLUMNS as BOOK_UPDATABLE_COLUMNS
+from api.db.leaderboards import (
+    BOARDS,
+    LEADERBOARD_SIZE,
+    TOP_PRIOR_WEIGHT,
+    TRENDING_HALF_LIFE_HOURS,
+    TRENDING_WINDOW_DAYS,
+)
+from api.db.memory import SIMILARITY_THRESHOLD, similarity, trigrams
+from api.db.pagination import DEFAULT_PAGE_SIZE, Keyset, RankKeyset
+from api.db.reviews import EXPORT_BATCH_SIZE, REVIEW_FIELDS
+from api.db.reviews import UPDATABLE_COLUMNS as REVIEW_UPDATABLE_COLUMNS
+from api.db.reviews import rating_deltas
+from api.db.users import UPDATABLE_COLUMNS as USER_UPDATABLE_COLUMNS
+from api.db.users import USER_FIELDS
+from api.metrics import pool_acquire_latency
+from api.tracing import query_timing
+
+logger = logging.getLogger(__name__)
+
+SQLITE_PATH = os.getenv("SQLITE_PATH", "bookreview.db")
+SQLITE_READERS = int(os.getenv("SQLITE_READERS", "4"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SCHEMA_PATH = Path(__file__).parent.parent / "migrations" / "sqlite" / "schema.sql"
+
+# Fuzzy matching rescores this many trigram index hits per requested row
+SIMILAR_CANDIDATES_PER_ROW = 20
+
+# Timestamps are stored as ISO 8601 text and read back through the declared
+# column type; rating sums arrive from rating_deltas as Decimal
+sqlite3.register_adapter(datetime, datetime.isoformat)
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_converter(
+    "TIMESTAMP", lambda value: datetime.fromisoformat(value.decode())
+)
+
+
+class SqliteDatabase:
+    """The writer and reader connections of one worker process."""
+
+    def __init__(self, path: str, readers: int = SQLITE_READERS):
+        self.path = path
+        self.reader_count = readers
+        self.writer: Optional[aiosqlite.Connection] = None
+        self.idle: Deque[aiosqlite.Connection] = deque()
+        # Readers are handed to waiters in arrival order; with a plain queue a
+        # task that just released one could take it straight back
+        self.reader_waiters: Deque[asyncio.Future] = deque()
+        self.write_lock = asyncio.Lock()
+        self.write_waiting = 0
+
+    async def _connect(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(
+            self.path,
+            isolation_level=None,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            cached_statements=256,
+            iter_chunk_size=EXPORT_BATCH_SIZE,
+        )
+        conn.row_factory = sqlite3.Row
+        await conn.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        await conn.execute("PRAGMA foreign_keys = ON")
+        # With WAL, NORMAL only syncs at checkpoints: a power loss can drop
+        # the last commits but never corrupts the database
+        await conn.execute("PRAGMA synchronous = NORMAL")
+        await conn.create_function("power", 2, math.pow, deterministic=True)
+
+        return conn
+
+    async def open(self) -> None:
+        self.writer = await self._connect()
+        await self.writer.execute("PRAGMA journal_mode = WAL")
+        await self.writer.executescript(SCHEMA_PATH.read_text())
+        for _ in range(self.reader_count):
+            conn = await self._connect()
+            await conn.execute("PRAGMA query_only = ON")
+            self.idle.append(conn)
+
+    async def close(self) -> None:
+        while self.idle:
+            await self.idle.pop().close()
+        if self.writer is not None:
+            # Runs ANALYZE on the tables whose statistics are missing or out
+            # of date. Closing the last connection to the file then
+            # checkpoints the WAL into the database and removes it
+            await self.writer.execute("PRAGMA optimize")
+            await self.writer.close()
+            self.writer = None
+
+    def _waited(self, started: float) -> None:
+        waited = time.perf_counter() - started
+        pool_acquire_latency.observe((), waited)
+        timing = query_timing.get()
+        if timing is not None:
+            timing.acquire_ms += waited * 1000
+
+    def _release(self, conn: aiosqlite.Connection) -> None:
+        while self.reader_waiters:
+            waiter = self.reader_waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(conn)
+                return
+        self.idle.append(conn)
+
+    @asynccontextmanager
+    async def read(self) -> AsyncIterator[aiosqlite.Connection]:
+        started = time.perf_counter()
+        if self.idle:
+            conn = self.idle.pop()
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self.reader_waiters.append(waiter)
+            try:
+                conn = await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._release(waiter.result())
+                raise
+        self._waited(started)
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    @asynccontextmanager
+    async def write(
+        self, transaction: bool = True
+    ) -> AsyncIterator[aiosqlite.Connection]:
+        """The writer connection, inside a transaction committed on exit."""
+        started = time.perf_counter()
+        self.write_waiting += 1
+        try:
+            await self.write_lock.acquire()
+        finally:
+            self.write_waiting -= 1
+        self._waited(started)
+        try:
+            if not transaction:
+                yield self.writer
+                return
+
+            # IMMEDIATE takes the file's write lock up front, so a
+            # transaction never fails half way on another process's lock
+            await self.writer.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.writer
+            except BaseException:
+                await self.writer.execute("ROLLBACK")
+                raise
+            await self.writer.execute("COMMIT")
+        finally:
+            self.write_lock.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "readers": self.reader_count,
+            "idle_readers": len(self.idle),
+            "waiting_readers": sum(not w.done() for w in self.reader_waiters),
+            "waiting_writers": self.write_waiting,
+        }
+
+
+_database: Optional[SqliteDatabase] = None
+
+
+async def init_db(path: Optional[str] = None) -> SqliteDatabase:
+    """Open the process-wide connections shared by every SQLite repository."""
+    global _database
+    if _database is None:
+        path = path or SQLITE_PATH
+        database = SqliteDatabase(path)
+        await database.open()
+        _database = database
+        logger.info(
+            "SQLite database %s opened (%s readers)", path, database.reader_count
+        )
+
+    return _database
+
+
+async def close_db() -> None:
+    global _database
+    if _database is None:
+        return
+
+    database, _database = _database, None
+    await database.close()
+    logger.info("SQLite database closed")
+
+
+def get_db() -> SqliteDatabase:
+    if _database is None:
+        raise RuntimeError(
+            "SQLite database is not open. It is opened on application startup"
+        )
+
+    return _database
+
+
+def build_set_clause(
+    fields: Dict[str, Any], columns: Tuple[str, ...], merge_data: bool = True
+) -> Tuple[str, List[Any]]:
+    """SQLite version of api.db.updates.build_set_clause; ``?1`` is the row id."""
+    updates = {column: fields[column] for column in columns if column in fields}
+    assignments = [f"{column} = ?{index}" for index, column in enumerate(updates, 2)]
+    params = list(updates.values())
+    if merge_data:
+        # json_patch drops keys patched to null where jsonb || keeps them
+        assignments.append(f"data = json_patch(data, ?{len(updates) + 2})")
+        params.append(json.dumps(updates, default=PostgresDb.datetime_serialize))
+
+    return ", ".join(assignments), params
+
+
+def _fts_query(query: str) -> Optional[str]:
+    """Translate web-style search syntax into an FTS5 query.
+
+    Quoted text is a phrase, a leading ``-`` excludes a term and ``or``
+    joins two terms; every other term is required. Returns None when
+    nothing is left to match on.
+    """
+    required: List[str] = []
+    excluded: List[str] = []
+    join_next = False
+    for negate, phrase, word in re.findall(r'(-?)(?:"([^"]*)"|(\S+))', query):
+        text = phrase or word
+        if not phrase and text.lower() == "or":
+            join_next = bool(required)
+            continue
+        words = re.findall(r"\w+", text)
+        if not words:
+            continue
+        term = '"' + " ".join(words) + '"'
+        if negate:
+            excluded.append(term)
+        elif join_next:
+            required[-1] = f"({required[-1]} OR {term})"
+        else:
+            required.append(term)
+        join_next = False
+
+    if not required:
+        return None
+
+    return " AND ".join(required) + "".join(f" NOT {term}" for term in excluded)
+
+
+class SqliteDb(PostgresDb):
+    """Base of the SQLite repositories; runs ``statements`` on the connections.
+
+    Reads go to a reader connection and ``execute`` to the writer.
+    """
+
+    def __init__(self, database: Optional[SqliteDatabase] = None):
+        self.database = database
+
+    async def __aenter__(self):
+        if self.database is None:
+            self.database = get_db()
+        return self
+
+    async def fetch(self, statement: str, *args: Any) -> List[Dict[str, Any]]:
+        async with self.database.read() as conn:
+            async with conn.execute(self.statements[statement], args) as cursor:
+                rows = await cursor.fetchall()
+
+        return [dict(row) for row in rows]
+
+    async def fetchrow(self, statement: str, *args: Any) -> Optional[Dict[str, Any]]:
+        async with self.database.read() as conn:
+            async with conn.execute(self.statements[statement], args) as cursor:
+                row = await cursor.fetchone()
+
+        return dict(row) if row else None
+
+    async def fetchval(self, statement: str, *args: Any) -> Any:
+        row = await self.fetchrow(statement, *args)
+        return next(iter(row.values())) if row else None
+
+    async def execute(self, statement: str, *args: Any) -> int:
+        """Run a write statement, returning the number of rows it affected."""
+        async with self.database.write() as conn:
+            cursor = await conn.execute(self.statements[statement], args)
+
+        return cursor.rowcount
+
+    async def _iterate(self, statement: str, *args: Any):
+        async with self.database.read() as conn:
+            async with conn.execute(self.statements[statement], args) as cursor:
+                async for row in cursor:
+                    yield dict(row)
+
+    async def compact_data(self, batch_size: int = 1000) -> int:
+        """Strip the typed columns out of existing data copies, in id order."""
+        paths = [f"$.{key}" for key in self.fields]
+        placeholders = ", ".join("?" for _ in paths)
+        compacted = 0
+        after = ""
+        while True:
+            async with self.database.write() as conn:
+                cursor = await conn.execute(
+                    f"SELECT id FROM {self.table} WHERE id > ? ORDER BY id LIMIT ?",
+                    (after, batch_size),
+                )
+                ids = [row["id"] for row in await cursor.fetchall()]
+                if not ids:
+                    return compacted
+
+                cursor = await conn.execute(
+                    f"""
+                    UPDATE {self.table}
+                    SET data = json_remove(data, {placeholders})
+                    WHERE id IN (SELECT value FROM json_each(?))
+                        AND EXISTS (
+                            SELECT 1 FROM json_each(data)
+                            WHERE key IN (SELECT value FROM json_each(?))
+                        )
+                    """,
+                    (*paths, json.dumps(ids), json.dumps(list(self.fields))),
+                )
+                compacted += cursor.rowcount
+                after = ids[-1]
+
+    async def vacuum(self, full: bool = False) -> None:
+        # VACUUM always rebuilds the whole file, so there is no lighter mode
+        async with self.database.write(transaction=False) as conn:
+            await conn.execute("VACUUM")
+            await conn.execute(f"ANALYZE {self.table}")
+
+    async def relation_sizes(self) -> Dict[str, int]:
+        """Bytes used by the table, its indexes and live data values."""
+        async with self.database.read() as conn:
+            async with conn.execute(
+                f"""
+                SELECT
+                    (SELECT coalesce(sum(pgsize), 0) FROM dbstat WHERE name = ?1)
+                        AS "table",
+                    (
+                        SELECT coalesce(sum(pgsize), 0) FROM dbstat
+                        WHERE name IN (
+                            SELECT name FROM sqlite_schema
+                            WHERE type = 'index' AND tbl_name = ?1
+                        )
+                    ) AS indexes,
+                    (
+                        SELECT coalesce(sum(length(CAST(data AS BLOB))), 0)
+                        FROM {self.table}
+                    ) AS data
+                """,
+                (self.table,),
+            ) as cursor:
+                return dict(await cursor.fetchone())
+
+
+class SqliteBookRepository(SqliteDb):
+    table = "books"
+    fields = BOOK_FIELDS
+    statements = {
+        "create_book": """
+            INSERT INTO books(id, title, author, isbn, data, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        "get_book": """
+            SELECT id, title, author, isbn, created_at, updated_at
+            FROM books WHERE id = ?
+        """,
+        "get_books": """
+            SELECT id, title, author, isbn, created_at, updated_at FROM books
+            ORDER BY created_at, id
+            LIMIT ?
+        """,
+        "get_books_after": """
+            SELECT id, title, author, isbn, created_at, updated_at FROM books
+            WHERE (created_at, id) > (?, ?)
+            ORDER BY created_at, id
+            LIMIT ?
+        """,
+        "iter_books": """
+            SELECT id, title, author, isbn, created_at, updated_at FROM books
+            ORDER BY created_at, id
+        """,
+        "iter_books_since": """
+            SELECT id, title, author, isbn, created_at, updated_at FROM books
+            WHERE created_at >= ?
+            ORDER BY created_at, id
+        """,
+        "iter_book_titles": """
+            SELECT id, title, author FROM books
+        """,
+        # Books sharing the most trigrams with the text, rescored in Python
+        "similar_book_candidates": """
+            SELECT b.id, b.title, b.author
+            FROM books_trigram
+            JOIN books b ON b.seq = books_trigram.rowid
+            WHERE books_trigram MATCH ?
+            ORDER BY books_trigram.rank
+            LIMIT ?
+        """,
+        "get_book_stats": """
+            SELECT
+                b.id AS book_id,
+                coalesce(s.review_count, 0) AS review_count,
+                coalesce(s.rating_sum, 0) AS rating_sum,
+                coalesce(s.stars_1, 0) AS stars_1,
+                coalesce(s.stars_2, 0) AS stars_2,
+                coalesce(s.stars_3, 0) AS stars_3,
+                coalesce(s.stars_4, 0) AS stars_4,
+                coalesce(s.stars_5, 0) AS stars_5
+            FROM books b
+            LEFT JOIN book_rating_stats s ON s.book_id = b.id
+            WHERE b.id = ?
+        """,
+        "update_book": """
+            UPDATE books
+            SET {set_clause}
+            WHERE id = ?1
+            RETURNING id, title, author, isbn, created_at, updated_at
+        """,
+        "delete_book": """
+            DELETE FROM books
+            WHERE id = ?
+            RETURNING id
+        """,
+        "delete_books": """
+            DELETE FROM books
+        """,
+    }
+
+    async def create_book(self, book_data: Dict[str, Any]) -> Dict[str, Any]:
+        if not book_data["id"]:
+            book_data = {**book_data, "id": str(uuid4())}
+
+        await self.execute(
+            "create_book",
+            book_data["id"],
+            book_data["title"],
+            book_data["author"],
+            book_data["isbn"],
+            self.data_json(book_data),
+            book_data["created_at"],
+            book_data["updated_at"],
+        )
+
+        return book_data
+
+    async def create_books(self, books: List[Dict[str, Any]]) -> None:
+        async with self.database.write() as conn:
+            await conn.executemany(
+                self.statements["create_book"],
+                [
+                    (
+                        book["id"],
+                        book["title"],
+                        book["author"],
+                        book["isbn"],
+                        self.data_json(book),
+                        book["created_at"],
+                        book["updated_at"],
+                    )
+                    for book in books
+                ],
+            )
+
+    async def get_book(self, book_id: str) -> Optional[Dict[str, Any]]:
+        return await self.fetchrow("get_book", book_id)
+
+    async def get_books(
+        self, limit: int = DEFAULT_PAGE_SIZE, after: Optional[Keyset] = None
+    ) -> List[Dict[str, Any]]:
+        if after is None:
+            return await self.fetch("get_books", limit)
+
+        return await self.fetch("get_books_after", after[0], after[1], limit)
+
+    def iter_books(
+        self, since: Optional[datetime] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        if since is None:
+            return self._iterate("iter_books")
+
+        return self._iterate("iter_books_since", since)
+
+    def iter_book_titles(self) -> AsyncIterator[Dict[str, Any]]:
+        return self._iterate("iter_book_titles")
+
+    async def find_similar_books(
+        self, text: str, limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """Typo-tolerant title and author matches, closest first."""
+        query = trigrams(text)
+        # The trigram tokenizer indexes raw three-character runs, without
+        # pg_trgm's padding, so only those can be looked up
+        grams = {gram for gram in query if " " not in gram}
+        if not grams:
+            return []
+
+        candidates = await self.fetch(
+            "similar_book_candidates",
+            " OR ".join(f'"{gram}"' for gram in sorted(grams)),
+            limit * SIMILAR_CANDIDATES_PER_ROW,
+        )
+        matches = []
+        for book in candidates:
+            score = max(
+                similarity(query, book["title"]), similarity(query, book["author"])
+            )
+            if score >= SIMILARITY_THRESHOLD:
+                matches.append({**book, "score": score})
+        matches.sort(key=lambda book: (-book["score"], book["id"]))
+
+        return matches[:limit]
+
+    async def get_book_stats(self, book_id: str) -> Optional[Dict[str, Any]]:
+        row = await self.fetchrow("get_book_stats", book_id)
+        if row:
+            count = row["review_count"]
+            return {
+                "book_id": row["book_id"],
+                "review_count": count,
+                "average_rating": (
+                    round(float(row["rating_sum"]) / count, 2) if count else None
+                ),
+                "histogram": {
+                    str(stars): row[f"stars_{stars}"] for stars in range(1, 6)
+                },
+            }
+
+        return None
+
+    async def update_book(
+        self, book_id: str, update_entry: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        set_clause, params = build_set_clause(
+            update_entry, BOOK_UPDATABLE_COLUMNS, merge_data=not self.lean_data
+        )
+        query = self.statements["update_book"].format(set_clause=set_clause)
+
+        async with self.database.write() as conn:
+            async with conn.execute(query, (book_id, *params)) as cursor:
+                row = await cursor.fetchone()
+
+        return dict(row) if row else None
+
+    async def delete_book(self, book_id: str) -> Optional[str]:
+        async with self.database.write() as conn:
+            async with conn.execute(
+                self.statements["delete_book"], (book_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
+
+        return row["id"] if row else None
+
+    async def delete_books(self) -> int:
+        return await self.execute("delete_books")
+
+
+class SqliteUserRepository(SqliteDb):
+    table = "users"
+    fields = USER_FIELDS
+    statements = {
+        "create_user": """
+            INSERT INTO users(id, username, email, data, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        "get_user": """
+            SELECT id, username, email, created_at, updated_at
+            FROM users WHERE id = ?
+        """,
+        "get_users": """
+            SELECT id, username, email, created_at, updated_at FROM users
+            ORDER BY created_at, id
+            LIMIT ?
+        """,
+        "get_users_after": """
+            SELECT id, username, email, created_at, updated_at FROM users
+            WHERE (created_at, id) > (?, ?)
+            ORDER BY created_at, id
+            LIMIT ?
+        """,
+        "iter_users": """
+            SELECT id, username, email, created_at, updated_at FROM users
+            ORDER BY created_at, id
+        """,
+        "iter_users_since": """
+            SELECT id, username, email, created_at, updated_at FROM users
+            WHERE created_at >= ?
+            ORDER BY created_at, id
+        """,
+        "update_user": """
+            UPDATE users
+            SET {set_clause}
+            WHERE id = ?1
+            RETURNING id, username, email, created_at, updated_at
+        """,
+        "delete_user": """
+            DELETE FROM users
+            WHERE id = ?
+            RETURNING id
+        """,
+        "delete_users": """
+            DELETE FROM users
+        """,
+    }
+
+    async def create_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        if not user_data["id"]:
+            user_data = {**user_data, "id": str(uuid4())}
+
+        await self.execute(
+            "create_user",
+            user_data["id"],
+            user_data["username"],
+            user_data["email"],
+            self.data_json(user_data),
+            user_data["created_at"],
+            user_data["updated_at"],
+        )
+
+        return user_data
+
+    async def create_users(self, users: List[Dict[str, Any]]) -> None:
+        async with self.database.write() as conn:
+            await conn.executemany(
+                self.statements["create_user"],
+                [
+                    (
+                        user["id"],
+                        user["username"],
+                        user["email"],
+                        self.data_json(user),
+                        user["created_at"],
+                        user["updated_at"],
+                    )
+                    for user in users
+                ],
+            )
+
+    async def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return await self.fetchrow("get_user", user_id)
+
+    async def get_users(
+        self, limit: int = DEFAULT_PAGE_SIZE, after: Optional[Keyset] = None
+    ) -> List[Dict[str, Any]]:
+        if after is None:
+            return await self.fetch("get_users", limit)
+
+        return await self.fetch("get_users_after", after[0], after[1], limit)
+
+    def iter_users(
+        self, since: Optional[datetime] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        if since is None:
+            return self._iterate("iter_users")
+
+        return self._iterate("iter_users_since", since)
+
+    async def update_user(
+        self, user_id: str, update_entry: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        set_clause, params = build_set_clause(
+            update_entry, USER_UPDATABLE_COLUMNS, merge_data=not self.lean_data
+        )
+        query = self.statements["update_user"].format(set_clause=set_clause)
+
+        async with self.database.write() as conn:
+            async with conn.execute(query, (user_id, *params)) as cursor:
+                row = await cursor.fetchone()
+
+        return dict(row) if row else None
+
+    async def delete_user(self, user_id: str) -> Optional[str]:
+        async with self.database.write() as conn:
+            async with conn.execute(
+                self.statements["delete_user"], (user_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
+
+        return row["id"] if row else None
+
+    async def delete_users(self) -> int:
+        return await self.execute("delete_users")
+
+
+REVIEW_COLUMNS = ", ".join(REVIEW_FIELDS)
+# RETURNING hands back a REAL column's value before affinity is applied, so
+# a whole rating would come back as an int
+REVIEW_RETURNING = REVIEW_COLUMNS.replace("rating", "CAST(rating AS REAL) AS rating")
+
+# Mirrors star_bucket: round() rounds halves away from zero. Ratings have one
+# decimal place but are stored as binary floats, so sums are rounded to one
+# place, here and in apply_rating_deltas, to stay comparable with each other
+RATING_STATS_QUERY = """
+    SELECT
+        book_id,
+        count(*) AS review_count,
+        round(sum(rating), 1) AS rating_sum,
+        count(*) FILTER (WHERE min(5, max(1, round(rating))) = 1) AS stars_1,
+        count(*) FILTER (WHERE min(5, max(1, round(rating))) = 2) AS stars_2,
+        count(*) FILTER (WHERE min(5, max(1, round(rating))) = 3) AS stars_3,
+        count(*) FILTER (WHERE min(5, max(1, round(rating))) = 4) AS stars_4,
+        count(*) FILTER (WHERE min(5, max(1, round(rating))) = 5) AS stars_5
+    FROM reviews
+    WHERE rating IS NOT NULL
+    GROUP BY book_id
+"""
+
+
+def _search_statement(by_book: bool, paged: bool) -> str:
+    """Ranked FTS5 search over comments, ordered by (rank DESC, id).
+
+    bm25 scores better matches lower, so its negation is the rank.
+    """
+    params = iter(range(2, 6))
+    conditions = ["reviews_fts MATCH ?1"]
+    if by_book:
+        conditions.append(f"r.book_id = ?{next(params)}")
+    keyset = ""
+    if paged:
+        rank, row_id = next(params), next(params)
+        keyset = f"WHERE rank < ?{rank} OR (rank = ?{rank} AND id > ?{row_id})"
+
+    return f"""
+        SELECT {REVIEW_COLUMNS}, rank FROM (
+            SELECT
+                r.id, r.user_id, r.book_id, r.rating, r.comment, r.created_at,
+                r.updated_at, -bm25(reviews_fts) AS rank
+            FROM reviews_fts
+            JOIN reviews r ON r.seq = reviews_fts.rowid
+            WHERE {" AND ".join(conditions)}
+        ) AS matches
+        {keyset}
+        ORDER BY rank DESC, id
+        LIMIT ?{next(params)}
+    """
+
+
+async def apply_rating_deltas(conn, deltas: Dict[str, List[Any]]) -> None:
+    """Add per-book deltas to book_rating_stats, inside the review write's transaction."""
+    if not deltas:
+        return
+
+    await conn.executemany(
+        """
+        INSERT INTO book_rating_stats
+            (book_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (book_id) DO UPDATE SET
+            review_count = review_count + excluded.review_count,
+            rating_sum = round(rating_sum + excluded.rating_sum, 1),
+            stars_1 = stars_1 + excluded.stars_1,
+            stars_2 = stars_2 + excluded.stars_2,
+            stars_3 = stars_3 + excluded.stars_3,
+            stars_4 = stars_4 + excluded.stars_4,
+            stars_5 = stars_5 + excluded.stars_5,
+            updated_at = excluded.updated_at
+        """,
+        [(book_id, *delta, datetime.now()) for book_id, delta in deltas.items()],
+    )
+
+
+class SqliteReviewRepository(SqliteDb):
+    table = "reviews"
+    fields = REVIEW_FIELDS
+    statements = {
+        "create_review": f"""
+            INSERT INTO reviews(id, user_id, book_id, rating, comment, data, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            RETURNING {REVIEW_RETURNING}
+        """,
+        "existing_users": """
+            SELECT id FROM users WHERE id IN (SELECT value FROM json_each(?))
+        """,
+        "existing_books": """
+            SELECT id FROM books WHERE id IN (SELECT value FROM json_each(?))
+        """,
+        "get_review": f"""
+            SELECT {REVIEW_COLUMNS} FROM reviews WHERE id = ?
+        """,
+        "get_book_reviews": f"""
+            SELECT {REVIEW_COLUMNS} FROM reviews
+            WHERE book_id = ?
+            ORDER BY created_at, id
+            LIMIT ?
+        """,
+        "get_book_reviews_after": f"""
+            SELECT {REVIEW_COLUMNS} FROM reviews
+            WHERE book_id = ? AND (created_at, id) > (?, ?)
+            ORDER BY created_at, id
+            LIMIT ?
+        """,
+        "iter_reviews": f"""
+            SELECT {REVIEW_COLUMNS} FROM reviews
+            ORDER BY created_at, id
+        """,
+        "iter_reviews_since": f"""
+            SELECT {REVIEW_COLUMNS} FROM reviews
+            WHERE created_at >= ?
+            ORDER BY created_at, id
+        """,
+        "search_reviews": _search_statement(by_book=False, paged=False),
+        "search_reviews_after": _search_statement(by_book=False, paged=True),
+        "search_book_reviews": _search_statement(by_book=True, paged=False),
+        "search_book_reviews_after": _search_statement(by_book=True, paged=True),
+        "get_rating": """
+            SELECT rating FROM reviews WHERE id = ?
+        """,
+        "update_review": f"""
+            UPDATE reviews
+            SET {{set_clause}}
+            WHERE id = ?1
+            RETURNING {REVIEW_RETURNING}
+        """,
+        "delete_review": """
+            DELETE FROM reviews
+            WHERE id = ?
+            RETURNING id, book_id, rating
+        """,
+        "delete_reviews": """
+            DELETE FROM reviews
+        """,
+        "delete_rating_stats": """
+            DELETE FROM book_rating_stats
+        """,
+        "rating_stats_drift": f"""
+            WITH actual AS ({RATING_STATS_QUERY})
+            SELECT
+                coalesce(a.book_id, s.book_id) AS book_id,
+                a.review_count AS expected_count,
+                s.review_count AS stored_count,
+                a.rating_sum AS expected_sum,
+                s.rating_sum AS stored_sum
+            FROM actual a
+            FULL OUTER JOIN book_rating_stats s ON s.book_id = a.book_id
+            WHERE (a.review_count, a.rating_sum, a.stars_1, a.stars_2, a.stars_3, a.stars_4, a.stars_5)
+                IS NOT
+                (s.review_count, s.rating_sum, s.stars_1, s.stars_2, s.stars_3, s.stars_4, s.stars_5)
+                AND coalesce(a.review_count, s.review_count) <> 0
+        """,
+        "rebuild_rating_stats": f"""
+            INSERT INTO book_rating_stats
+                (book_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5, updated_at)
+            SELECT
+                book_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5, ?
+            FROM ({RATING_STATS_QUERY}) AS actual
+        """,
+    }
+
+    def _record(self, review: Dict[str, Any]) -> Tuple[Any, ...]:
+        return (
+            review["id"] or str(uuid4()),
+            review["user_id"],
+            review["book_id"],
+            review["rating"],
+            review["comment"],
+            self.data_json(review),
+            review["created_at"],
+            review["updated_at"],
+        )
+
+    async def create_review(self, review_data: Dict[str, Any]) -> Dict[str, Any]:
+        async with self.database.write() as conn:
+            async with conn.execute(
+                self.statements["create_review"], self._record(review_data)
+            ) as cursor:
+                row = await cursor.fetchone()
+            if row:
+                await apply_rating_deltas(
+                    conn, rating_deltas([(row["book_id"], row["rating"], 1)])
+                )
+                return dict(row)
+
+            return {}
+
+    async def find_missing_references(
+        self, user_ids: List[str], book_ids: List[str]
+    ) -> Tuple[Set[str], Set[str]]:
+        """Return the user and book ids that do not exist."""
+        users = {
+            row["id"]
+            for row in await self.fetch("existing_users", json.dumps(user_ids))
+        }
+        books = {
+            row["id"]
+            for row in await self.fetch("existing_books", json.dumps(book_ids))
+        }
+
+        return set(user_ids) - users, set(book_ids) - books
+
+    async def create_reviews(self, reviews: List[Dict[str, Any]]) -> None:
+        async with self.database.write() as conn:
+            # The INSERT has a RETURNING clause, which executemany ignores
+            await conn.executemany(
+                self.statements["create_review"],
+                [self._record(review) for review in reviews],
+            )
+            await apply_rating_deltas(
+                conn,
+                rating_deltas(
+                    [(review["book_id"], review["rating"], 1) for review in reviews]
+                ),
+            )
+
+    async def get_review(self, review_id: str) -> Dict[str, Any]:
+        return await self.fetchrow("get_review", review_id) or {}
+
+    async def get_book_reviews(
+        self,
+        book_id: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        after: Optional[Keyset] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        if after is None:
+            reviews = await self.fetch("get_book_reviews", book_id, limit)
+        else:
+            reviews = await self.fetch(
+                "get_book_reviews_after", book_id, after[0], after[1], limit
+            )
+
+        return reviews or None
+
+    def iter_reviews(
+        self, since: Optional[datetime] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        if since is None:
+            return self._iterate("iter_reviews")
+
+        return self._iterate("iter_reviews_since", since)
+
+    async def search_reviews(
+        self,
+        query: str,
+        book_id: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        after: Optional[RankKeyset] = None,
+    ) -> List[Dict[str, Any]]:
+        """Reviews whose comment matches a web-style search ``query``, best first."""
+        match = _fts_query(query)
+        if match is None:
+            return []
+
+        statement = "search_reviews"
+        args: List[Any] = [match]
+        if book_id is not None:
+            statement = "search_book_reviews"
+            args.append(book_id)
+        if after is not None:
+            statement += "_after"
+            args.extend(after)
+
+        return await self.fetch(statement, *args, limit)
+
+    async def update_review(
+        self, review_id: str, update_entry: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        set_clause, params = build_set_clause(
+            update_entry, REVIEW_UPDATABLE_COLUMNS, merge_data=not self.lean_data
+        )
+        query = self.statements["update_review"].format(set_clause=set_clause)
+
+        # The writer holds the database's write lock for the whole
+        # transaction, so the rating read here is still current at the UPDATE
+        async with self.database.write() as conn:
+            async with conn.execute(
+                self.statements["get_rating"], (review_id,)
+            ) as cursor:
+                old = await cursor.fetchone()
+            if not old:
+                return None
+
+            async with conn.execute(query, (review_id, *params)) as cursor:
+                review = dict(await cursor.fetchone())
+            if "rating" in update_entry:
+                await apply_rating_deltas(
+                    conn,
+                    rating_deltas(
+                        [
+                            (review["book_id"], old["rating"], -1),
+                            (review["book_id"], review["rating"], 1),
+                        ]
+                    ),
+                )
+
+            return review
+
+    async def delete_review(self, review_id: str) -> Optional[str]:
+        async with self.database.write() as conn:
+            async with conn.execute(
+                self.statements["delete_review"], (review_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
+            if not row:
+                return None
+
+            await apply_rating_deltas(
+                conn, rating_deltas([(row["book_id"], row["rating"], -1)])
+            )
+
+            return row["id"]
+
+    async def delete_reviews(self) -> int:
+        async with self.database.write() as conn:
+            cursor = await conn.execute(self.statements["delete_reviews"])
+            await conn.execute(self.statements["delete_rating_stats"])
+
+            return cursor.rowcount
+
+    async def find_rating_stats_drift(self) -> List[Dict[str, Any]]:
+        """Compare book_rating_stats against a full recomputation from reviews."""
+        return await self.fetch("rating_stats_drift")
+
+    async def rebuild_rating_stats(self) -> int:
+        """Recompute book_rating_stats from scratch, returning the number of books."""
+        async with self.database.write() as conn:
+            await conn.execute(self.statements["delete_rating_stats"])
+            cursor = await conn.execute(
+                self.statements["rebuild_rating_stats"], (datetime.now(),)
+            )
+
+            return cursor.rowcount
+
+
+class SqliteLeaderboardRepository(SqliteDb):
+    table = "book_leaderboards"
+    statements = {
+        "get_board": """
+            SELECT
+                l.position, b.id, b.title, b.author, b.isbn,
+                l.score, l.review_count, l.average_rating
+            FROM book_leaderboards l
+            JOIN books b ON b.id = l.book_id
+            WHERE l.board = ? AND l.position > ?
+            ORDER BY l.position
+            LIMIT ?
+        """,
+        "get_refreshed_at": """
+            SELECT refreshed_at FROM leaderboard_refreshes WHERE board = ?
+        """,
+        "clear_board": """
+            DELETE FROM book_leaderboards WHERE board = ?
+        """,
+        "fill_top": """
+            INSERT INTO book_leaderboards
+                (board, position, book_id, score, review_count, average_rating)
+            SELECT
+                'top',
+                row_number() OVER (ORDER BY score DESC, book_id),
+                book_id,
+                score,
+                review_count,
+                average_rating
+            FROM (
+                SELECT
+                    s.book_id,
+                    s.review_count,
+                    s.rating_sum / s.review_count AS average_rating,
+                    (?1 * overall.mean + s.rating_sum) / (?1 + s.review_count) AS score
+                FROM book_rating_stats s,
+                    (
+                        SELECT sum(rating_sum) / nullif(sum(review_count), 0) AS mean
+                        FROM book_rating_stats
+                    ) AS overall
+                WHERE s.review_count > 0
+                ORDER BY score DESC, s.book_id
+                LIMIT ?2
+            ) AS ranked
+        """,
+        "fill_trending": """
+            INSERT INTO book_leaderboards
+                (board, position, book_id, score, review_count, average_rating)
+            SELECT
+                'trending',
+                row_number() OVER (ORDER BY score DESC, book_id),
+                book_id,
+                score,
+                review_count,
+                average_rating
+            FROM (
+                SELECT
+                    book_id,
+                    count(*) AS review_count,
+                    avg(rating) AS average_rating,
+                    sum(power(0.5, (julianday(?1) - julianday(created_at)) * 86400.0 / ?3))
+                        AS score
+                FROM reviews
+                WHERE created_at >= ?2
+                GROUP BY book_id
+                ORDER BY score DESC, book_id
+                LIMIT ?4
+            ) AS ranked
+        """,
+        "set_refreshed_at": """
+            INSERT INTO leaderboard_refreshes (board, refreshed_at)
+            VALUES (?, ?)
+            ON CONFLICT (board) DO UPDATE SET refreshed_at = excluded.refreshed_at
+        """,
+    }
+
+    async def get_board(
+        self, board: str, limit: int, offset: int = 0
+    ) -> Dict[str, Any]:
+        """One page of a board, with when it was last rebuilt (None if never)."""
+        books = await self.fetch("get_board", board, offset, limit)
+
+        return {
+            "board": board,
+            "refreshed_at": await self.fetchval("get_refreshed_at", board),
+            "books": books,
+        }
+
+    async def refresh(
+        self, now: datetime, min_age: timedelta = timedelta(0)
+    ) -> List[str]:
+        """Rebuild every board last refreshed more than ``min_age`` before ``now``.
+
+        All boards are rebuilt in one write transaction. Writers in other
+        processes wait for it, then find the boards fresh and skip them.
+        """
+        refreshed = []
+        async with self.database.write() as conn:
+            for board in BOARDS:
+                async with conn.execute(
+                    self.statements["get_refreshed_at"], (board,)
+                ) as cursor:
+                    row = await cursor.fetchone()
+                if row is not None and now - row["refreshed_at"] < min_age:
+                    continue
+
+                await conn.execute(self.statements["clear_board"], (board,))
+                if board == "top":
+                    await conn.execute(
+                        self.statements["fill_top"],
+                        (TOP_PRIOR_WEIGHT, LEADERBOARD_SIZE),
+                    )
+                else:
+                    await conn.execute(
+                        self.statements["fill_trending"],
+                        (
+                            now,
+                            now - timedelta(days=TRENDING_WINDOW_DAYS),
+                            TRENDING_HALF_LIFE_HOURS * 3600,
+                            LEADERBOARD_SIZE,
+                        ),
+                    )
+                await conn.execute(self.statements["set_refreshed_at"], (board, now))
+                refreshed.append(board)
+
+        return refreshed
@@ -0,0 +1,29 @@
+import json
+from typing import Any, Dict, List, Tuple
+
+from api.db.base import PostgresDb
+
+
+def build_set_clause(
+    fields: Dict[str, Any],
+    columns: Tuple[str, ...],
+    first_param: int = 2,
+    merge_data: bool = True,
+) -> Tuple[str, List[Any]]:
+    """Build the SET list of a partial UPDATE from the supplied fields.
+
+    Only keys listed in ``columns`` are written, so column names never come
+    from user input. With ``merge_data`` the updated fields are also merged
+    into the row's ``data`` copy. Returns the clause and its parameters,
+    numbered from ``first_param`` (``$1`` is left for the row id).
+    """
+    updates = {column: fields[column] for column in columns if column in fields}
+    assignments = [
+        f"{column} = ${index}" for index, column in enumerate(updates, first_param)
+    ]
+    params = list(updates.values())
+    if merge_data:
+        assignments.append(f"data = data || ${first_param + len(updates)}::jsonb")
+        params.append(json.dumps(updates, default=PostgresDb.datetime_serialize))
+
+    return ", ".join(assignments), params
@@ -1,132 +1,156 @@
-import json
-import os
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional
 from uuid import uuid4
 
-import asyncpg
-from dotenv import load_dotenv
-
-load_dotenv()
-
-DATABASE_URL = os.getenv("POSTGRES_URL")
-if not DATABASE_URL:
-    raise ValueError(
-        "Database string connection not found. Please include it in the '.env' file"
-    )
-
-
-class PostgresDb:
-    @staticmethod
-    def datetime_serialize(obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        raise TypeError(f"Type {type(obj)} is not serializable")
-
-    async def __aenter__(self):
-        self.pool = await asyncpg.create_pool(DATABASE_URL)
-        return self
-
-    async def __aexit__(self, exc_type, exc, tb):
-        await self.pool.close()
+from api.db.base import PostgresDb
+from api.db.pagination import DEFAULT_PAGE_SIZE, Keyset
+from api.db.updates import build_set_clause
+
+EXPORT_BATCH_SIZE = 1000
+
+UPDATABLE_COLUMNS = ("username", "email", "updated_at")
+
+USER_FIELDS = ("id", "username", "email", "created_at", "updated_at")
+USER_COLUMNS = ", ".join(USER_FIELDS)
+
+
+class UserRepository(PostgresDb):
+    table = "users"
+    fields = USER_FIELDS
+    statements = {
+        "create_user": """
+            INSERT INTO users(id, username, email, data, created_at, updated_at)
+            VALUES ($1, $2, $3, $4, $5, $6)
+        """,
+        "get_user": f"""
+            SELECT {USER_COLUMNS} FROM users WHERE id = $1
+        """,
+        "get_users": f"""
+            SELECT {USER_COLUMNS} FROM users
+            ORDER BY created_at, id
+            LIMIT $1
+        """,
+        "get_users_after": f"""
+            SELECT {USER_COLUMNS} FROM users
+            WHERE (created_at, id) > ($1, $2)
+            ORDER BY created_at, id
+            LIMIT $3
+        """,
+        "iter_users": f"""
+            SELECT {USER_COLUMNS} FROM users
+            ORDER BY created_at, id
+        """,
+        "iter_users_since": f"""
+            SELECT {USER_COLUMNS} FROM users
+            WHERE created_at >= $1
+            ORDER BY created_at, id
+        """,
+        "update_user": f"""
+            UPDATE users
+            SET {{set_clause}}
+            WHERE id = $1
+            RETURNING {USER_COLUMNS}
+        """,
+        "delete_user": """
+            DELETE FROM users
+            WHERE id = $1
+            RETURNING id
+        """,
+        "delete_users": """
+            DELETE FROM users
+        """,
+    }
 
     async def create_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
-        user_id = user_data["id"] or str(uuid4())
-        data_json = json.dumps(user_data, default=PostgresDb.datetime_serialize)
-
-        async with self.pool.acquire() as conn:
-            query = """
-                INSERT INTO users(id, username, email, data, created_at, updated_at)
-                VALUES ($1, $2, $3, $4, $5, $6)
-                RETURNING *
-            """
-            row = await conn.fetchrow(
-                query,
-                user_id,
-                user_data["username"],
-                user_data["email"],
-                data_json,
-                user_data["created_at"],
-                user_data["updated_at"],
+        if not user_data["id"]:
+            user_data = {**user_data, "id": str(uuid4())}
+
+        await self.execute(
+            "create_user",
+            user_data["id"],
+            user_data["username"],
+            user_data["email"],
+            self.data_json(user_data),
+            user_data["created_at"],
+            user_data["updated_at"],
+        )
+
+        # Every column comes from the caller, so reading the row back is unneeded
+        return user_data
+
+    async def create_users(self, users: List[Dict[str, Any]]) -> None:
+        records = [
+            (
+                user["id"],
+                user["username"],
+                user["email"],
+                self.data_json(user),
+                user["created_at"],
+                user["updated_at"],
             )
-            if row:
-                return {
-                    "id": row["id"],
-                    "username": row["username"],
-                    "email": row["email"],
-                    "created_at": row["created_at"],
-                    "updated_at": row["updated_at"],
-                }
-
-            return {}
-
-    async def get_user(self, user_id: str) -> Dict[str, Any]:
-        async with self.pool.acquire() as conn:
-            query = """
-                SELECT * FROM users WHERE id = $1
-            """
-            row = await conn.fetchrow(query, user_id)
-            if row:
-                return {
-                    "id": row["id"],
-                    "username": row["username"],
-                    "email": row["email"],
-                    "created_at": row["created_at"],
-                    "updated_at": row["updated_at"],
-                }
-
-            return None
-
-    async def get_users(self) -> List[Dict[str, Any]]:
+            for user in users
+        ]
+
         async with self.pool.acquire() as conn:
-            query = """
-                SELECT * FROM users
-            """
-            rows = await conn.fetch(query)
-            users = []
-            for row in rows:
-                users.append(
-                    {
-                        "id": row["id"],
-                        "username": row["username"],
-                        "email": row["email"],
-                        "created_at": row["created_at"],
-                        "updated_at": row["updated_at"],
-                    }
+            async with conn.transaction():
+                await conn.copy_records_to_table(
+                    "users",
+                    records=records,
+                    columns=[
+                        "id",
+                        "username",
+                        "email",
+                        "data",
+                        "created_at",
+                        "updated_at",
+                    ],
                 )
 
-            return users
+    async def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return await self.fetchrow("get_user", user_id)
 
-    async def update_user(self, user_id: str, update_entry: Dict[str, Any]) -> None:
-        data_json = json.dumps(update_entry, default=PostgresDb.datetime_serialize)
-        update_entry["updated_at"] = datetime.now()
+    async def get_users(
+        self, limit: int = DEFAULT_PAGE_SIZE, after: Optional[Keyset] = None
+    ) -> List[Dict[str, Any]]:
+        if after is None:
+            return await self.fetch("get_users", limit)
 
-        async with self.pool.acquire() as conn:
-            query = """
-                UPDATE users
-                SET username = $2, email = $3, data = $4, updated_at = $5
-                WHERE id = $1
-            """
-            await conn.execute(
-                query,
-                user_id,
-                update_entry["username"],
-                update_entry["email"],
-                data_json,
-                update_entry["updated_at"],
-            )
+        return await self.fetch("get_users_after", after[0], after[1], limit)
 
-    async def delete_user(self, user_id: str) -> None:
+    async def iter_users(
+        self, since: Optional[datetime] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
         async with self.pool.acquire() as conn:
-            query = """
-                DELETE FROM users
-                WHERE id = $1
-            """
-            await conn.execute(query, user_id)
+            # Server-side cursors only live inside a transaction
+            async with conn.transaction():
+                if since is None:
+                    cursor = conn.cursor(
+                        self.statements["iter_users"], prefetch=EXPORT_BATCH_SIZE
+                    )
+                else:
+                    cursor = conn.cursor(
+                        self.statements["iter_users_since"],
+                        since,
+                        prefetch=EXPORT_BATCH_SIZE,
+                    )
+                async for row in cursor:
+                    yield dict(row)
+
+    async def update_user(
+        self, user_id: str, update_entry: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        set_clause, params = build_set_clause(
+            update_entry, UPDATABLE_COLUMNS, merge_data=not self.lean_data
+        )
+        query = self.statements["update_user"].format(set_clause=set_clause)
 
-    async def delete_users(self) -> None:
         async with self.pool.acquire() as conn:
-            query = """
-                DELETE FROM users
-            """
-            await conn.execute(query)
+            row = await conn.fetchrow(query, user_id, *params)
+
+        return dict(row) if row else None
+
+    async def delete_user(self, user_id: str) -> Optional[str]:
+        return await self.fetchval("delete_user", user_id)
+
+    async def delete_users(self) -> int:
+        return await self.execute("delete_users")
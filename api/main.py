@@ -1,14 +1,51 @@
+from contextlib import asynccontextmanager
+
 from dotenv import load_dotenv
 from fastapi import FastAPI
 
-from api.routers import books, reviews, users
+from api.db import backend
+from api.db.pool import REPLICA_URLS
+from api.db.replicas import ConsistencyMiddleware
+from api.metrics import METRICS_ENABLED, MetricsMiddleware
+from api.routers import books, exports, metrics, reviews, users
+from api.services.books import suggest_refresher
+from api.services.ingest import review_batcher
+from api.services.leaderboards import leaderboard_refresher
+from api.tracing import TracingMiddleware, tracer
 
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await backend.open_database()
+    try:
+        suggest_refresher.start()
+        leaderboard_refresher.start()
+        review_batcher.start()
+        yield
+    finally:
+        # Queued reviews are written before the database is closed
+        await review_batcher.stop()
+        await leaderboard_refresher.stop()
+        await suggest_refresher.stop()
+        await backend.close_database()
+        tracer.shutdown()
+
+
 app = FastAPI(
     title="A Book Review API",
     description="API for managing books, reviews, and ratings",
+    lifespan=lifespan,
 )
 app.include_router(users.user_router)
 app.include_router(books.book_router)
 app.include_router(reviews.review_router)
+app.include_router(exports.export_router)
+app.include_router(metrics.metrics_router)
+if REPLICA_URLS:
+    app.add_middleware(ConsistencyMiddleware)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+# Added last so it wraps everything else and every response has a request id
+app.add_middleware(TracingMiddleware)
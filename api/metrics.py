@@ -0,0 +1,176 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Counters and histograms are plain dicts keyed by label values, updated
+inline by the HTTP middleware and the repository wrappers; nothing is
+locked because everything runs on the event loop thread. Gauges (pool,
+cache, queue) are read from their owners when /metrics is scraped, so they
+cost nothing between scrapes. Each worker process reports its own values.
+"""
+
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() not in (
+    "0",
+    "false",
+    "no",
+)
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Iterable[str]) -> str:
+    pairs = ",".join(f'{name}="{_escape(str(v))}"' for name, v in zip(names, values))
+    return f"{{{pairs}}}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_label_text(self.labelnames, labels)} {value}")
+
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = HTTP_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (non-cumulative, +Inf last), sum]
+        self.values: Dict[Labels, list] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        for labels, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(
+                    f"{self.name}_bucket{_label_text(names, labels + (le,))} {cumulative}"
+                )
+            label_text = _label_text(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {total}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+
+        return lines
+
+
+def collected(
+    name: str,
+    help: str,
+    labelnames: Sequence[str],
+    samples: Dict[Labels, float],
+    kind: str = "gauge",
+) -> List[str]:
+    """Lines for values read at scrape time from the object that owns them."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in sorted(samples.items()):
+        lines.append(f"{name}{_label_text(labelnames, labels)} {value}")
+
+    return lines
+
+
+http_requests = Counter(
+    "http_requests_total", "HTTP requests served", ("method", "route", "status")
+)
+http_latency = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the last body chunk",
+    ("method", "route"),
+)
+db_latency = Histogram(
+    "db_query_duration_seconds",
+    "Duration of repository methods in api/db, connection acquisition included",
+    ("repository", "method"),
+    buckets=DB_BUCKETS,
+)
+db_errors = Counter(
+    "db_query_errors_total",
+    "Repository method calls that raised",
+    ("repository", "method"),
+)
+pool_acquire_latency = Histogram(
+    "db_pool_acquire_duration_seconds",
+    "Time spent waiting for a pooled connection",
+    buckets=DB_BUCKETS,
+)
+
+
+def render(gauges: Iterable[str] = ()) -> str:
+    """Every counter and histogram, followed by scrape-time gauge lines."""
+    lines: List[str] = []
+    for metric in (http_requests, http_latency, db_latency, db_errors):
+        lines.extend(metric.render())
+    lines.extend(pool_acquire_latency.render())
+    lines.extend(gauges)
+
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and timing them per route template.
+
+    Requests are labelled with the matched route's path ("/books/{book_id}")
+    rather than the raw URL, so the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            http_latency.observe((scope["method"], path), time.perf_counter() - started)
+            http_requests.inc((scope["method"], path, str(status)))
@@ -0,0 +1,144 @@
+"""Apply the versioned SQL migrations in api/migrations.
+
+Usage:
+    python -m api.migrate            # apply every pending migration
+    python -m api.migrate --status   # list applied and pending migrations
+
+Migrations are named ``<version>_<name>.sql`` and applied in version order,
+each in its own transaction. A file starting with ``-- migrate: no-transaction``
+runs statement by statement instead, which ``CREATE INDEX CONCURRENTLY``
+requires.
+"""
+
+import argparse
+import asyncio
+import logging
+import re
+from pathlib import Path
+from typing import List, NamedTuple, Set
+
+import asyncpg
+
+from api.db.pool import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+
+# Arbitrary key so two processes starting at once don't both apply migrations
+MIGRATION_LOCK_ID = 7_201_944
+
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    sql: str
+
+    @property
+    def transactional(self) -> bool:
+        return not self.sql.lstrip().startswith(NO_TRANSACTION_MARKER)
+
+    def statements(self) -> List[str]:
+        # Migration files hold plain DDL, so splitting on ';' is enough
+        lines = [
+            line for line in self.sql.splitlines() if not line.strip().startswith("--")
+        ]
+        return [stmt.strip() for stmt in "\n".join(lines).split(";") if stmt.strip()]
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = {}
+    for path in sorted(directory.glob("*.sql")):
+        match = MIGRATION_FILE.match(path.name)
+        if not match:
+            raise ValueError(
+                f"Migration file {path.name} is not named <version>_<name>.sql"
+            )
+
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version {version}")
+
+        migrations[version] = Migration(version, match.group(2), path.read_text())
+
+    return [migrations[version] for version in sorted(migrations)]
+
+
+async def applied_versions(conn: asyncpg.Connection) -> Set[int]:
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+        """)
+    rows = await conn.fetch("SELECT version FROM schema_migrations")
+
+    return {row["version"] for row in rows}
+
+
+async def apply_migrations(
+    conn: asyncpg.Connection, migrations: List[Migration]
+) -> List[Migration]:
+    """Apply the migrations that have not run yet, returning the ones applied."""
+    await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_ID)
+    try:
+        applied = await applied_versions(conn)
+        pending = [m for m in migrations if m.version not in applied]
+        for migration in pending:
+            logger.info("Applying migration %04d_%s", migration.version, migration.name)
+            if migration.transactional:
+                async with conn.transaction():
+                    await conn.execute(migration.sql)
+                    await _record(conn, migration)
+            else:
+                for statement in migration.statements():
+                    await conn.execute(statement)
+                await _record(conn, migration)
+
+        return pending
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+
+
+async def _record(conn: asyncpg.Connection, migration: Migration) -> None:
+    await conn.execute(
+        "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)",
+        migration.version,
+        migration.name,
+    )
+
+
+async def migrate(status_only: bool = False) -> None:
+    migrations = load_migrations()
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        if status_only:
+            applied = await applied_versions(conn)
+            for migration in migrations:
+                state = "applied" if migration.version in applied else "pending"
+                print(f"{migration.version:04d}_{migration.name}: {state}")
+            return
+
+        applied = await apply_migrations(conn, migrations)
+        logger.info("%s migrations applied", len(applied))
+    finally:
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--status", action="store_true", help="list migrations without applying them"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    asyncio.run(migrate(status_only=args.status))
+
+
+if __name__ == "__main__":
+    main()
@@ -43,3 +43,18 @@ CREATE TABLE IF NOT EXISTS reviews (
 
 CREATE INDEX IF NOT EXISTS idx_reviews_id ON reviews(created_at);
 CREATE INDEX IF NOT EXISTS idx_reviews_data ON reviews USING GIN (data);
+
+
+-- Per-book rating aggregates, updated in the same transaction as every review write
+CREATE TABLE IF NOT EXISTS book_rating_stats (
+    book_id VARCHAR PRIMARY KEY,
+    review_count INTEGER NOT NULL DEFAULT 0,
+    rating_sum DECIMAL(14, 1) NOT NULL DEFAULT 0,
+    stars_1 INTEGER NOT NULL DEFAULT 0,
+    stars_2 INTEGER NOT NULL DEFAULT 0,
+    stars_3 INTEGER NOT NULL DEFAULT 0,
+    stars_4 INTEGER NOT NULL DEFAULT 0,
+    stars_5 INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL,
+    FOREIGN KEY (book_id) REFERENCES books (id) ON DELETE CASCADE
+);
@@ -0,0 +1,25 @@
+-- migrate: no-transaction
+-- Indexes are built CONCURRENTLY so existing tables stay writable, which
+-- cannot happen inside a transaction block.
+
+-- Keyset pagination and exports order by (created_at, id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_created_at_id ON users (created_at, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_books_created_at_id ON books (created_at, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_created_at_id ON reviews (created_at, id);
+
+-- get_book_reviews filters on book_id and pages by (created_at, id); also
+-- serves the foreign key check when a book is deleted
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_book_id_created_at_id ON reviews (book_id, created_at, id);
+
+-- Foreign key check when a user is deleted
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_user_id ON reviews (user_id);
+
+-- Superseded by the composite indexes above
+DROP INDEX CONCURRENTLY IF EXISTS idx_user_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_book_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_reviews_id;
+
+-- No query filters on the data column, but every insert paid to maintain these
+DROP INDEX CONCURRENTLY IF EXISTS idx_user_data;
+DROP INDEX CONCURRENTLY IF EXISTS idx_book_data;
+DROP INDEX CONCURRENTLY IF EXISTS idx_reviews_data;
@@ -0,0 +1,4 @@
+-- Books had no modification timestamp, which ETags and Last-Modified need
+ALTER TABLE books ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+UPDATE books SET updated_at = created_at WHERE updated_at IS NULL;
+ALTER TABLE books ALTER COLUMN updated_at SET NOT NULL;
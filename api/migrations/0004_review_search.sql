@@ -0,0 +1,8 @@
+-- migrate: no-transaction
+-- Full-text search over review comments. The tsvector is a generated column,
+-- so every insert, update and COPY keeps it current without application code.
+-- Queries must use the same 'english' configuration to match the index.
+ALTER TABLE reviews ADD COLUMN IF NOT EXISTS comment_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(comment, ''))) STORED;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_comment_tsv ON reviews USING GIN (comment_tsv);
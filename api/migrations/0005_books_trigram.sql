@@ -0,0 +1,6 @@
+-- migrate: no-transaction
+-- Trigram indexes for typo-tolerant book suggestions (GET /books/suggest)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_books_title_trgm ON books USING GIN (title gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_books_author_trgm ON books USING GIN (author gin_trgm_ops);
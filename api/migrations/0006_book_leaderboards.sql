@@ -0,0 +1,21 @@
+-- Ranked book lists, rebuilt on a schedule by the leaderboard refresher so
+-- reading a page is an index range scan rather than an aggregation
+CREATE TABLE IF NOT EXISTS book_leaderboards (
+    board VARCHAR NOT NULL,
+    position INTEGER NOT NULL,
+    book_id VARCHAR NOT NULL,
+    score DOUBLE PRECISION NOT NULL,
+    review_count INTEGER NOT NULL,
+    average_rating DOUBLE PRECISION,
+    PRIMARY KEY (board, position),
+    FOREIGN KEY (book_id) REFERENCES books (id) ON DELETE CASCADE
+);
+
+-- Foreign key check when a book is deleted
+CREATE INDEX IF NOT EXISTS idx_book_leaderboards_book_id ON book_leaderboards (book_id);
+
+-- When each board was last rebuilt, kept even while a board is empty
+CREATE TABLE IF NOT EXISTS leaderboard_refreshes (
+    board VARCHAR PRIMARY KEY,
+    refreshed_at TIMESTAMP NOT NULL
+);
@@ -0,0 +1,25 @@
+-- Fill book_rating_stats from the reviews written before it existed. Only
+-- reviews written since the table was created reached it, so the counts of
+-- books reviewed both before and after are recomputed as well; this is the
+-- same aggregate as `python -m api.repair --fix`.
+
+-- Block review writes so no delta lands between the delete and the insert
+LOCK TABLE reviews IN SHARE MODE;
+
+DELETE FROM book_rating_stats;
+
+INSERT INTO book_rating_stats
+    (book_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5, updated_at)
+SELECT
+    book_id,
+    count(*),
+    sum(rating),
+    count(*) FILTER (WHERE LEAST(5, GREATEST(1, ROUND(rating))) = 1),
+    count(*) FILTER (WHERE LEAST(5, GREATEST(1, ROUND(rating))) = 2),
+    count(*) FILTER (WHERE LEAST(5, GREATEST(1, ROUND(rating))) = 3),
+    count(*) FILTER (WHERE LEAST(5, GREATEST(1, ROUND(rating))) = 4),
+    count(*) FILTER (WHERE LEAST(5, GREATEST(1, ROUND(rating))) = 5),
+    now()
+FROM reviews
+WHERE rating IS NOT NULL
+GROUP BY book_id;
@@ -0,0 +1,120 @@
+-- The PostgreSQL schema of 0001-0006 translated for the SQLite backend
+-- (api/db/sqlite.py), which applies it on startup. Every statement is
+-- idempotent. Timestamps are ISO 8601 text, which sorts in time order.
+--
+-- reviews and books get an INTEGER PRIMARY KEY next to their text id so the
+-- full-text tables below can point at a rowid that VACUUM never renumbers.
+
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    email TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_users_created_at_id ON users (created_at, id);
+
+
+CREATE TABLE IF NOT EXISTS books (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    author TEXT NOT NULL,
+    isbn TEXT,
+    data TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_books_created_at_id ON books (created_at, id);
+
+
+CREATE TABLE IF NOT EXISTS reviews (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    user_id TEXT NOT NULL REFERENCES users (id),
+    book_id TEXT NOT NULL REFERENCES books (id),
+    rating REAL,
+    comment TEXT,
+    data TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_reviews_created_at_id ON reviews (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_reviews_book_id_created_at_id ON reviews (book_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_reviews_user_id ON reviews (user_id);
+
+
+CREATE TABLE IF NOT EXISTS book_rating_stats (
+    book_id TEXT PRIMARY KEY REFERENCES books (id) ON DELETE CASCADE,
+    review_count INTEGER NOT NULL DEFAULT 0,
+    rating_sum REAL NOT NULL DEFAULT 0,
+    stars_1 INTEGER NOT NULL DEFAULT 0,
+    stars_2 INTEGER NOT NULL DEFAULT 0,
+    stars_3 INTEGER NOT NULL DEFAULT 0,
+    stars_4 INTEGER NOT NULL DEFAULT 0,
+    stars_5 INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL
+);
+
+
+-- Review search (0004): an FTS5 index over comments in place of tsvector
+CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5(
+    comment, content = 'reviews', content_rowid = 'seq', tokenize = 'porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS reviews_fts_insert AFTER INSERT ON reviews BEGIN
+    INSERT INTO reviews_fts (rowid, comment) VALUES (new.seq, new.comment);
+END;
+
+CREATE TRIGGER IF NOT EXISTS reviews_fts_delete AFTER DELETE ON reviews BEGIN
+    INSERT INTO reviews_fts (reviews_fts, rowid, comment) VALUES ('delete', old.seq, old.comment);
+END;
+
+CREATE TRIGGER IF NOT EXISTS reviews_fts_update AFTER UPDATE OF comment ON reviews BEGIN
+    INSERT INTO reviews_fts (reviews_fts, rowid, comment) VALUES ('delete', old.seq, old.comment);
+    INSERT INTO reviews_fts (rowid, comment) VALUES (new.seq, new.comment);
+END;
+
+
+-- Fuzzy title and author matches (0005): a trigram index in place of pg_trgm
+CREATE VIRTUAL TABLE IF NOT EXISTS books_trigram USING fts5(
+    title, author, content = 'books', content_rowid = 'seq', tokenize = 'trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS books_trigram_insert AFTER INSERT ON books BEGIN
+    INSERT INTO books_trigram (rowid, title, author) VALUES (new.seq, new.title, new.author);
+END;
+
+CREATE TRIGGER IF NOT EXISTS books_trigram_delete AFTER DELETE ON books BEGIN
+    INSERT INTO books_trigram (books_trigram, rowid, title, author)
+    VALUES ('delete', old.seq, old.title, old.author);
+END;
+
+CREATE TRIGGER IF NOT EXISTS books_trigram_update AFTER UPDATE OF title, author ON books BEGIN
+    INSERT INTO books_trigram (books_trigram, rowid, title, author)
+    VALUES ('delete', old.seq, old.title, old.author);
+    INSERT INTO books_trigram (rowid, title, author) VALUES (new.seq, new.title, new.author);
+END;
+
+
+-- Leaderboards (0006)
+CREATE TABLE IF NOT EXISTS book_leaderboards (
+    board TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    book_id TEXT NOT NULL REFERENCES books (id) ON DELETE CASCADE,
+    score REAL NOT NULL,
+    review_count INTEGER NOT NULL,
+    average_rating REAL,
+    PRIMARY KEY (board, position)
+);
+
+CREATE INDEX IF NOT EXISTS idx_book_leaderboards_book_id ON book_leaderboards (book_id);
+
+CREATE TABLE IF NOT EXISTS leaderboard_refreshes (
+    board TEXT PRIMARY KEY,
+    refreshed_at TIMESTAMP NOT NULL
+);
@@ -1,11 +1,27 @@
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from uuid import uuid4
 
 from pydantic import BaseModel, EmailStr, Field, field_serializer
 
 
-class UserCreate(BaseModel):
+class NewEntry(BaseModel):
+    def to_record(self) -> Dict[str, Any]:
+        """Row to insert: the validated fields plus a new id and timestamps.
+
+        Building the row directly avoids validating the input a second time
+        through the full entry model.
+        """
+        now = datetime.now()
+        return {
+            "id": str(uuid4()),
+            **self.model_dump(),
+            "created_at": now,
+            "updated_at": now,
+        }
+
+
+class UserCreate(NewEntry):
     username: str = Field(
         min_length=5, max_length=50, description="The name of the user"
     )
@@ -37,7 +53,7 @@ class User(BaseModel):
         return dt.isoformat()
 
 
-class BookCreate(BaseModel):
+class BookCreate(NewEntry):
     title: str = Field(description="This is the title of the book")
     author: str = Field(
         min_length=10, max_length=100, description="This is the name of the author"
@@ -66,9 +82,16 @@ class Book(BaseModel):
     created_at: Optional[datetime] = Field(
         default_factory=datetime.now, description="The date this entry was created"
     )
+    updated_at: Optional[datetime] = Field(
+        default_factory=datetime.now, description="The date this entry was modified"
+    )
+
+    @field_serializer("created_at", "updated_at", when_used="json")
+    def datetime_serialize(self, dt: datetime, _info):
+        return dt.isoformat()
 
 
-class ReviewCreate(BaseModel):
+class ReviewCreate(NewEntry):
     user_id: str = Field(description="This is the id of the user creating a review")
     book_id: str = Field(description="This is the id of the book being reviewed")
     rating: float = Field(ge=1, le=5)
@@ -108,3 +131,87 @@ class Review(BaseModel):
     @field_serializer("created_at", "updated_at", when_used="json")
     def datetime_serialize(self, dt: datetime, _info):
         return dt.isoformat()
+
+
+# Response models. Rows read back from the database were validated when they
+# were written, so these carry no constraints and only shape the output.
+
+
+class UserResponse(BaseModel):
+    id: str
+    username: str
+    email: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class UserPage(BaseModel):
+    users: List[UserResponse]
+    next_cursor: Optional[str] = None
+
+
+class BookResponse(BaseModel):
+    id: str
+    title: str
+    author: str
+    isbn: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class BookStats(BaseModel):
+    book_id: str
+    review_count: int
+    average_rating: Optional[float] = None
+    histogram: Dict[str, int]
+
+
+class BookSuggestion(BaseModel):
+    id: str
+    title: str
+    author: str
+
+
+class BookDetail(BookResponse):
+    stats: Optional[BookStats] = None
+
+
+class BookPage(BaseModel):
+    books: List[BookResponse]
+    next_cursor: Optional[str] = None
+
+
+class LeaderboardEntry(BaseModel):
+    position: int
+    id: str
+    title: str
+    author: str
+    isbn: Optional[str] = None
+    score: float
+    review_count: int
+    average_rating: Optional[float] = None
+
+
+class Leaderboard(BaseModel):
+    board: str
+    refreshed_at: Optional[datetime] = None
+    books: List[LeaderboardEntry]
+
+
+class ReviewResponse(BaseModel):
+    id: str
+    user_id: str
+    book_id: str
+    rating: Optional[float] = None
+    comment: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class ReviewSearchResult(ReviewResponse):
+    rank: float
+
+
+class ReviewSearchPage(BaseModel):
+    reviews: List[ReviewSearchResult]
+    next_cursor: Optional[str] = None
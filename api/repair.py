@@ -0,0 +1,57 @@
+"""Detect and repair drift in the book_rating_stats aggregates.
+
+Usage:
+    python -m api.repair          # report books whose stats drifted from reviews
+    python -m api.repair --fix    # recompute every book's stats from scratch
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+
+from api.db import backend
+
+logger = logging.getLogger(__name__)
+
+
+async def repair_rating_stats(fix: bool = False) -> int:
+    await backend.open_database()
+    try:
+        async with backend.review_repository() as db:
+            drift = await db.find_rating_stats_drift()
+            for row in drift:
+                logger.warning(
+                    "Book %s: stored %s reviews (sum %s), expected %s (sum %s)",
+                    row["book_id"],
+                    row["stored_count"],
+                    row["stored_sum"],
+                    row["expected_count"],
+                    row["expected_sum"],
+                )
+            logger.info("%s books with drifted rating stats", len(drift))
+
+            if fix and drift:
+                rebuilt = await db.rebuild_rating_stats()
+                logger.info("Rebuilt rating stats for %s books", rebuilt)
+                return 0
+
+            return len(drift)
+    finally:
+        await backend.close_database()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--fix", action="store_true", help="rebuild the stats table from reviews"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    drifted = asyncio.run(repair_rating_stats(fix=args.fix))
+    sys.exit(1 if drifted else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,52 +1,195 @@
-from typing import AsyncGenerator
-
-from fastapi import APIRouter, Depends, HTTPException
-
-from api.db.books import PostgresDb
-from api.models.entry import Book, BookCreate, BookUpdate
+from typing import AsyncGenerator, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+
+from api.db.backend import book_repository, leaderboard_repository
+from api.db.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    InvalidCursor,
+    decode_cursor,
+    next_cursor,
+)
+from api.models.entry import (
+    BookCreate,
+    BookDetail,
+    BookPage,
+    BookResponse,
+    BookStats,
+    BookSuggestion,
+    BookUpdate,
+    Leaderboard,
+)
+from api.routers.conditional import (
+    collection_etag,
+    conditional_response,
+    record_etag,
+)
+from api.routers.responses import rows_response
 from api.services.books import BookService
+from api.services.bulk import parse_bulk_body, validate_batch
+from api.services.leaderboards import LeaderboardService
 
 book_router = APIRouter()
 
 
 async def get_book_service() -> AsyncGenerator[BookService, None]:
-    async with PostgresDb() as db:
+    async with book_repository() as db:
         yield BookService(db)
 
 
+async def get_leaderboard_service() -> AsyncGenerator[LeaderboardService, None]:
+    async with leaderboard_repository() as db:
+        yield LeaderboardService(db)
+
+
 @book_router.post("/books/")
 async def create_book(
     book_data: BookCreate, book_service: BookService = Depends(get_book_service)
 ):
     try:
-        book = Book(title=book_data.title, author=book_data.author, isbn=book_data.isbn)
-        book_dict = book.model_dump()
-        created_book = await book_service.db.create_book(book_dict)
+        created_book = await book_service.create_book(book_data.to_record())
 
         return {"detail": "Book created successfully", "book": created_book}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error creating book: {str(e)}")
 
 
-@book_router.get("/books/{book_id}")
-async def get_book(book_id: str, book_service: BookService = Depends(get_book_service)):
+@book_router.post("/books/bulk")
+async def create_books_bulk(
+    request: Request, book_service: BookService = Depends(get_book_service)
+):
+    try:
+        items = parse_bulk_body(
+            await request.body(), request.headers.get("content-type", "")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    valid, errors = validate_batch(BookCreate, items)
+    try:
+        books = await book_service.create_books([book.to_record() for _, book in valid])
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error creating books: {str(e)}")
+
+    return {
+        "detail": f"Created {len(books)} books",
+        "created": [
+            {"index": index, "id": book["id"]} for (index, _), book in zip(valid, books)
+        ],
+        "errors": errors,
+    }
+
+
+# Declared before /books/{book_id}, which would otherwise capture "suggest",
+# "top" and "trending"
+@book_router.get("/books/suggest", response_model=List[BookSuggestion])
+async def suggest_books(
+    prefix: str = Query(min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    fuzzy: bool = True,
+    book_service: BookService = Depends(get_book_service),
+):
+    try:
+        return await book_service.suggest_books(prefix, limit=limit, fuzzy=fuzzy)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error suggesting books {str(e)}")
+
+
+@book_router.get("/books/top", response_model=Leaderboard)
+async def get_top_books(
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    leaderboard_service: LeaderboardService = Depends(get_leaderboard_service),
+):
+    """Best rated books by Bayesian average, as of the last refresh."""
+    try:
+        return await leaderboard_service.get_board("top", limit, offset)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting books {str(e)}")
+
+
+@book_router.get("/books/trending", response_model=Leaderboard)
+async def get_trending_books(
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    leaderboard_service: LeaderboardService = Depends(get_leaderboard_service),
+):
+    """Most reviewed books of the trending window, recent reviews weighing most."""
+    try:
+        return await leaderboard_service.get_board("trending", limit, offset)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting books {str(e)}")
+
+
+@book_router.get(
+    "/books/{book_id}", response_model=BookDetail, response_model_exclude_unset=True
+)
+async def get_book(
+    book_id: str,
+    request: Request,
+    response: Response,
+    include_stats: bool = False,
+    book_service: BookService = Depends(get_book_service),
+):
     book = await book_service.get_book(book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
+    if include_stats:
+        stats = await book_service.get_book_stats(book_id)
+        etag = record_etag(book, stats)
+        book = {**book, "stats": stats}
+    else:
+        etag = record_etag(book)
+
+    not_modified = conditional_response(request, response, etag, book.get("updated_at"))
+    if not_modified:
+        return not_modified
+
     return book
 
 
-@book_router.get("/books")
-async def get_books(book_service: BookService = Depends(get_book_service)):
+@book_router.get("/books/{book_id}/stats", response_model=BookStats)
+async def get_book_stats(
+    book_id: str, book_service: BookService = Depends(get_book_service)
+):
+    stats = await book_service.get_book_stats(book_id)
+    if not stats:
+        raise HTTPException(status_code=404, detail="Book not found")
+
+    return stats
+
+
+@book_router.get("/books", response_model=BookPage)
+async def get_books(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    book_service: BookService = Depends(get_book_service),
+):
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        book = await book_service.get_books()
-        return {"books": book}
+        book = await book_service.get_books(limit=limit, after=after)
+        not_modified = conditional_response(request, response, collection_etag(book))
+        if not_modified:
+            return not_modified
+
+        return rows_response(
+            {"books": book, "next_cursor": next_cursor(book, limit)}, response
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving book {str(e)}")
 
 
-@book_router.patch("/books/{book_id}")
+@book_router.patch(
+    "/books/{book_id}", response_model=BookResponse, response_model_exclude_unset=True
+)
 async def update_book(
     book_id: str,
     updated_data: BookUpdate,
@@ -64,15 +207,14 @@ async def update_book(
 async def delete_book(
     book_id: str, book_service: BookService = Depends(get_book_service)
 ):
-    book = await book_service.get_book(book_id)
-    if not book:
+    deleted = await book_service.delete_book(book_id)
+    if not deleted:
         raise HTTPException(status_code=404, detail="Book not found")
 
-    await book_service.delete_book(book_id)
     return {"detail": f"Deleted book {book_id}"}
 
 
 @book_router.delete("/books")
 async def delete_books(book_service: BookService = Depends(get_book_service)):
-    await book_service.delete_books()
-    return {"detail": "Deleted all books"}
+    deleted = await book_service.delete_books()
+    return {"detail": "Deleted all books", "deleted": deleted}
@@ -0,0 +1,108 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi import Request, Response
+
+
+def _version(record: Dict[str, Any]) -> Optional[datetime]:
+    return record.get("updated_at") or record.get("created_at")
+
+
+def _digest(parts: Iterable[str]) -> str:
+    digest = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+
+    return f'"{digest.hexdigest()}"'
+
+
+def record_etag(record: Dict[str, Any], *extra: Any) -> str:
+    """Strong ETag for a single row, derived from its id and last modification."""
+    version = _version(record)
+    return _digest(
+        [
+            str(record.get("id")),
+            version.isoformat() if version else "",
+            *map(repr, extra),
+        ]
+    )
+
+
+def collection_etag(records: Iterable[Dict[str, Any]], *extra: Any) -> str:
+    """ETag for a list response; changes when any row is added, removed or modified."""
+    parts = []
+    for record in records:
+        version = _version(record)
+        parts.append(str(record.get("id")))
+        parts.append(version.isoformat() if version else "")
+
+    return _digest([*parts, *map(repr, extra)])
+
+
+def _utc(value: datetime) -> datetime:
+    # Timestamps are stored without a time zone, in the server's local time;
+    # astimezone() reads naive values as local time
+    return value.astimezone(timezone.utc)
+
+
+def _http_date(value: datetime) -> str:
+    return format_datetime(_utc(value), usegmt=True)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+def _not_modified_since(if_modified_since: str, modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+    # HTTP dates are always GMT; a "-0000" zone parses as naive
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+
+    # HTTP dates have one second resolution
+    return _utc(modified).replace(microsecond=0) <= since
+
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    etag: str,
+    modified: Optional[datetime] = None,
+) -> Optional[Response]:
+    """Set validators on ``response`` and return a 304 if the client's copy is current.
+
+    If-None-Match takes precedence over If-Modified-Since, as in RFC 9110.
+    List responses pass no ``modified``: the newest ``updated_at`` left in a
+    page does not move when a row is deleted, so only their ETag can tell
+    that the client's copy is current.
+    """
+    headers = {"ETag": etag}
+    if modified:
+        headers["Last-Modified"] = _http_date(modified)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        fresh = _etag_matches(if_none_match, etag)
+    elif if_modified_since and modified:
+        fresh = _not_modified_since(if_modified_since, modified)
+    else:
+        fresh = False
+
+    if fresh:
+        return Response(status_code=304, headers=headers)
+
+    return None
@@ -0,0 +1,149 @@
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+
+from api.routers.books import get_book_service
+from api.routers.reviews import get_review_service
+from api.routers.users import get_user_service
+from api.services.books import BookService
+from api.services.reviews import ReviewService
+from api.services.users import UserService
+
+export_router = APIRouter()
+
+# Rows are buffered into chunks of roughly this many characters before being
+# written to the socket, so a large export is not sent one tiny frame per row
+CHUNK_SIZE = 64 * 1024
+
+BOOK_FIELDS = ["id", "title", "author", "isbn", "created_at", "updated_at"]
+USER_FIELDS = ["id", "username", "email", "created_at", "updated_at"]
+REVIEW_FIELDS = [
+    "id",
+    "user_id",
+    "book_id",
+    "rating",
+    "comment",
+    "created_at",
+    "updated_at",
+]
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+def _serialize(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Type {type(obj)} is not serializable")
+
+
+async def _ndjson_chunks(rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    lines = []
+    size = 0
+    async for row in rows:
+        line = json.dumps(row, default=_serialize)
+        lines.append(line)
+        size += len(line) + 1
+        if size >= CHUNK_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+            size = 0
+
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+async def _csv_chunks(
+    rows: AsyncIterator[Dict[str, Any]], fields: List[str]
+) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    async for row in rows:
+        writer.writerow(
+            {
+                key: value.isoformat() if isinstance(value, datetime) else value
+                for key, value in row.items()
+            }
+        )
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def _naive_local(since: Optional[datetime]) -> Optional[datetime]:
+    # Timestamps are stored without a time zone, in the server's local time;
+    # comparing them with an aware value would fail inside the stream, after
+    # the 200 has been sent
+    if since is None or since.tzinfo is None:
+        return since
+
+    return since.astimezone().replace(tzinfo=None)
+
+
+def _stream(
+    rows: AsyncIterator[Dict[str, Any]],
+    fields: List[str],
+    fmt: ExportFormat,
+    name: str,
+) -> StreamingResponse:
+    if fmt == ExportFormat.csv:
+        body, media_type = _csv_chunks(rows, fields), "text/csv"
+    else:
+        body, media_type = _ndjson_chunks(rows), "application/x-ndjson"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt.value}"'},
+    )
+
+
+@export_router.get("/export/books")
+async def export_books(
+    fmt: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+    since: Optional[datetime] = None,
+    book_service: BookService = Depends(get_book_service),
+):
+    return _stream(
+        book_service.export_books(_naive_local(since)), BOOK_FIELDS, fmt, "books"
+    )
+
+
+@export_router.get("/export/users")
+async def export_users(
+    fmt: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+    since: Optional[datetime] = None,
+    user_service: UserService = Depends(get_user_service),
+):
+    return _stream(
+        user_service.export_users(_naive_local(since)), USER_FIELDS, fmt, "users"
+    )
+
+
+@export_router.get("/export/reviews")
+async def export_reviews(
+    fmt: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+    since: Optional[datetime] = None,
+    review_service: ReviewService = Depends(get_review_service),
+):
+    return _stream(
+        review_service.export_reviews(_naive_local(since)),
+        REVIEW_FIELDS,
+        fmt,
+        "reviews",
+    )
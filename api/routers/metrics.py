@@ -0,0 +1,110 @@
+from typing import List
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from api import metrics
+from api.db.pool import get_replica_pools, pool_stats
+from api.db.replicas import replica_router
+from api.services.cache import book_cache, review_cache, user_cache
+from api.services.ingest import review_batcher
+from api.services.singleflight import book_flight, review_flight
+
+metrics_router = APIRouter()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+CACHES = (book_cache, user_cache, review_cache)
+FLIGHTS = (book_flight, review_flight)
+
+
+def _gauges() -> List[str]:
+    lines = []
+    stats = pool_stats()
+    if stats is not None:
+        lines += metrics.collected(
+            "db_pool_connections",
+            "Open pooled connections by state",
+            ("state",),
+            {
+                ("open",): stats["size"],
+                ("idle",): stats["idle"],
+                ("max",): stats["max_size"],
+            },
+        )
+        lines += metrics.collected(
+            "db_pool_waiting",
+            "Callers waiting to acquire a connection",
+            (),
+            {(): stats["waiting"]},
+        )
+
+    if get_replica_pools():
+        routing = replica_router.stats()
+        lines += metrics.collected(
+            "db_routed_reads_total",
+            "get_* repository reads by the pool that served them",
+            ("target",),
+            {(target,): routing[target] for target in ("replica", "primary")},
+            "counter",
+        )
+        lines += metrics.collected(
+            "db_replica_replay_waits_total",
+            "Replica reads that waited for replay to reach a consistency token",
+            (),
+            {(): routing["waited"]},
+            "counter",
+        )
+
+    caches = [cache.stats() for cache in CACHES]
+    for name, key, help, kind in (
+        ("cache_hits_total", "hits", "Lookups answered from the cache", "counter"),
+        ("cache_misses_total", "misses", "Lookups that missed the cache", "counter"),
+        ("cache_hit_ratio", "hit_ratio", "Share of cache lookups that hit", "gauge"),
+        ("cache_entries", "size", "Entries currently cached", "gauge"),
+    ):
+        lines += metrics.collected(
+            name, help, ("cache",), {(s["name"],): s[key] for s in caches}, kind
+        )
+
+    flights = [flight.stats() for flight in FLIGHTS]
+    lines += metrics.collected(
+        "singleflight_calls_total",
+        "Reads that went through request coalescing",
+        ("name",),
+        {(s["name"],): s["calls"] for s in flights},
+        "counter",
+    )
+    lines += metrics.collected(
+        "singleflight_shared_total",
+        "Reads answered by a query another request already had in flight",
+        ("name",),
+        {(s["name"],): s["shared"] for s in flights},
+        "counter",
+    )
+
+    if review_batcher.enabled:
+        queue = review_batcher.stats()
+        lines += metrics.collected(
+            "review_queue_depth",
+            "Reviews waiting to be written",
+            (),
+            {(): queue["queued"]},
+        )
+        lines += metrics.collected(
+            "review_queue_reviews_total",
+            "Reviews through the write-behind queue, by outcome",
+            ("outcome",),
+            {
+                (outcome,): queue[outcome]
+                for outcome in ("accepted", "rejected", "written", "dropped")
+            },
+            "counter",
+        )
+
+    return lines
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(_gauges()), media_type=CONTENT_TYPE)
@@ -1,51 +1,156 @@
-from typing import AsyncGenerator
-
-from fastapi import APIRouter, Depends, HTTPException
-
-from api.db.reviews import PostgresDb
-from api.models.entry import Review, ReviewCreate, ReviewUpdate
+import asyncio
+from typing import AsyncGenerator, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+
+from api.db.backend import review_repository
+from api.db.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    InvalidCursor,
+    decode_cursor,
+    decode_rank_cursor,
+    next_cursor,
+    next_rank_cursor,
+)
+from api.models.entry import (
+    ReviewCreate,
+    ReviewResponse,
+    ReviewSearchPage,
+    ReviewUpdate,
+)
+from api.routers.conditional import (
+    collection_etag,
+    conditional_response,
+)
+from api.routers.responses import rows_response
+from api.services.bulk import parse_bulk_body, validate_batch
+from api.services.ingest import review_batcher
 from api.services.reviews import ReviewService
 
 review_router = APIRouter()
 
 
 async def get_review_service() -> AsyncGenerator[ReviewService, None]:
-    async with PostgresDb() as db:
+    async with review_repository() as db:
         yield ReviewService(db)
 
 
 @review_router.post("/books/{book_id}/reviews")
 async def create_review(
     review_data: ReviewCreate,
+    response: Response,
     review_service: ReviewService = Depends(get_review_service),
 ):
+    if review_batcher.enabled:
+        review = review_data.to_record()
+        try:
+            review_batcher.submit(review)
+        except asyncio.QueueFull:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many reviews are waiting to be saved, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        response.status_code = 202
+
+        return {"detail": "Review accepted", "id": review["id"]}
+
     try:
-        review = Review(
-            user_id=review_data.user_id,
-            book_id=review_data.book_id,
-            rating=review_data.rating,
-            comment=review_data.comment,
-        )
-        review_dict = review.model_dump()
-        created_review = await review_service.db.create_review(review_dict)
+        created_review = await review_service.create_review(review_data.to_record())
 
         return {"detail": "Review created successfully", "review": created_review}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error creating entry: {str(e)}")
 
 
-@review_router.get("/books/{book_id}/reviews")
+@review_router.post("/reviews/bulk")
+async def create_reviews_bulk(
+    request: Request, review_service: ReviewService = Depends(get_review_service)
+):
+    try:
+        items = parse_bulk_body(
+            await request.body(), request.headers.get("content-type", "")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    valid, errors = validate_batch(ReviewCreate, items)
+    try:
+        created, missing = await review_service.create_reviews(
+            [(index, review.to_record()) for index, review in valid]
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error creating entry: {str(e)}")
+
+    return {
+        "detail": f"Created {len(created)} reviews",
+        "created": created,
+        "errors": sorted(errors + missing, key=lambda error: error["index"]),
+    }
+
+
+@review_router.get("/books/{book_id}/reviews", response_model=List[ReviewResponse])
 async def get_review(
-    book_id: str, review_service: ReviewService = Depends(get_review_service)
+    book_id: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    review_service: ReviewService = Depends(get_review_service),
 ):
-    reviews = await review_service.get_book_reviews(book_id)
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    reviews = await review_service.get_book_reviews(book_id, limit=limit, after=after)
     if not reviews:
-        raise HTTPException(status_code=404, detail="User not found")
+        if after is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        reviews = []
+
+    not_modified = conditional_response(request, response, collection_etag(reviews))
+    page_cursor = next_cursor(reviews, limit)
+    if page_cursor:
+        (not_modified or response).headers["X-Next-Cursor"] = page_cursor
+    if not_modified:
+        return not_modified
+
+    return rows_response(reviews, response)
+
+
+@review_router.get("/reviews/search", response_model=ReviewSearchPage)
+async def search_reviews(
+    response: Response,
+    q: str = Query(min_length=1, max_length=200),
+    book_id: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    review_service: ReviewService = Depends(get_review_service),
+):
+    try:
+        after = decode_rank_cursor(cursor) if cursor else None
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return reviews
+    try:
+        reviews = await review_service.search_reviews(
+            q, book_id=book_id, limit=limit, after=after
+        )
+        return rows_response(
+            {"reviews": reviews, "next_cursor": next_rank_cursor(reviews, limit)},
+            response,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching reviews {str(e)}")
 
 
-@review_router.patch("/reviews/{review_id}")
+@review_router.patch(
+    "/reviews/{review_id}",
+    response_model=ReviewResponse,
+    response_model_exclude_unset=True,
+)
 async def update_review(
     review_id: str,
     updated_data: ReviewUpdate,
@@ -63,9 +168,8 @@ async def update_review(
 async def delete_review(
     review_id: str, review_service: ReviewService = Depends(get_review_service)
 ):
-    review = await review_service.db.get_review(review_id)
-    if not review:
+    deleted = await review_service.delete_review(review_id)
+    if not deleted:
         raise HTTPException(status_code=404, detail="Review not found")
 
-    await review_service.delete_review(review_id)
     return {"detail": f"Deleted review {review_id}"}
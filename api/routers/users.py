@@ -1,16 +1,30 @@
-from typing import AsyncGenerator
-
-from fastapi import APIRouter, Depends, HTTPException
-
-from api.db.users import PostgresDb
-from api.models.entry import User, UserCreate, UserUpdate
+from typing import AsyncGenerator, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+
+from api.db.backend import user_repository
+from api.db.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    InvalidCursor,
+    decode_cursor,
+    next_cursor,
+)
+from api.models.entry import UserCreate, UserPage, UserResponse, UserUpdate
+from api.routers.conditional import (
+    collection_etag,
+    conditional_response,
+    record_etag,
+)
+from api.routers.responses import rows_response
+from api.services.bulk import parse_bulk_body, validate_batch
 from api.services.users import UserService
 
 user_router = APIRouter()
 
 
 async def get_user_service() -> AsyncGenerator[UserService, None]:
-    async with PostgresDb() as db:
+    async with user_repository() as db:
         yield UserService(db)
 
 
@@ -19,34 +33,90 @@ async def create_user(
     user_data: UserCreate, user_service: UserService = Depends(get_user_service)
 ):
     try:
-        user = User(username=user_data.username, email=user_data.email)
-        user_dict = user.model_dump()
-        created_user = await user_service.db.create_user(user_dict)
+        created_user = await user_service.create_user(user_data.to_record())
 
         return {"detail": "User created successfully", "user": created_user}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error creating entry: {str(e)}")
 
 
-@user_router.get("/users/{user_id}")
-async def get_user(user_id: str, user_service: UserService = Depends(get_user_service)):
+@user_router.post("/users/bulk")
+async def create_users_bulk(
+    request: Request, user_service: UserService = Depends(get_user_service)
+):
+    try:
+        items = parse_bulk_body(
+            await request.body(), request.headers.get("content-type", "")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    valid, errors = validate_batch(UserCreate, items)
+    try:
+        users = await user_service.create_users([user.to_record() for _, user in valid])
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error creating entry: {str(e)}")
+
+    return {
+        "detail": f"Created {len(users)} users",
+        "created": [
+            {"index": index, "id": user["id"]} for (index, _), user in zip(valid, users)
+        ],
+        "errors": errors,
+    }
+
+
+@user_router.get(
+    "/users/{user_id}", response_model=UserResponse, response_model_exclude_unset=True
+)
+async def get_user(
+    user_id: str,
+    request: Request,
+    response: Response,
+    user_service: UserService = Depends(get_user_service),
+):
     user = await user_service.get_user(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
+    not_modified = conditional_response(
+        request, response, record_etag(user), user.get("updated_at")
+    )
+    if not_modified:
+        return not_modified
+
     return user
 
 
-@user_router.get("/users")
-async def get_users(user_service: UserService = Depends(get_user_service)):
+@user_router.get("/users", response_model=UserPage)
+async def get_users(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user_service: UserService = Depends(get_user_service),
+):
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        users = await user_service.get_users()
-        return {"users": users}
+        users = await user_service.get_users(limit=limit, after=after)
+        not_modified = conditional_response(request, response, collection_etag(users))
+        if not_modified:
+            return not_modified
+
+        return rows_response(
+            {"users": users, "next_cursor": next_cursor(users, limit)}, response
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving entry {str(e)}")
 
 
-@user_router.patch("/users/{user_id}")
+@user_router.patch(
+    "/users/{user_id}", response_model=UserResponse, response_model_exclude_unset=True
+)
 async def update_user(
     user_id: str,
     updated_data: UserUpdate,
@@ -64,15 +134,14 @@ async def update_user(
 async def delete_user(
     user_id: str, user_service: UserService = Depends(get_user_service)
 ):
-    user = await user_service.get_user(user_id)
-    if not user:
+    deleted = await user_service.delete_user(user_id)
+    if not deleted:
         raise HTTPException(status_code=404, detail="User not found")
 
-    await user_service.delete_user(user_id)
     return {"detail": f"Deleted user {user_id}"}
 
 
 @user_router.delete("/users")
 async def delete_users(user_service: UserService = Depends(get_user_service)):
-    await user_service.delete_users()
-    return {"detail": "Deleted all users"}
+    deleted = await user_service.delete_users()
+    return {"detail": "Deleted all users", "deleted": deleted}
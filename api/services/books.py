@@ -1,28 +1,66 @@
+import asyncio
 import logging
 from datetime import datetime
-from typing import Any, Dict, List
-
-from api.db.books import PostgresDb
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from api.db.backend import book_repository
+from api.db.books import BookRepository
+from api.db.pagination import DEFAULT_PAGE_SIZE, Keyset
+from api.services.cache import MISSING, TTLCache, book_cache
+from api.services.singleflight import SingleFlight, book_flight
+from api.services.suggest import (
+    SUGGEST_INDEX_REFRESH_SECONDS,
+    PrefixIndex,
+    book_index,
+    normalize,
+)
 
 logger = logging.getLogger("__name__")
 
+# Trigram matching is meaningless below three characters
+MIN_FUZZY_LENGTH = 3
+
 
 class BookService:
-    def __init__(self, db: PostgresDb):
+    def __init__(
+        self,
+        db: BookRepository,
+        cache: TTLCache = book_cache,
+        index: PrefixIndex = book_index,
+        flight: SingleFlight = book_flight,
+    ):
         self.db = db
-        logger.debug("User service initialized with PostgresDb client")
+        self.cache = cache
+        self.index = index
+        self.flight = flight
+        logger.debug("User service initialized with BookRepository")
 
     async def create_book(self, book_data: Dict[str, Any]) -> Dict[str, Any]:
         logger.info("Creating new entries")
-        now = datetime.now()
-        book = {**book_data, "created_at": now}
+        book = await self.db.create_book(book_data)
+        self.index.add(book)
         logger.debug("Successfully created a book")
 
         return book
 
+    async def create_books(self, books: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        logger.info("Creating %s books in bulk", len(books))
+        if books:
+            await self.db.create_books(books)
+            self.index.add_many(books)
+        logger.debug("Successfully created %s books", len(books))
+
+        return books
+
     async def get_book(self, book_id: str) -> Dict[str, Any]:
         logger.info("Getting book info")
-        book_data = await self.db.get_book(book_id)
+        book_data = self.cache.get(book_id)
+        if book_data is MISSING:
+            generation = self.cache.generation(book_id)
+            book_data = await self.flight.do(
+                ("get_book", book_id), self.db.get_book, book_id
+            )
+            self.cache.set(book_id, book_data, generation)
         if book_data:
             logger.debug("Found book %s", book_id)
         else:
@@ -30,9 +68,19 @@ class BookService:
 
         return book_data
 
-    async def get_books(self) -> List[Dict[str, Any]]:
-        logger.info("Getting all books info")
-        books = await self.db.get_books()
+    async def get_book_stats(self, book_id: str) -> Optional[Dict[str, Any]]:
+        logger.info("Getting book rating stats")
+        stats = await self.db.get_book_stats(book_id)
+        if not stats:
+            logger.warning("Could not find book %s", book_id)
+
+        return stats
+
+    async def get_books(
+        self, limit: int = DEFAULT_PAGE_SIZE, after: Optional[Keyset] = None
+    ) -> List[Dict[str, Any]]:
+        logger.info("Getting a page of books info")
+        books = await self.db.get_books(limit=limit, after=after)
         if books:
             logger.debug("Found all books")
         else:
@@ -40,42 +88,130 @@ class BookService:
 
         return books
 
+    async def build_suggest_index(self) -> int:
+        logger.info("Building the book suggestion index")
+        await self.index.rebuild(self.db.iter_book_titles())
+        logger.info("Indexed %s books for suggestions", len(self.index))
+
+        return len(self.index)
+
+    async def suggest_books(
+        self, prefix: str, limit: int = 10, fuzzy: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Prefix matches from the in-memory index, topped up with fuzzy matches."""
+        suggestions = self.index.suggest(prefix, limit) if self.index.ready else []
+        if (
+            fuzzy
+            and len(suggestions) < limit
+            and len(normalize(prefix)) >= MIN_FUZZY_LENGTH
+        ):
+            seen = {book["id"] for book in suggestions}
+            for book in await self.db.find_similar_books(prefix, limit):
+                if len(suggestions) == limit:
+                    break
+                if book["id"] not in seen:
+                    suggestions.append(book)
+
+        return suggestions
+
+    def export_books(
+        self, since: Optional[datetime] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        logger.info("Exporting books created since %s", since)
+        return self.db.iter_books(since)
+
     async def update_book(
         self, book_id: str, updated_data: Dict[str, Any]
     ) -> Dict[str, Any]:
         logger.info("Updating book info")
-        old_book = await self.db.get_book(book_id)
-        if not old_book:
+        book = await self.db.update_book(
+            book_id, {**updated_data, "updated_at": datetime.now()}
+        )
+        if not book:
             logger.warning("Book %s not found", book_id)
             return None
 
-        new_book = {
-            **old_book,
-            **updated_data,
-            "id": book_id,
-            "created_at": old_book["created_at"],
-        }
-        await self.db.update_book(book_id, new_book)
+        self.cache.invalidate(book_id)
+        self.flight.forget(("get_book", book_id))
+        self.index.add(book)
         logger.debug("Successfully updated book info")
 
-        return new_book
+        return book
 
-    async def delete_book(self, book_id: str) -> None:
+    async def delete_book(self, book_id: str) -> Optional[str]:
         logger.info("Deleting a book")
-        book = await self.db.get_book(book_id)
-        if not book:
+        deleted = await self.db.delete_book(book_id)
+        self.cache.invalidate(book_id)
+        self.flight.forget(("get_book", book_id))
+        self.index.remove(book_id)
+        if not deleted:
             logger.warning("Book %s not found", book_id)
             return None
 
-        await self.db.delete_book(book_id)
         logger.debug("Successfully deleted a book")
 
-    async def delete_books(self) -> None:
+        return deleted
+
+    async def delete_books(self) -> int:
         logger.info("Deleting all books")
-        users = await self.db.get_books()
-        if not users:
+        deleted = await self.db.delete_books()
+        self.cache.clear()
+        self.flight.clear()
+        self.index.clear()
+        if not deleted:
             logger.warning("Books not found")
-            return None
-
-        await self.db.delete_books()
-        logger.debug("Successfully deleted all books")
+        else:
+            logger.debug("Successfully deleted %s books", deleted)
+
+        return deleted
+
+
+class SuggestIndexRefresher:
+    """Builds the suggestion index in the background and keeps rebuilding it.
+
+    The first build starts with the application, which serves suggestions
+    from fuzzy matches alone until it is done. Later builds run every
+    ``interval`` seconds, so books other workers created, renamed or deleted
+    are reflected within an interval; 0 builds the index only once.
+    """
+
+    def __init__(
+        self,
+        index: PrefixIndex = book_index,
+        interval: float = SUGGEST_INDEX_REFRESH_SECONDS,
+    ):
+        self.index = index
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.index.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def refresh_once(self) -> int:
+        async with book_repository() as db:
+            return await BookService(db, index=self.index).build_suggest_index()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh_once()
+            except Exception:
+                logger.exception("Suggestion index build failed")
+            if self.interval <= 0:
+                return
+            await asyncio.sleep(self.interval)
+
+
+suggest_refresher = SuggestIndexRefresher()
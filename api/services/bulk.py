@@ -0,0 +1,52 @@
+import json
+from typing import Any, Dict, List, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+MAX_BULK_ITEMS = 10000
+
+
+def parse_bulk_body(body: bytes, content_type: str) -> List[Any]:
+    """Decode a bulk request body sent either as a JSON array or as NDJSON."""
+    if content_type.split(";")[0].strip() in (
+        "application/x-ndjson",
+        "application/jsonl",
+    ):
+        try:
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid NDJSON body: {e}") from e
+    else:
+        try:
+            items = json.loads(body)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON body: {e}") from e
+        if not isinstance(items, list):
+            raise ValueError("Expected a JSON array of entries")
+
+    if len(items) > MAX_BULK_ITEMS:
+        raise ValueError(f"At most {MAX_BULK_ITEMS} entries can be sent at once")
+
+    return items
+
+
+def validate_batch(
+    model: Type[BaseModel], items: List[Any]
+) -> Tuple[List[Tuple[int, BaseModel]], List[Dict[str, Any]]]:
+    """Validate every item, returning the valid ones with their index and the errors."""
+    valid = []
+    errors = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, model.model_validate(item)))
+        except ValidationError as e:
+            errors.append(
+                {
+                    "index": index,
+                    "errors": e.errors(
+                        include_url=False, include_context=False, include_input=False
+                    ),
+                }
+            )
+
+    return valid, errors
@@ -0,0 +1,117 @@
+import itertools
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from api.db.replicas import consistency_required
+
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("CACHE_NEGATIVE_TTL_SECONDS", "5"))
+
+# Returned by TTLCache.get when nothing usable is cached, since a cached
+# lookup result may itself be None (a cached 404)
+MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a TTL.
+
+    Empty values (None or {}) are cached too, with a shorter TTL, so repeated
+    lookups of a missing id do not each hit the database. Each worker process
+    holds its own cache, so the TTL bounds how stale a read served after a
+    write in another worker can be.
+
+    A read that misses takes the key's ``generation`` before querying and
+    passes it to ``set``. Writes bump the generation when they invalidate,
+    so a row read before a write that committed while the query ran is not
+    cached over it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttl: float = CACHE_TTL_SECONDS,
+        negative_ttl: float = CACHE_NEGATIVE_TTL_SECONDS,
+        enabled: bool = CACHE_ENABLED,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        # Generation of each recently invalidated key, oldest first. Keys not
+        # listed are at the floor, which moves up past every generation that
+        # is dropped or cleared, so a dropped key never appears unchanged
+        self._writes = itertools.count(1)
+        self._generations: OrderedDict[Hashable, int] = OrderedDict()
+        self._floor = 0
+
+    def get(self, key: Hashable) -> Any:
+        # An entry may predate a write the request must see, possibly made
+        # through another worker
+        if not self.enabled or consistency_required():
+            return MISSING
+
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self._clock():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return MISSING
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def generation(self, key: Hashable) -> int:
+        return self._generations.get(key, self._floor)
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """Cache ``value``, unless ``key`` was invalidated since ``generation``."""
+        if not self.enabled:
+            return
+        if generation is not None and generation != self.generation(key):
+            return
+
+        ttl = self.ttl if value else self.negative_ttl
+        self._entries[key] = (self._clock() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+        self._generations[key] = next(self._writes)
+        self._generations.move_to_end(key)
+        while len(self._generations) > self.max_entries:
+            _, self._floor = self._generations.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._generations.clear()
+        self._floor = next(self._writes)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+book_cache = TTLCache("books")
+user_cache = TTLCache("users")
+review_cache = TTLCache("reviews")
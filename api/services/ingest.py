@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from api.db.backend import review_repository
+from api.services.reviews import ReviewService
+
+logger = logging.getLogger(__name__)
+
+# "sync" inserts each review before responding, "async" queues it for the
+# batcher and answers 202 straight away
+REVIEW_INGEST_MODE = os.getenv("REVIEW_INGEST_MODE", "sync").lower()
+if REVIEW_INGEST_MODE not in ("sync", "async"):
+    raise ValueError("REVIEW_INGEST_MODE must be 'sync' or 'async'")
+
+REVIEW_QUEUE_SIZE = int(os.getenv("REVIEW_QUEUE_SIZE", "10000"))
+REVIEW_BATCH_MAX_ROWS = int(os.getenv("REVIEW_BATCH_MAX_ROWS", "500"))
+REVIEW_BATCH_MAX_DELAY_MS = float(os.getenv("REVIEW_BATCH_MAX_DELAY_MS", "50"))
+
+
+async def write_reviews(reviews: List[Dict[str, Any]]) -> int:
+    """Insert a batch of queued reviews, returning how many were written.
+
+    Reviews pointing at unknown users or books are dropped, the rest go in
+    with one COPY whose rating stats update lands in the same transaction.
+    If that transaction fails (say a book was deleted after the check), the
+    batch is retried one review at a time so one bad row only loses itself.
+    """
+    async with review_repository() as db:
+        service = ReviewService(db)
+        try:
+            created, errors = await service.create_reviews(list(enumerate(reviews)))
+        except Exception:
+            logger.exception("Batch insert of %s reviews failed", len(reviews))
+            if len(reviews) == 1:
+                return 0
+            written = 0
+            for review in reviews:
+                try:
+                    await service.create_review(review)
+                    written += 1
+                except Exception as e:
+                    logger.warning("Dropped queued review %s: %s", review["id"], e)
+            return written
+
+    for error in errors:
+        logger.warning(
+            "Dropped queued review %s: %s",
+            reviews[error["index"]]["id"],
+            ", ".join(error["errors"]),
+        )
+
+    return len(created)
+
+
+class ReviewBatcher:
+    """Write-behind queue that group-commits review inserts.
+
+    ``submit`` only enqueues, so a request costs no database round trip. A
+    background task takes the first queued review, keeps collecting until
+    ``max_rows`` are waiting or ``max_delay_ms`` has passed, and writes the
+    lot in one transaction. A full queue raises asyncio.QueueFull, which the
+    route turns into a 503. ``stop`` refuses new reviews and flushes the
+    queue before returning; reviews still queued when a worker dies without
+    a clean shutdown are lost.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = REVIEW_INGEST_MODE == "async",
+        max_queue: int = REVIEW_QUEUE_SIZE,
+        max_rows: int = REVIEW_BATCH_MAX_ROWS,
+        max_delay_ms: float = REVIEW_BATCH_MAX_DELAY_MS,
+        writer: Callable[[List[Dict[str, Any]]], Awaitable[int]] = write_reviews,
+    ):
+        self.enabled = enabled
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self._writer = writer
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._closed = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._closed = False
+            self._task = asyncio.create_task(self._run())
+
+    def submit(self, review: Dict[str, Any]) -> None:
+        if self._closed:
+            self.rejected += 1
+            raise asyncio.QueueFull("The review queue is shutting down")
+        try:
+            self._queue.put_nowait(review)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+        self.accepted += 1
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._closed = True
+        logger.info("Flushing %s queued reviews", self._queue.qsize())
+        await self._queue.join()
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _next_batch(self) -> List[Dict[str, Any]]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_rows:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                written = await self._writer(batch)
+            except Exception:
+                logger.exception("Could not write %s queued reviews", len(batch))
+                written = 0
+            self.batches += 1
+            self.written += written
+            self.dropped += len(batch) - written
+            for _ in batch:
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize(),
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+        }
+
+
+review_batcher = ReviewBatcher()
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from api.db.backend import leaderboard_repository
+from api.db.leaderboards import LeaderboardRepository
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the background refresher; boards then only change when
+# LeaderboardService.refresh is called
+LEADERBOARD_REFRESH_SECONDS = float(os.getenv("LEADERBOARD_REFRESH_SECONDS", "300"))
+
+
+class LeaderboardService:
+    def __init__(self, db: LeaderboardRepository):
+        self.db = db
+        logger.debug("Leaderboard service initialized with LeaderboardRepository")
+
+    async def get_board(
+        self, board: str, limit: int, offset: int = 0
+    ) -> Dict[str, Any]:
+        logger.info("Getting the %s leaderboard", board)
+        return await self.db.get_board(board, limit, offset)
+
+    async def refresh(self, min_age: timedelta = timedelta(0)) -> List[str]:
+        refreshed = await self.db.refresh(datetime.now(), min_age)
+        if refreshed:
+            logger.info("Refreshed leaderboards: %s", ", ".join(refreshed))
+
+        return refreshed
+
+
+class LeaderboardRefresher:
+    """Rebuilds the leaderboards every ``interval`` seconds in the background.
+
+    Every worker runs one. A worker skips boards another worker rebuilt less
+    than half an interval ago, and skips the round entirely while another
+    worker holds the refresh lock, so the boards are rebuilt about once per
+    interval however many workers there are.
+    """
+
+    def __init__(self, interval: float = LEADERBOARD_REFRESH_SECONDS):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def refresh_once(self) -> List[str]:
+        async with leaderboard_repository() as db:
+            return await LeaderboardService(db).refresh(
+                min_age=timedelta(seconds=self.interval / 2)
+            )
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh_once()
+            except Exception:
+                logger.exception("Leaderboard refresh failed")
+            await asyncio.sleep(self.interval)
+
+
+leaderboard_refresher = LeaderboardRefresher()
@@ -1,28 +1,91 @@
 import logging
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from api.db.reviews import PostgresDb
+from api.db.pagination import DEFAULT_PAGE_SIZE, Keyset, RankKeyset
+from api.db.reviews import ReviewRepository
+from api.services.cache import MISSING, TTLCache, review_cache
+from api.services.singleflight import SingleFlight, review_flight
 
 logger = logging.getLogger("__name__")
 
 
 class ReviewService:
-    def __init__(self, db: PostgresDb):
+    def __init__(
+        self,
+        db: ReviewRepository,
+        cache: TTLCache = review_cache,
+        flight: SingleFlight = review_flight,
+    ):
         self.db = db
-        logger.debug("Review service initialized with PostgresDb client")
+        self.cache = cache
+        self.flight = flight
+        logger.debug("Review service initialized with ReviewRepository")
 
     async def create_review(self, review_data: Dict[str, Any]) -> Dict[str, Any]:
         logger.info("Creating new entries")
-        now = datetime.now()
-        review = {**review_data, "created_at": now, "updated_at": now}
+        review = await self.db.create_review(review_data)
+        # Book review pages in flight predate this review
+        self.flight.clear()
         logger.debug("Successfully created a review")
 
         return review
 
-    async def get_book_reviews(self, book_id: str) -> List[Dict[str, Any]]:
+    async def create_reviews(
+        self, reviews: List[Tuple[int, Dict[str, Any]]]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Insert indexed reviews, skipping the ones pointing at unknown users or books."""
+        logger.info("Creating %s reviews in bulk", len(reviews))
+        missing_users, missing_books = await self.db.find_missing_references(
+            list({review["user_id"] for _, review in reviews}),
+            list({review["book_id"] for _, review in reviews}),
+        )
+
+        created = []
+        errors = []
+        for index, review in reviews:
+            if review["user_id"] in missing_users:
+                errors.append({"index": index, "errors": ["User not found"]})
+            elif review["book_id"] in missing_books:
+                errors.append({"index": index, "errors": ["Book not found"]})
+            else:
+                created.append((index, review))
+
+        if created:
+            await self.db.create_reviews([review for _, review in created])
+            self.flight.clear()
+        logger.debug("Successfully created %s reviews", len(created))
+
+        return [{"index": i, "id": review["id"]} for i, review in created], errors
+
+    async def get_review(self, review_id: str) -> Dict[str, Any]:
+        logger.info("Getting review info")
+        review_data = self.cache.get(review_id)
+        if review_data is MISSING:
+            generation = self.cache.generation(review_id)
+            review_data = await self.db.get_review(review_id)
+            self.cache.set(review_id, review_data, generation)
+        if review_data:
+            logger.debug("Found review %s", review_id)
+        else:
+            logger.warning("Could not find review %s", review_id)
+
+        return review_data
+
+    async def get_book_reviews(
+        self,
+        book_id: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        after: Optional[Keyset] = None,
+    ) -> List[Dict[str, Any]]:
         logger.info("Getting review info")
-        review_data = await self.db.get_book_reviews(book_id)
+        review_data = await self.flight.do(
+            ("get_book_reviews", book_id, limit, after),
+            self.db.get_book_reviews,
+            book_id,
+            limit,
+            after,
+        )
         if review_data:
             logger.debug("Found review %s", book_id)
         else:
@@ -30,45 +93,65 @@ class ReviewService:
 
         return review_data
 
+    async def search_reviews(
+        self,
+        query: str,
+        book_id: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        after: Optional[RankKeyset] = None,
+    ) -> List[Dict[str, Any]]:
+        logger.info("Searching reviews")
+        reviews = await self.db.search_reviews(
+            query, book_id=book_id, limit=limit, after=after
+        )
+        logger.debug("Found %s matching reviews", len(reviews))
+
+        return reviews
+
+    def export_reviews(
+        self, since: Optional[datetime] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        logger.info("Exporting reviews created since %s", since)
+        return self.db.iter_reviews(since)
+
     async def update_review(
         self, review_id: str, updated_data: Dict[str, Any]
     ) -> Dict[str, Any]:
         logger.info("Updating review info")
-        old_review = await self.db.get_review(review_id)
-        if not old_review:
+        review = await self.db.update_review(
+            review_id, {**updated_data, "updated_at": datetime.now()}
+        )
+        if not review:
             logger.warning("Review %s not found", review_id)
             return None
 
-        new_review = {
-            **old_review,
-            **updated_data,
-            "id": review_id,
-            "user_id": old_review["user_id"],
-            "book_id": old_review["book_id"],
-            "created_at": old_review["created_at"],
-            "updated_at": datetime.now(),
-        }
-        await self.db.update_review(review_id, new_review)
+        self.cache.invalidate(review_id)
+        self.flight.clear()
         logger.debug("Successfully updated review info")
 
-        return new_review
+        return review
 
-    async def delete_review(self, review_id: str) -> None:
+    async def delete_review(self, review_id: str) -> Optional[str]:
         logger.info("Deleting a review")
-        review = await self.db.get_review(review_id)
-        if not review:
+        deleted = await self.db.delete_review(review_id)
+        self.cache.invalidate(review_id)
+        self.flight.clear()
+        if not deleted:
             logger.warning("Review %s not found", review_id)
             return None
 
-        await self.db.delete_review(review_id)
         logger.debug("Successfully deleted a review")
 
-    async def delete_reviews(self) -> None:
+        return deleted
+
+    async def delete_reviews(self) -> int:
         logger.info("Deleting all reviews")
-        reviews = await self.db.get_reviews()
-        if not reviews:
+        deleted = await self.db.delete_reviews()
+        self.cache.clear()
+        self.flight.clear()
+        if not deleted:
             logger.warning("Reviews not found")
-            return None
+        else:
+            logger.debug("Successfully deleted %s reviews", deleted)
 
-        await self.db.delete_reviews()
-        logger.debug("Successfully deleted all reviews")
+        return deleted
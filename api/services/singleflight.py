@@ -0,0 +1,85 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from api.db.replicas import consistency_required
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() not in (
+    "0",
+    "false",
+    "no",
+)
+
+
+class SingleFlight:
+    """Coalesces concurrent identical reads into one database query.
+
+    The first caller for a key starts the query; callers arriving with the
+    same key while it is running wait on it instead of sending their own,
+    and every caller gets the same result or exception. Nothing is kept once
+    the query finishes, so this only removes duplicate work inside a burst;
+    TTLCache is what serves repeats after that. Writes call ``forget`` so a
+    read that starts after the write does not join a query that began
+    before it. Callers that joined earlier still get that query's result,
+    so callers that cache it must pass the cache generation they took before
+    calling ``do``; see TTLCache.
+    """
+
+    def __init__(self, name: str, enabled: bool = SINGLE_FLIGHT_ENABLED):
+        self.name = name
+        self.enabled = enabled
+        self.calls = 0
+        self.shared = 0
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(
+        self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args: Any
+    ) -> Any:
+        # A query already in flight may have started before a write the
+        # caller's consistency token says it must see
+        if not self.enabled or consistency_required():
+            return await fn(*args)
+
+        self.calls += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._done(key, done))
+        else:
+            self.shared += 1
+
+        # Shielded so one waiter's cancelled request does not cancel the
+        # query for everyone else
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception retrieved even if every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def forget(self, key: Hashable) -> None:
+        """Let the next call for ``key`` start a fresh query.
+
+        Callers already waiting on the current one still get its result.
+        """
+        self._in_flight.pop(key, None)
+
+    def clear(self) -> None:
+        self._in_flight.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "enabled": self.enabled,
+            "in_flight": len(self._in_flight),
+            "calls": self.calls,
+            "shared": self.shared,
+            "shared_ratio": self.shared / self.calls if self.calls else 0.0,
+        }
+
+
+book_flight = SingleFlight("books")
+review_flight = SingleFlight("reviews")
@@ -0,0 +1,196 @@
+import asyncio
+import os
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Any, AsyncIterable, Callable, Dict, Iterable, List, Optional, Tuple
+
+SUGGEST_INDEX_ENABLED = os.getenv("SUGGEST_INDEX_ENABLED", "true").lower() not in (
+    "0",
+    "false",
+    "no",
+)
+# Seconds between rebuilds from the books table, which is how long a book
+# another worker renamed or deleted can still be suggested; 0 builds once
+SUGGEST_INDEX_REFRESH_SECONDS = float(os.getenv("SUGGEST_INDEX_REFRESH_SECONDS", "300"))
+
+
+def normalize(text: str) -> str:
+    """Case- and accent-insensitive form used for prefix matching."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.split())
+
+
+def _keys(book: Dict[str, Any]) -> List[str]:
+    # Every word start of the title and author, so "farm" finds "Animal Farm"
+    keys = set()
+    for text in (book["title"], book["author"]):
+        words = normalize(text).split()
+        keys.update(" ".join(words[i:]) for i in range(len(words)))
+
+    return sorted(keys)
+
+
+class PrefixIndex:
+    """In-memory typeahead over book titles and authors.
+
+    Keys live in one sorted list of (key, book_id) pairs, so a lookup is a
+    bisect to the first key at or after the prefix followed by a scan while
+    keys still start with it. Inserts and removals keep the list sorted;
+    ``add_many`` merges a large batch in one pass over the list, since
+    inserting into a list of millions of keys one at a time costs a shift
+    of the list per key.
+    Each worker process holds its own index, updated by the writes that
+    worker serves and rebuilt from the books table every
+    ``SUGGEST_INDEX_REFRESH_SECONDS`` to pick up everyone else's.
+    """
+
+    def __init__(self, enabled: bool = SUGGEST_INDEX_ENABLED):
+        self.enabled = enabled
+        self.ready = False
+        self._entries: List[Tuple[str, str]] = []
+        self._books: Dict[str, Dict[str, Any]] = {}
+        # Writes made while a rebuild runs, replayed on the rebuilt index
+        self._pending: Optional[List[Tuple[Callable[..., None], Tuple[Any, ...]]]] = (
+            None
+        )
+
+    def __len__(self) -> int:
+        return len(self._books)
+
+    def build(self, books: Iterable[Dict[str, Any]]) -> None:
+        self._entries, self._books = _build(books)
+        self.ready = True
+
+    async def rebuild(self, books: AsyncIterable[Dict[str, Any]]) -> None:
+        """Build from ``books`` with the sorting done in a worker thread.
+
+        Indexing a large catalogue takes seconds of CPU, which would otherwise
+        hold up the event loop. The new index replaces the old one in one step;
+        writes this worker serves in the meantime go to the old index and are
+        replayed on the new one, whose rows may predate them.
+        """
+        self._pending = []
+        try:
+            snapshot = [book async for book in books]
+            entries, indexed = await asyncio.to_thread(_build, snapshot)
+        finally:
+            pending, self._pending = self._pending, None
+        self._entries, self._books = entries, indexed
+        self.ready = True
+        for method, args in pending:
+            method(*args)
+
+    def _record(self, method: Callable[..., None], *args: Any) -> None:
+        if self._pending is not None:
+            self._pending.append((method, args))
+
+    def add(self, book: Dict[str, Any]) -> None:
+        self._record(self.add, book)
+        if not self.ready:
+            return
+
+        self._discard(book["id"])
+        self._books[book["id"]] = _summary(book)
+        for key in _keys(book):
+            insort(self._entries, (key, book["id"]))
+
+    def add_many(self, books: Iterable[Dict[str, Any]]) -> None:
+        added = {book["id"]: book for book in books}
+        self._record(self.add_many, list(added.values()))
+        if not self.ready:
+            return
+
+        replaced = added.keys() & self._books.keys()
+        if replaced:
+            self._entries = [
+                entry for entry in self._entries if entry[1] not in replaced
+            ]
+        for book_id, book in added.items():
+            self._books[book_id] = _summary(book)
+        new = sorted(
+            (key, book_id) for book_id, book in added.items() for key in _keys(book)
+        )
+        # A shift per key beats a pass over every entry until the batch is
+        # about a two-thousandth of the index
+        if len(new) * 2000 < len(self._entries):
+            for entry in new:
+                insort(self._entries, entry)
+        else:
+            self._entries = _merge(self._entries, new)
+
+    def remove(self, book_id: str) -> None:
+        self._record(self.remove, book_id)
+        self._discard(book_id)
+
+    def _discard(self, book_id: str) -> None:
+        book = self._books.pop(book_id, None)
+        if book is None:
+            return
+
+        for key in _keys(book):
+            position = bisect_left(self._entries, (key, book_id))
+            if position < len(self._entries) and self._entries[position] == (
+                key,
+                book_id,
+            ):
+                del self._entries[position]
+
+    def clear(self) -> None:
+        self._record(self.clear)
+        self._entries.clear()
+        self._books.clear()
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Books with a title or author word starting with ``prefix``, in key order."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        found: Dict[str, Dict[str, Any]] = {}
+        position = bisect_left(self._entries, (prefix,))
+        while position < len(self._entries) and len(found) < limit:
+            key, book_id = self._entries[position]
+            if not key.startswith(prefix):
+                break
+            found.setdefault(book_id, self._books[book_id])
+            position += 1
+
+        return list(found.values())
+
+
+def _summary(book: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": book["id"], "title": book["title"], "author": book["author"]}
+
+
+def _merge(
+    entries: List[Tuple[str, str]], new: List[Tuple[str, str]]
+) -> List[Tuple[str, str]]:
+    # Bisects for where each new entry goes and copies the runs in between,
+    # which costs a comparison per new entry rather than per existing one
+    merged: List[Tuple[str, str]] = []
+    start = 0
+    for entry in new:
+        position = bisect_left(entries, entry, start)
+        merged += entries[start:position]
+        merged.append(entry)
+        start = position
+    merged += entries[start:]
+
+    return merged
+
+
+def _build(
+    books: Iterable[Dict[str, Any]],
+) -> Tuple[List[Tuple[str, str]], Dict[str, Dict[str, Any]]]:
+    entries = []
+    indexed = {}
+    for book in books:
+        indexed[book["id"]] = _summary(book)
+        entries.extend((key, book["id"]) for key in _keys(book))
+    entries.sort()
+
+    return entries, indexed
+
+
+book_index = PrefixIndex()
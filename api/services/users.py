@@ -1,28 +1,42 @@
 import logging
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-from api.db.users import PostgresDb
+from api.db.pagination import DEFAULT_PAGE_SIZE, Keyset
+from api.db.users import UserRepository
+from api.services.cache import MISSING, TTLCache, user_cache
 
 logger = logging.getLogger("__name__")
 
 
 class UserService:
-    def __init__(self, db: PostgresDb):
+    def __init__(self, db: UserRepository, cache: TTLCache = user_cache):
         self.db = db
-        logger.debug("User service initialized with PostgresDb client")
+        self.cache = cache
+        logger.debug("User service initialized with UserRepository")
 
     async def create_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         logger.info("Creating new entries")
-        now = datetime.now()
-        user = {**user_data, "created_at": now, "updated_at": now}
+        user = await self.db.create_user(user_data)
         logger.debug("Successfully created a user")
 
         return user
 
+    async def create_users(self, users: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        logger.info("Creating %s users in bulk", len(users))
+        if users:
+            await self.db.create_users(users)
+        logger.debug("Successfully created %s users", len(users))
+
+        return users
+
     async def get_user(self, user_id: str) -> Dict[str, Any]:
         logger.info("Getting user info")
-        user_data = await self.db.get_user(user_id)
+        user_data = self.cache.get(user_id)
+        if user_data is MISSING:
+            generation = self.cache.generation(user_id)
+            user_data = await self.db.get_user(user_id)
+            self.cache.set(user_id, user_data, generation)
         if user_data:
             logger.debug("Found user %s", user_id)
         else:
@@ -30,9 +44,11 @@ class UserService:
 
         return user_data
 
-    async def get_users(self) -> List[Dict[str, Any]]:
-        logger.info("Getting all users info")
-        users = await self.db.get_users()
+    async def get_users(
+        self, limit: int = DEFAULT_PAGE_SIZE, after: Optional[Keyset] = None
+    ) -> List[Dict[str, Any]]:
+        logger.info("Getting a page of users info")
+        users = await self.db.get_users(limit=limit, after=after)
         if users:
             logger.debug("Found all users")
         else:
@@ -40,43 +56,47 @@ class UserService:
 
         return users
 
+    def export_users(
+        self, since: Optional[datetime] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        logger.info("Exporting users created since %s", since)
+        return self.db.iter_users(since)
+
     async def update_user(
         self, user_id: str, updated_data: Dict[str, Any]
     ) -> Dict[str, Any]:
         logger.info("Updating user info")
-        old_user = await self.db.get_user(user_id)
-        if not old_user:
+        user = await self.db.update_user(
+            user_id, {**updated_data, "updated_at": datetime.now()}
+        )
+        if not user:
             logger.warning("User %s not found", user_id)
             return None
 
-        new_user = {
-            **old_user,
-            **updated_data,
-            "id": user_id,
-            "created_at": old_user["created_at"],
-            "updated_at": datetime.now(),
-        }
-        await self.db.update_user(user_id, new_user)
+        self.cache.invalidate(user_id)
         logger.debug("Successfully updated user info")
 
-        return new_user
+        return user
 
-    async def delete_user(self, user_id: str) -> None:
+    async def delete_user(self, user_id: str) -> Optional[str]:
         logger.info("Deleting a user")
-        user = await self.db.get_user(user_id)
-        if not user:
+        deleted = await self.db.delete_user(user_id)
+        self.cache.invalidate(user_id)
+        if not deleted:
             logger.warning("User %s not found", user_id)
             return None
 
-        await self.db.delete_user(user_id)
         logger.debug("Successfully deleted a user")
 
-    async def delete_users(self) -> None:
+        return deleted
+
+    async def delete_users(self) -> int:
         logger.info("Deleting all users")
-        users = await self.db.get_users()
-        if not users:
+        deleted = await self.db.delete_users()
+        self.cache.clear()
+        if not deleted:
             logger.warning("Users not found")
-            return None
+        else:
+            logger.debug("Successfully deleted %s users", deleted)
 
-        await self.db.delete_users()
-        logger.debug("Successfully deleted all users")
+        return deleted
@@ -0,0 +1,264 @@
+"""Per-request tracing and the slow-query log.
+
+Every HTTP request gets a request id (taken from ``X-Request-ID`` when the
+client sends one) and a RequestContext that adds up the time its repository
+calls spent waiting for a connection and running. With ``TRACING_EXPORTER``
+set to ``console`` or ``file``, the request and each repository call also
+become spans shaped like OpenTelemetry's, written one JSON object per line,
+so traces can be read without running a collector.
+"""
+
+import json
+import logging
+import os
+import secrets
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import IO, Any, Dict, Iterator, Optional
+
+slow_query_logger = logging.getLogger("api.db.slow_queries")
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+if TRACING_EXPORTER not in ("none", "console", "file"):
+    raise ValueError("TRACING_EXPORTER must be 'none', 'console' or 'file'")
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+# Repository calls slower than this are logged; a negative value disables the log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "status",
+    )
+
+    def __init__(self, name: str, parent: Optional["Span"] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.status = "OK"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "context": {"trace_id": self.trace_id, "span_id": self.span_id},
+            "parent_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+class JsonLinesExporter:
+    """Writes finished spans to a stream, one JSON object per line.
+
+    Writes are buffered and happen on the event loop, which is fine for
+    local debugging; point a collector at the app for production tracing.
+    """
+
+    def __init__(self, stream: Optional[IO[str]] = None, path: Optional[str] = None):
+        self._stream = stream
+        self._path = path
+
+    def export(self, span: Span) -> None:
+        if self._stream is None:
+            self._stream = open(self._path, "a", encoding="utf-8")
+        self._stream.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+    def shutdown(self) -> None:
+        if self._stream is not None:
+            self._stream.flush()
+            if self._path is not None:
+                self._stream.close()
+                self._stream = None
+
+
+class RequestContext:
+    """What one request's repository calls cost, summed over all of them."""
+
+    __slots__ = ("request_id", "queries", "db_ms", "acquire_ms")
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.queries = 0
+        self.db_ms = 0.0
+        self.acquire_ms = 0.0
+
+
+class QueryTiming:
+    """Connection wait accumulated by the pool during one repository call."""
+
+    __slots__ = ("acquire_ms",)
+
+    def __init__(self):
+        self.acquire_ms = 0.0
+
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+request_context: ContextVar[Optional[RequestContext]] = ContextVar(
+    "request_context", default=None
+)
+query_timing: ContextVar[Optional[QueryTiming]] = ContextVar(
+    "query_timing", default=None
+)
+
+
+class Tracer:
+    def __init__(self, exporter: Optional[JsonLinesExporter] = None):
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[Optional[Span]]:
+        """Run the block inside a child of the current span, if tracing is on."""
+        if self.exporter is None:
+            yield None
+            return
+
+        span = Span(name, current_span.get())
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "ERROR"
+            span.attributes["exception.type"] = type(e).__name__
+            raise
+        finally:
+            current_span.reset(token)
+            span.end_ns = time.time_ns()
+            self.exporter.export(span)
+
+    def shutdown(self) -> None:
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+def _exporter() -> Optional[JsonLinesExporter]:
+    if TRACING_EXPORTER == "console":
+        return JsonLinesExporter(stream=sys.stdout)
+    if TRACING_EXPORTER == "file":
+        return JsonLinesExporter(path=TRACING_FILE)
+    return None
+
+
+tracer = Tracer(_exporter())
+
+
+def record_query(
+    name: str,
+    duration_ms: float,
+    acquire_ms: float,
+    rows: Optional[int],
+    span: Optional[Span],
+) -> None:
+    """Attribute a finished repository call to its span, request and the slow log."""
+    execute_ms = duration_ms - acquire_ms
+    context = request_context.get()
+    if context is not None:
+        context.queries += 1
+        context.db_ms += duration_ms
+        context.acquire_ms += acquire_ms
+    if span is not None:
+        span.attributes.update(
+            {
+                "db.acquire_ms": round(acquire_ms, 3),
+                "db.execute_ms": round(execute_ms, 3),
+                "db.rows": rows,
+            }
+        )
+    if 0 <= SLOW_QUERY_MS <= duration_ms:
+        slow_query_logger.warning(
+            json.dumps(
+                {
+                    "event": "slow_query",
+                    "query": name,
+                    "duration_ms": round(duration_ms, 3),
+                    "acquire_ms": round(acquire_ms, 3),
+                    "execute_ms": round(execute_ms, 3),
+                    "rows": rows,
+                    "request_id": context.request_id if context else None,
+                    "trace_id": span.trace_id if span else None,
+                }
+            )
+        )
+
+
+class TracingMiddleware:
+    """ASGI middleware giving each request its id, context and root span.
+
+    The id is echoed in the ``X-Request-ID`` response header. The root span
+    records how much of the request went to repository calls, so the rest
+    (handler code and serialization) is its duration minus ``db.total_ms``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:128]
+                break
+        context = RequestContext(request_id or secrets.token_hex(16))
+        token = request_context.set(context)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", context.request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            with tracer.span(f"{scope['method']} {scope['path']}") as span:
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    if span is not None:
+                        _annotate_request(span, scope, status, context)
+        finally:
+            request_context.reset(token)
+
+
+def _annotate_request(
+    span: Span, scope: Dict[str, Any], status: int, context: RequestContext
+) -> None:
+    route = getattr(scope.get("route"), "path", None)
+    if route:
+        span.name = f"{scope['method']} {route}"
+    span.attributes.update(
+        {
+            "http.method": scope["method"],
+            "http.route": route,
+            "http.status_code": status,
+            "request.id": context.request_id,
+            "db.queries": context.queries,
+            "db.total_ms": round(context.db_ms, 3),
+            "db.acquire_ms": round(context.acquire_ms, 3),
+        }
+    )
@@ -0,0 +1,111 @@
+"""Compare book insert throughput and table size for each DATA_COLUMN_MODE.
+
+Usage:
+    BENCH_POSTGRES_URL=postgresql://... python -m benchmarks.data_column [--rows N]
+
+Runs against a throwaway schema in the given database, so any scratch
+PostgreSQL instance will do. For each mode it bulk loads ``--rows`` books
+with COPY, inserts ``--single`` more one statement at a time, then reports
+the rates and the size of the books table and its indexes.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import asyncpg
+
+from api.db.books import BookRepository
+from api.migrate import apply_migrations, load_migrations
+
+BATCH_SIZE = 1000
+
+
+def _books(count: int, offset: int = 0):
+    start = datetime(2024, 1, 1)
+    for i in range(offset, offset + count):
+        created_at = start + timedelta(seconds=i)
+        yield {
+            "id": str(uuid.uuid4()),
+            "title": f"Benchmark book number {i}",
+            "author": f"Author {i % 5000}",
+            "isbn": f"978{i:010d}",
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+
+
+async def _run_mode(pool, lean: bool, rows: int, single: int):
+    books = BookRepository()
+    books.pool = pool
+    books.lean_data = lean
+    await books.delete_books()
+    async with pool.acquire() as conn:
+        await conn.execute("VACUUM FULL books")
+
+    generated = list(_books(rows))
+    started = time.perf_counter()
+    for i in range(0, rows, BATCH_SIZE):
+        await books.create_books(generated[i : i + BATCH_SIZE])
+    copy_rate = rows / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for book in _books(single, offset=rows):
+        await books.create_book(book)
+    insert_rate = single / (time.perf_counter() - started)
+
+    await books.vacuum()
+    sizes = await books.relation_sizes()
+
+    return copy_rate, insert_rate, sizes
+
+
+async def benchmark(url: str, rows: int, single: int) -> None:
+    schema = f"bench_{uuid.uuid4().hex[:8]}"
+    admin = await asyncpg.connect(url)
+    await admin.execute(f"CREATE SCHEMA {schema}")
+    try:
+        pool = await asyncpg.create_pool(
+            url, min_size=1, max_size=1, server_settings={"search_path": schema}
+        )
+        try:
+            async with pool.acquire() as conn:
+                await apply_migrations(conn, load_migrations())
+
+            print(
+                f"{'mode':<6} {'COPY rows/s':>12} {'INSERT rows/s':>14} "
+                f"{'table MiB':>10} {'index MiB':>10}"
+            )
+            for mode in ("full", "lean"):
+                copy_rate, insert_rate, sizes = await _run_mode(
+                    pool, mode == "lean", rows, single
+                )
+                print(
+                    f"{mode:<6} {copy_rate:>12,.0f} {insert_rate:>14,.0f} "
+                    f"{sizes['table'] / 2**20:>10.1f} {sizes['indexes'] / 2**20:>10.1f}"
+                )
+        finally:
+            await pool.close()
+    finally:
+        await admin.execute(f"DROP SCHEMA {schema} CASCADE")
+        await admin.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--single", type=int, default=2_000)
+    args = parser.parse_args()
+
+    url = os.getenv("BENCH_POSTGRES_URL")
+    if not url:
+        parser.error("BENCH_POSTGRES_URL is not set")
+
+    asyncio.run(benchmark(url, args.rows, args.single))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Measure the Python-side cost of creating a book.
+
+Usage:
+    python -m benchmarks.ingest [--requests N] [--concurrency N]
+
+Two numbers are reported. The record timings compare the row building done
+before inserting: the old path validated the request into BookCreate, then
+built and dumped a second Book model, while the new one dumps BookCreate
+once. The requests/second figure drives POST /books/ in-process through
+httpx's ASGI transport with the database call answered immediately, so it
+measures routing, validation and encoding without the round trip.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import timeit
+
+import httpx
+
+from api.db.base import PostgresDb
+from api.main import app
+from api.models.entry import Book, BookCreate
+from api.routers.books import get_book_service
+from api.services.books import BookService
+
+PAYLOAD = {"title": "1984", "author": "George Orwell", "isbn": "1234567890"}
+
+
+def old_record():
+    book_data = BookCreate(**PAYLOAD)
+    book = Book(title=book_data.title, author=book_data.author, isbn=book_data.isbn)
+    record = book.model_dump()
+    return record, json.dumps(record, default=PostgresDb.datetime_serialize)
+
+
+def new_record():
+    record = BookCreate(**PAYLOAD).to_record()
+    return record, json.dumps(record, default=PostgresDb.datetime_serialize)
+
+
+class ImmediateBooks:
+    async def create_book(self, book_data):
+        return book_data
+
+
+async def requests_per_second(total: int, concurrency: int) -> float:
+    app.dependency_overrides[get_book_service] = lambda: BookService(ImmediateBooks())
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def post():
+            async with semaphore:
+                response = await client.post("/books/", json=PAYLOAD)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    app.dependency_overrides.clear()
+    return total / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    for name, build in (("old record", old_record), ("new record", new_record)):
+        seconds = min(timeit.repeat(build, number=10_000, repeat=5)) / 10_000
+        print(f"{name:<12} {seconds * 1e6:>7.2f} us")
+
+    rate = asyncio.run(requests_per_second(args.requests, args.concurrency))
+    print(f"POST /books/ {rate:>7,.0f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
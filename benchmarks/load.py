@@ -0,0 +1,404 @@
+"""Drive a running API with concurrent HTTP requests and report per-route latency.
+
+Usage:
+    python -m benchmarks.load [--base-url URL] [--concurrency N] [--duration S]
+        [--scale F] [--only NAME ...] [--output FILE] [--compare FILE]
+
+Expects a server seeded by ``benchmarks.seed`` with the same ``--scale`` (or
+``--users``/``--books``/``--reviews``), since request ids are picked from
+the seeded id ranges. Each scenario runs on its own for ``--duration``
+seconds with ``--concurrency`` requests in flight, so the numbers are per
+route rather than a mix. The write scenarios only touch records they
+create; ``DELETE /books`` and ``DELETE /users``, which empty whole tables,
+are never sent. Run the server with ``LEADERBOARD_REFRESH_SECONDS=0``: its
+refresher would rebuild the trending board as of today, past the seeded
+reviews, and leave it empty.
+
+The report (requests/second, error count and p50/p95/p99/max latency per
+scenario, plus the commit and settings) is printed and written as JSON to
+``--output``. ``--compare`` prints the change against an earlier report.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from benchmarks.seed import (
+    BOOKS,
+    EPOCH,
+    REVIEWS,
+    USERS,
+    book_id,
+    review_id,
+    user_id,
+)
+
+# (method, path, json body, expected statuses)
+Request = Tuple[str, str, Optional[Any], Tuple[int, ...]]
+
+
+@dataclass
+class Dataset:
+    users: int
+    books: int
+    reviews: int
+    # Exports stream the rows created after this, the newest seeded hour
+    export_since: datetime
+    rng: random.Random = field(default_factory=lambda: random.Random(7))
+    # Ids created by the write scenarios, for the ones that update or delete
+    created_users: List[str] = field(default_factory=list)
+    created_books: List[str] = field(default_factory=list)
+    created_reviews: List[str] = field(default_factory=list)
+
+    def user(self) -> str:
+        return user_id(self.rng.randrange(self.users))
+
+    def book(self) -> str:
+        # Same skew as the seeded reviews, so popular books are read most
+        return book_id(int(self.books * self.rng.random() ** 3))
+
+    def review(self) -> str:
+        return review_id(self.rng.randrange(self.reviews))
+
+    def word(self) -> str:
+        return self.rng.choice(("garden", "storm", "silent", "harbor", "echo"))
+
+
+def _new_user(data: Dataset) -> Dict[str, Any]:
+    n = data.rng.randrange(10**9)
+    return {"username": f"load{n}", "email": f"load{n}@example.com"}
+
+
+def _new_book(data: Dataset) -> Dict[str, Any]:
+    return {"title": f"Load {data.word()}", "author": "Load Driver", "isbn": None}
+
+
+def _new_review(data: Dataset) -> Dict[str, Any]:
+    return {
+        "user_id": data.user(),
+        "book_id": data.book(),
+        "rating": data.rng.choice((1, 2, 3, 4, 5)),
+        "comment": f"A {data.word()} review from the load driver",
+    }
+
+
+def _pick(data: Dataset, ids: List[str], fallback: Callable[[], str]) -> str:
+    return data.rng.choice(ids) if ids else fallback()
+
+
+def _take(ids: List[str]) -> str:
+    # Deleted ids are removed so no other request picks them afterwards
+    return ids.pop() if ids else "missing"
+
+
+OK = (200,)
+
+SCENARIOS: Dict[str, Callable[[Dataset], Request]] = {
+    # Books
+    "POST /books/": lambda d: ("POST", "/books/", _new_book(d), OK),
+    "POST /books/bulk": lambda d: (
+        "POST",
+        "/books/bulk",
+        [_new_book(d) for _ in range(100)],
+        OK,
+    ),
+    "GET /books/{book_id}": lambda d: ("GET", f"/books/{d.book()}", None, OK),
+    "GET /books/{book_id}?include_stats": lambda d: (
+        "GET",
+        f"/books/{d.book()}?include_stats=true",
+        None,
+        OK,
+    ),
+    "GET /books/{book_id}/stats": lambda d: (
+        "GET",
+        f"/books/{d.book()}/stats",
+        None,
+        (200, 404),
+    ),
+    "GET /books": lambda d: ("GET", "/books?limit=50", None, OK),
+    "GET /books/suggest": lambda d: (
+        "GET",
+        f"/books/suggest?prefix={d.word()[:3]}",
+        None,
+        OK,
+    ),
+    "GET /books/top": lambda d: ("GET", "/books/top", None, OK),
+    "GET /books/trending": lambda d: ("GET", "/books/trending", None, OK),
+    "PATCH /books/{book_id}": lambda d: (
+        "PATCH",
+        f"/books/{_pick(d, d.created_books, d.book)}",
+        {"title": f"Renamed {d.word()}"},
+        OK,
+    ),
+    "DELETE /books/{book_id}": lambda d: (
+        "DELETE",
+        f"/books/{_take(d.created_books)}",
+        None,
+        (200, 404),
+    ),
+    # Users
+    "POST /users/": lambda d: ("POST", "/users/", _new_user(d), OK),
+    "POST /users/bulk": lambda d: (
+        "POST",
+        "/users/bulk",
+        [_new_user(d) for _ in range(100)],
+        OK,
+    ),
+    "GET /users/{user_id}": lambda d: ("GET", f"/users/{d.user()}", None, OK),
+    "GET /users": lambda d: ("GET", "/users?limit=50", None, OK),
+    "PATCH /users/{user_id}": lambda d: (
+        "PATCH",
+        f"/users/{_pick(d, d.created_users, d.user)}",
+        {"username": f"renamed{d.rng.randrange(10**9)}"},
+        OK,
+    ),
+    "DELETE /users/{user_id}": lambda d: (
+        "DELETE",
+        f"/users/{_take(d.created_users)}",
+        None,
+        (200, 404),
+    ),
+    # Reviews
+    "POST /books/{book_id}/reviews": lambda d: (
+        "POST",
+        f"/books/{d.book()}/reviews",
+        _new_review(d),
+        (200, 202),
+    ),
+    "POST /reviews/bulk": lambda d: (
+        "POST",
+        "/reviews/bulk",
+        [_new_review(d) for _ in range(100)],
+        OK,
+    ),
+    "GET /books/{book_id}/reviews": lambda d: (
+        "GET",
+        f"/books/{d.book()}/reviews?limit=50",
+        None,
+        (200, 404),
+    ),
+    "GET /reviews/search": lambda d: (
+        "GET",
+        f"/reviews/search?q={d.word()}&limit=20",
+        None,
+        OK,
+    ),
+    "PATCH /reviews/{review_id}": lambda d: (
+        "PATCH",
+        f"/reviews/{_pick(d, d.created_reviews, d.review)}",
+        {"rating": d.rng.choice((1, 2, 3, 4, 5))},
+        OK,
+    ),
+    "DELETE /reviews/{review_id}": lambda d: (
+        "DELETE",
+        f"/reviews/{_take(d.created_reviews)}",
+        None,
+        (200, 404),
+    ),
+    "GET /export/books": lambda d: (
+        "GET",
+        f"/export/books?since={d.export_since.isoformat()}",
+        None,
+        OK,
+    ),
+    "GET /export/users": lambda d: (
+        "GET",
+        f"/export/users?since={d.export_since.isoformat()}",
+        None,
+        OK,
+    ),
+    "GET /export/reviews": lambda d: (
+        "GET",
+        f"/export/reviews?since={d.export_since.isoformat()}",
+        None,
+        OK,
+    ),
+    "GET /metrics": lambda d: ("GET", "/metrics", None, OK),
+}
+
+
+def _remember(name: str, data: Dataset, body: Any) -> None:
+    # Keep ids from the create scenarios for the update and delete ones
+    if name == "POST /books/":
+        data.created_books.append(body["book"]["id"])
+    elif name == "POST /users/":
+        data.created_users.append(body["user"]["id"])
+    elif name == "POST /reviews/bulk":
+        data.created_reviews.extend(item["id"] for item in body["created"])
+
+
+async def run_scenario(
+    session: aiohttp.ClientSession,
+    name: str,
+    data: Dataset,
+    concurrency: int,
+    duration: float,
+) -> Dict[str, Any]:
+    build = SCENARIOS[name]
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            method, path, body, expected = build(data)
+            started = time.perf_counter()
+            try:
+                async with session.request(method, path, json=body) as response:
+                    payload = await response.read()
+                    status = response.status
+            except aiohttp.ClientError as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if status not in expected:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+            elif method == "POST" and status == 200:
+                _remember(name, data, json.loads(payload))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return _summary(latencies, errors, elapsed)
+
+
+def _summary(
+    latencies: List[float], errors: Dict[str, int], elapsed: float
+) -> Dict[str, Any]:
+    result: Dict[str, Any] = {
+        "requests": len(latencies),
+        "errors": sum(errors.values()),
+        "error_statuses": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+    }
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        result.update(
+            {
+                "p50_ms": round(cuts[49] * 1000, 2),
+                "p95_ms": round(cuts[94] * 1000, 2),
+                "p99_ms": round(cuts[98] * 1000, 2),
+                "max_ms": round(max(latencies) * 1000, 2),
+            }
+        )
+
+    return result
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print(results: Dict[str, Dict[str, Any]]) -> None:
+    print(
+        f"{'scenario':<36} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'p99 ms':>8} {'errors':>7}"
+    )
+    for name, r in results.items():
+        print(
+            f"{name:<36} {r['rps']:>9,.1f} {r.get('p50_ms', 0):>8.2f} "
+            f"{r.get('p95_ms', 0):>8.2f} {r.get('p99_ms', 0):>8.2f} {r['errors']:>7}"
+        )
+
+
+def _compare(
+    results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]
+) -> None:
+    print(f"\n{'scenario':<36} {'rps':>9} {'p95':>9}   (change from baseline)")
+    for name, r in results.items():
+        old = baseline.get(name)
+        if not old or not old.get("rps") or not old.get("p95_ms"):
+            continue
+        rps = (r["rps"] - old["rps"]) / old["rps"] * 100
+        p95 = (r.get("p95_ms", 0) - old["p95_ms"]) / old["p95_ms"] * 100
+        print(f"{name:<36} {rps:>+8.1f}% {p95:>+8.1f}%")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    data = Dataset(
+        users=args.users or max(1, int(USERS * args.scale)),
+        books=args.books or max(1, int(BOOKS * args.scale)),
+        reviews=args.reviews or max(1, int(REVIEWS * args.scale)),
+        export_since=args.epoch - timedelta(hours=1),
+    )
+    names = args.only or list(SCENARIOS)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    results = {}
+    async with aiohttp.ClientSession(
+        args.base_url, connector=connector, timeout=timeout
+    ) as session:
+        for name in names:
+            results[name] = await run_scenario(
+                session, name, data, args.concurrency, args.duration
+            )
+            print(f"{name:<36} {results[name]['rps']:>9,.1f} req/s")
+
+    return {
+        "commit": _commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "dataset": {"users": data.users, "books": data.books, "reviews": data.reviews},
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument(
+        "--duration", type=float, default=10, help="seconds per scenario"
+    )
+    parser.add_argument("--timeout", type=float, default=30, help="seconds per request")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--books", type=int)
+    parser.add_argument("--reviews", type=int)
+    parser.add_argument(
+        "--epoch",
+        type=datetime.fromisoformat,
+        default=EPOCH,
+        help="the --epoch the database was seeded with",
+    )
+    parser.add_argument(
+        "--only", nargs="+", choices=list(SCENARIOS), metavar="NAME", help="scenarios"
+    )
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", help="an earlier --output report")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print()
+    _print(report["results"])
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            _compare(report["results"], json.load(f)["results"])
+
+
+if __name__ == "__main__":
+    main()
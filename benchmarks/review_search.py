@@ -0,0 +1,167 @@
+"""Measure GET /reviews/search query latency on a seeded review table.
+
+Usage:
+    BENCH_POSTGRES_URL=postgresql://... python -m benchmarks.review_search [--reviews N]
+
+Seeds ``--reviews`` reviews (one million by default) with comments drawn
+from a fixed vocabulary into a throwaway schema, then times each search
+shape through ReviewRepository.search_reviews and prints p50/p95/p99.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import asyncpg
+
+from api.db.reviews import ReviewRepository
+from api.migrate import apply_migrations, load_migrations
+
+BOOKS = 1000
+USERS = 1000
+COPY_BATCH = 50_000
+
+# Zipf-like: early words are common, late ones rare
+VOCABULARY = (
+    "book story read characters plot ending writing author pages chapter "
+    "slow gripping twist boring beautiful prose dialogue pacing sequel "
+    "heartbreaking hilarious atmospheric unputdownable forgettable "
+    "dystopian whimsical meandering labyrinthine serendipitous"
+).split()
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+SEARCHES = {
+    "common term": ("book", None),
+    "rare term": ("serendipitous", None),
+    "two terms": ("gripping twist", None),
+    "phrase": ('"beautiful prose"', None),
+    "common, one book": ("book", "book-7"),
+}
+
+
+def _comment(rng: random.Random) -> str:
+    return " ".join(rng.choices(VOCABULARY, weights=WEIGHTS, k=rng.randint(8, 40)))
+
+
+async def seed(conn, reviews: int) -> None:
+    start = datetime(2024, 1, 1)
+    await conn.copy_records_to_table(
+        "users",
+        records=[
+            (f"user-{i}", f"reader{i}", f"r{i}@example.com", "{}", start, start)
+            for i in range(USERS)
+        ],
+        columns=["id", "username", "email", "data", "created_at", "updated_at"],
+    )
+    await conn.copy_records_to_table(
+        "books",
+        records=[
+            (f"book-{i}", f"Book {i}", f"Author {i}", "{}", start, start)
+            for i in range(BOOKS)
+        ],
+        columns=["id", "title", "author", "data", "created_at", "updated_at"],
+    )
+
+    rng = random.Random(42)
+    for offset in range(0, reviews, COPY_BATCH):
+        batch = []
+        for i in range(offset, min(offset + COPY_BATCH, reviews)):
+            created_at = start + timedelta(seconds=i)
+            batch.append(
+                (
+                    str(uuid.uuid4()),
+                    f"user-{rng.randrange(USERS)}",
+                    f"book-{rng.randrange(BOOKS)}",
+                    rng.randint(1, 5),
+                    _comment(rng),
+                    "{}",
+                    created_at,
+                    created_at,
+                )
+            )
+        await conn.copy_records_to_table(
+            "reviews",
+            records=batch,
+            columns=[
+                "id",
+                "user_id",
+                "book_id",
+                "rating",
+                "comment",
+                "data",
+                "created_at",
+                "updated_at",
+            ],
+        )
+    await conn.execute("ANALYZE reviews")
+
+
+def _percentiles(samples):
+    cuts = statistics.quantiles(samples, n=100)
+    return cuts[49], cuts[94], cuts[98]
+
+
+async def benchmark(url: str, reviews: int, runs: int) -> None:
+    schema = f"bench_{uuid.uuid4().hex[:8]}"
+    admin = await asyncpg.connect(url)
+    await admin.execute(f"CREATE SCHEMA {schema}")
+    try:
+        pool = await asyncpg.create_pool(
+            url, min_size=1, max_size=1, server_settings={"search_path": schema}
+        )
+        try:
+            async with pool.acquire() as conn:
+                await apply_migrations(conn, load_migrations())
+                started = time.perf_counter()
+                await seed(conn, reviews)
+                print(
+                    f"seeded {reviews:,} reviews in {time.perf_counter() - started:.0f}s"
+                )
+
+            repository = ReviewRepository()
+            repository.pool = pool
+            print(f"{'search':<18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+            for name, (query, book_id) in SEARCHES.items():
+                samples = []
+                after = None
+                for _ in range(runs):
+                    started = time.perf_counter()
+                    page = await repository.search_reviews(
+                        query, book_id=book_id, limit=50, after=after
+                    )
+                    samples.append((time.perf_counter() - started) * 1000)
+                    # Alternate between the first page and the one after it
+                    after = (
+                        None
+                        if after or not page
+                        else (page[-1]["rank"], page[-1]["id"])
+                    )
+                p50, p95, p99 = _percentiles(samples)
+                print(f"{name:<18} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f}")
+        finally:
+            await pool.close()
+    finally:
+        await admin.execute(f"DROP SCHEMA {schema} CASCADE")
+        await admin.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reviews", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    url = os.getenv("BENCH_POSTGRES_URL")
+    if not url:
+        parser.error("BENCH_POSTGRES_URL is not set")
+
+    asyncio.run(benchmark(url, args.reviews, args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""Seed a database with a deterministic users/books/reviews dataset.
+
+Usage:
+    BENCH_POSTGRES_URL=postgresql://... python -m benchmarks.seed [--scale F] [--truncate]
+
+Loads ``--users`` users, ``--books`` books and ``--reviews`` reviews (100k,
+1M and 10M at ``--scale 1``) into the tables the API reads, applying any
+pending migrations first. Rows are streamed through COPY in batches, so
+memory stays flat whatever the size. The same ``--seed`` and ``--epoch``
+always produce the same rows, and the epoch defaults to a fixed date so
+datasets seeded on different days match. Ids are derived from each row's
+position, which is how ``benchmarks.load`` picks existing records without
+asking the database.
+Rating stats and the leaderboards are rebuilt once the reviews are in, the
+leaderboards as of the epoch so the trending board covers its last days.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List
+
+import asyncpg
+
+from api.db.books import BookRepository
+from api.db.leaderboards import LeaderboardRepository
+from api.db.reviews import ReviewRepository
+from api.db.users import UserRepository
+from api.migrate import apply_migrations, load_migrations
+
+USERS = 100_000
+BOOKS = 1_000_000
+REVIEWS = 10_000_000
+COPY_BATCH = 50_000
+REVIEW_COPY_COLUMNS = [
+    "id",
+    "user_id",
+    "book_id",
+    "rating",
+    "comment",
+    "data",
+    "created_at",
+    "updated_at",
+]
+
+# Users and books are spread over the year before the epoch, reviews over
+# the last 30 days of it so the trending board has something to rank
+# Newest timestamp in the dataset unless --epoch says otherwise
+EPOCH = datetime(2024, 1, 1)
+CATALOGUE_SPAN = timedelta(days=365)
+REVIEW_SPAN = timedelta(days=30)
+
+WORDS = (
+    "shadow river garden winter empire silent glass orchard harbor lantern "
+    "iron paper crown forest letter salt storm valley echo ember north "
+    "island memory night quiet summer thread wild hollow"
+).split()
+NAMES = (
+    "Ada Ben Chen Dara Emil Fatima Goran Hana Ivo Jun Kai Lena Mara Nikos "
+    "Omar Priya Quinn Rosa Sven Tomas Uma Vera Wen Yusuf Zoe"
+).split()
+COMMENT_WORDS = (
+    "book story read characters plot ending writing pages chapter slow "
+    "gripping twist boring beautiful prose dialogue pacing sequel "
+    "heartbreaking hilarious atmospheric forgettable whimsical"
+).split()
+
+# Distinct prefixes keep the three id spaces apart
+USER_NAMESPACE = 1
+BOOK_NAMESPACE = 2
+REVIEW_NAMESPACE = 3
+
+
+def _id(namespace: int, index: int) -> str:
+    return str(uuid.UUID(int=(namespace << 96) | index))
+
+
+def user_id(index: int) -> str:
+    return _id(USER_NAMESPACE, index)
+
+
+def book_id(index: int) -> str:
+    return _id(BOOK_NAMESPACE, index)
+
+
+def review_id(index: int) -> str:
+    return _id(REVIEW_NAMESPACE, index)
+
+
+def _timestamp(epoch: datetime, index: int, count: int, span: timedelta) -> datetime:
+    # Evenly spaced and increasing with the index, ending at the epoch
+    return epoch - span + span * (index / max(count, 1))
+
+
+def generate_users(count: int, seed: int, epoch: datetime) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(f"users-{seed}")
+    for i in range(count):
+        created_at = _timestamp(epoch, i, count, CATALOGUE_SPAN)
+        name = f"{rng.choice(NAMES).lower()}{i}"
+        yield {
+            "id": user_id(i),
+            "username": name,
+            "email": f"{name}@example.com",
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+
+
+def generate_books(count: int, seed: int, epoch: datetime) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(f"books-{seed}")
+    for i in range(count):
+        created_at = _timestamp(epoch, i, count, CATALOGUE_SPAN)
+        yield {
+            "id": book_id(i),
+            "title": " ".join(rng.choices(WORDS, k=rng.randint(1, 4))).title(),
+            "author": f"{rng.choice(NAMES)} {rng.choice(WORDS).title()}",
+            "isbn": f"978{i:010d}",
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+
+
+def generate_reviews(
+    count: int, users: int, books: int, seed: int, epoch: datetime
+) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(f"reviews-{seed}")
+    for i in range(count):
+        created_at = _timestamp(epoch, i, count, REVIEW_SPAN)
+        yield {
+            "id": review_id(i),
+            "user_id": user_id(rng.randrange(users)),
+            # Skewed towards low indexes: the first 1% of books get about a
+            # fifth of the reviews, as popular titles would
+            "book_id": book_id(int(books * rng.random() ** 3)),
+            "rating": rng.choice((1, 2, 3, 3.5, 4, 4, 4.5, 5, 5)),
+            "comment": " ".join(rng.choices(COMMENT_WORDS, k=rng.randint(5, 30))),
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+
+
+def _batches(rows: Iterator[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == COPY_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _copy_reviews(pool, reviews_db: ReviewRepository):
+    """COPY reviews without the per-batch stats upserts of create_reviews."""
+
+    async def copy(reviews: List[Dict[str, Any]]) -> None:
+        records = [
+            (
+                review["id"],
+                review["user_id"],
+                review["book_id"],
+                review["rating"],
+                review["comment"],
+                reviews_db.data_json(review),
+                review["created_at"],
+                review["updated_at"],
+            )
+            for review in reviews
+        ]
+        async with pool.acquire() as conn:
+            await conn.copy_records_to_table(
+                "reviews", records=records, columns=REVIEW_COPY_COLUMNS
+            )
+
+    return copy
+
+
+async def _load(name: str, create, rows: Iterator[Dict[str, Any]], count: int):
+    started = time.perf_counter()
+    loaded = 0
+    for batch in _batches(rows):
+        await create(batch)
+        loaded += len(batch)
+        print(f"\r{name:<8} {loaded:>12,} / {count:,}", end="", flush=True)
+    elapsed = time.perf_counter() - started
+    print(
+        f"\r{name:<8} {loaded:>12,} rows in {elapsed:,.0f}s ({loaded / elapsed:,.0f}/s)"
+    )
+
+
+async def seed(
+    url: str,
+    users: int,
+    books: int,
+    reviews: int,
+    seed: int,
+    epoch: datetime,
+    truncate: bool,
+):
+    pool = await asyncpg.create_pool(url, min_size=1, max_size=2)
+    try:
+        async with pool.acquire() as conn:
+            await apply_migrations(conn, load_migrations())
+            if truncate:
+                await conn.execute(
+                    "TRUNCATE reviews, book_rating_stats, book_leaderboards,"
+                    " leaderboard_refreshes, books, users"
+                )
+
+        repositories = (
+            UserRepository(),
+            BookRepository(),
+            ReviewRepository(),
+            LeaderboardRepository(),
+        )
+        for repository in repositories:
+            repository.pool = pool
+        user_db, book_db, review_db, leaderboard_db = repositories
+
+        await _load(
+            "users", user_db.create_users, generate_users(users, seed, epoch), users
+        )
+        await _load(
+            "books", book_db.create_books, generate_books(books, seed, epoch), books
+        )
+        # Stats are rebuilt in one pass below rather than per batch
+        await _load(
+            "reviews",
+            _copy_reviews(pool, review_db),
+            generate_reviews(reviews, users, books, seed, epoch),
+            reviews,
+        )
+
+        started = time.perf_counter()
+        await review_db.rebuild_rating_stats()
+        async with pool.acquire() as conn:
+            await conn.execute("VACUUM (ANALYZE) users, books, reviews")
+        # As of the epoch, which keeps the newest reviews inside the trending window
+        await leaderboard_db.refresh(epoch)
+        print(
+            f"stats, analyze and leaderboards in {time.perf_counter() - started:,.0f}s"
+        )
+    finally:
+        await pool.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="multiplies the default row counts"
+    )
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--books", type=int)
+    parser.add_argument("--reviews", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--epoch",
+        type=datetime.fromisoformat,
+        default=EPOCH,
+        help=f"newest timestamp in the dataset (default: {EPOCH.date()})",
+    )
+    parser.add_argument(
+        "--truncate", action="store_true", help="empty the tables before loading"
+    )
+    args = parser.parse_args()
+
+    url = os.getenv("BENCH_POSTGRES_URL")
+    if not url:
+        parser.error("BENCH_POSTGRES_URL is not set")
+
+    asyncio.run(
+        seed(
+            url,
+            args.users or max(1, int(USERS * args.scale)),
+            args.books or max(1, int(BOOKS * args.scale)),
+            args.reviews or int(REVIEWS * args.scale),
+            args.seed,
+            args.epoch,
+            args.truncate,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
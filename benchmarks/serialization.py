@@ -0,0 +1,83 @@
+"""Time the encoding of a GET /books page through each response path.
+
+Usage:
+    python -m benchmarks.serialization [--items N] [--repeat N]
+
+"jsonable_encoder" is what FastAPI does for a route without a response model:
+walk the dicts into JSON-compatible values, then json.dumps them. "response
+model" is the path taken once the route declares one: Pydantic validates the
+rows into BookPage and writes JSON bytes directly. "orjson rows" is what the
+list endpoints return: the rows encoded by ORJSONResponse, unvalidated.
+"""
+
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from api.models.entry import BookPage
+from api.routers.responses import ORJSONResponse
+
+
+def _page(items: int):
+    start = datetime(2024, 1, 1)
+    return {
+        "books": [
+            {
+                "id": f"{i:08d}-5f1c-4a8e-9d2b-7c3e1f0a6b4d",
+                "title": f"Benchmark book number {i}",
+                "author": f"Author {i % 5000}",
+                "isbn": f"978{i:010d}",
+                "created_at": start + timedelta(seconds=i),
+                "updated_at": start + timedelta(seconds=i),
+            }
+            for i in range(items)
+        ],
+        "next_cursor": None,
+    }
+
+
+def _encoders():
+    adapter = TypeAdapter(BookPage)
+
+    def encoder(page):
+        # Matches starlette's JSONResponse.render
+        return json.dumps(
+            jsonable_encoder(page),
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+    def response_model(page):
+        return adapter.dump_json(adapter.validate_python(page), exclude_unset=True)
+
+    return {
+        "jsonable_encoder": encoder,
+        "response model": response_model,
+        "orjson rows": ORJSONResponse,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    page = _page(args.items)
+    encoders = _encoders()
+    baseline = None
+    print(f"{'path':<18} {'ms/page':>9} {'speedup':>8}")
+    for name, encode in encoders.items():
+        seconds = min(timeit.repeat(lambda: encode(page), number=1, repeat=args.repeat))
+        baseline = baseline or seconds
+        print(f"{name:<18} {seconds * 1000:>9.2f} {baseline / seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Serve the API from the in-memory backend, preloaded with the seed dataset.
+
+Usage:
+    DB_BACKEND=memory python -m benchmarks.serve_memory [--scale F] [--port 8000]
+
+Fills the worker's MemoryStore with the rows ``benchmarks.seed`` would write
+for the same ``--scale``, ``--seed`` and ``--epoch``, then runs uvicorn on
+it, so ``benchmarks.load`` can be pointed at a server whose every query is a
+dict lookup and what it measures is the HTTP and serialization layers. The
+full dataset takes several gigabytes of RAM; ``--scale 0.1`` is a more
+practical default.
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import date, datetime
+
+import uvicorn
+
+from api.db import backend
+from api.db.memory import (
+    MemoryBookRepository,
+    MemoryReviewRepository,
+    MemoryUserRepository,
+)
+from api.main import app
+from benchmarks.seed import (
+    BOOKS,
+    REVIEWS,
+    USERS,
+    _batches,
+    generate_books,
+    generate_reviews,
+    generate_users,
+)
+
+
+async def preload(users: int, books: int, reviews: int, seed: int, epoch: datetime):
+    started = time.perf_counter()
+    for create, rows in (
+        (MemoryUserRepository().create_users, generate_users(users, seed, epoch)),
+        (MemoryBookRepository().create_books, generate_books(books, seed, epoch)),
+        (
+            MemoryReviewRepository().create_reviews,
+            generate_reviews(reviews, users, books, seed, epoch),
+        ),
+    ):
+        for batch in _batches(rows):
+            await create(batch)
+    print(
+        f"loaded {users:,} users, {books:,} books and {reviews:,} reviews"
+        f" in {time.perf_counter() - started:,.0f}s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=0.1)
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--books", type=int)
+    parser.add_argument("--reviews", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--epoch",
+        type=datetime.fromisoformat,
+        default=datetime.combine(date.today(), datetime.min.time()),
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    if backend.DB_BACKEND != "memory":
+        parser.error("run with DB_BACKEND=memory")
+
+    users = args.users or max(1, int(USERS * args.scale))
+    books = args.books or max(1, int(BOOKS * args.scale))
+    asyncio.run(
+        preload(
+            users,
+            books,
+            args.reviews or int(REVIEWS * args.scale),
+            args.seed,
+            args.epoch,
+        )
+    )
+    # The startup hook builds the suggestion index and the leaderboards
+    # from what was just loaded
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Compare repository read latency on the SQLite and PostgreSQL backends.
+
+Usage:
+    python -m benchmarks.sqlite_reads [--scale F] [--concurrency N]
+    BENCH_POSTGRES_URL=postgresql://... python -m benchmarks.sqlite_reads ...
+
+Loads the ``benchmarks.seed`` dataset at ``--scale`` (0.01 by default: 1k
+users, 10k books, 100k reviews) into a fresh SQLite file and, when
+BENCH_POSTGRES_URL is set, into a throwaway PostgreSQL schema. Then runs each
+read the API serves ``--requests`` times from ``--concurrency`` tasks and
+prints p50/p95/p99 per backend. Both run in this process, so the numbers
+include the driver and, for SQLite, the hop to a reader thread.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import asyncpg
+
+from api.db.books import BookRepository
+from api.db.reviews import ReviewRepository
+from api.db.sqlite import (
+    SqliteBookRepository,
+    SqliteDatabase,
+    SqliteReviewRepository,
+    SqliteUserRepository,
+)
+from api.db.users import UserRepository
+from api.migrate import apply_migrations, load_migrations
+from benchmarks.seed import (
+    BOOKS,
+    COMMENT_WORDS,
+    EPOCH,
+    REVIEWS,
+    USERS,
+    _load,
+    book_id,
+    generate_books,
+    generate_reviews,
+    generate_users,
+)
+
+READS = {
+    "get_book": lambda books, reviews, rng, count: books.get_book(
+        book_id(rng.randrange(count))
+    ),
+    "get_books": lambda books, reviews, rng, count: books.get_books(limit=50),
+    # Low indexes are the most reviewed books, as in the seed's skew
+    "get_book_reviews": lambda books, reviews, rng, count: reviews.get_book_reviews(
+        book_id(int(count * rng.random() ** 3)), limit=50
+    ),
+    "get_book_stats": lambda books, reviews, rng, count: books.get_book_stats(
+        book_id(rng.randrange(count))
+    ),
+    "search_reviews": lambda books, reviews, rng, count: reviews.search_reviews(
+        rng.choice(COMMENT_WORDS), limit=50
+    ),
+}
+
+
+def _percentiles(samples):
+    cuts = statistics.quantiles(samples, n=100)
+    return cuts[49], cuts[94], cuts[98]
+
+
+async def load(repositories, counts, seed: int, epoch: datetime) -> None:
+    users_db, books_db, reviews_db = repositories
+    users, books, reviews = counts
+    await _load(
+        "users", users_db.create_users, generate_users(users, seed, epoch), users
+    )
+    await _load(
+        "books", books_db.create_books, generate_books(books, seed, epoch), books
+    )
+    await _load(
+        "reviews",
+        reviews_db.create_reviews,
+        generate_reviews(reviews, users, books, seed, epoch),
+        reviews,
+    )
+
+
+async def measure(name: str, books_db, reviews_db, books: int, args) -> None:
+    print(f"\n{name}")
+    print(f"{'read':<18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for read, call in READS.items():
+        samples = []
+
+        async def worker(rng: random.Random) -> None:
+            for _ in range(args.requests // args.concurrency):
+                started = time.perf_counter()
+                await call(books_db, reviews_db, rng, books)
+                samples.append((time.perf_counter() - started) * 1000)
+
+        await asyncio.gather(
+            *(worker(random.Random(i)) for i in range(args.concurrency))
+        )
+        p50, p95, p99 = _percentiles(samples)
+        print(f"{read:<18} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f}")
+
+
+async def bench_sqlite(counts, args) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        database = SqliteDatabase(str(Path(directory) / "bench.db"), args.readers)
+        await database.open()
+        try:
+            repositories = (
+                SqliteUserRepository(database),
+                SqliteBookRepository(database),
+                SqliteReviewRepository(database),
+            )
+            await load(repositories, counts, args.seed, args.epoch)
+            async with database.write(transaction=False) as conn:
+                await conn.execute("ANALYZE")
+            await measure(
+                f"sqlite ({args.readers} readers)",
+                repositories[1],
+                repositories[2],
+                counts[1],
+                args,
+            )
+        finally:
+            await database.close()
+
+
+async def bench_postgres(url: str, counts, args) -> None:
+    schema = f"bench_{uuid.uuid4().hex[:8]}"
+    admin = await asyncpg.connect(url)
+    await admin.execute(f"CREATE SCHEMA {schema}")
+    try:
+        pool = await asyncpg.create_pool(
+            url,
+            min_size=1,
+            max_size=args.readers,
+            server_settings={"search_path": schema},
+        )
+        try:
+            async with pool.acquire() as conn:
+                await apply_migrations(conn, load_migrations())
+            repositories = (UserRepository(), BookRepository(), ReviewRepository())
+            for repository in repositories:
+                repository.pool = pool
+            await load(repositories, counts, args.seed, args.epoch)
+            async with pool.acquire() as conn:
+                await conn.execute("VACUUM (ANALYZE) users, books, reviews")
+            await measure(
+                f"postgres ({args.readers} connections)",
+                repositories[1],
+                repositories[2],
+                counts[1],
+                args,
+            )
+        finally:
+            await pool.close()
+    finally:
+        await admin.execute(f"DROP SCHEMA {schema} CASCADE")
+        await admin.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=0.01)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--readers", type=int, default=4, help="SQLite readers and Postgres pool size"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--epoch", type=datetime.fromisoformat, default=EPOCH)
+    args = parser.parse_args()
+
+    counts = (
+        max(1, int(USERS * args.scale)),
+        max(1, int(BOOKS * args.scale)),
+        int(REVIEWS * args.scale),
+    )
+    asyncio.run(bench_sqlite(counts, args))
+    url = os.getenv("BENCH_POSTGRES_URL")
+    if url:
+        asyncio.run(bench_postgres(url, counts, args))
+    else:
+        print("\nBENCH_POSTGRES_URL is not set; skipped postgres")
+
+
+if __name__ == "__main__":
+    main()
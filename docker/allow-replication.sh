@@ -0,0 +1,5 @@
+#!/bin/bash
+# Lets the standby in docker-compose.replica.yml stream WAL from this server.
+# Runs once, when the primary's data directory is first initialised.
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -0,0 +1,182 @@
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from api.db.memory import (
+    IntegrityError,
+    MemoryBookRepository,
+    MemoryLeaderboardRepository,
+    MemoryReviewRepository,
+    MemoryStore,
+    MemoryUserRepository,
+)
+
+START = datetime(2024, 1, 1)
+
+
+def _record(i, **fields):
+    created_at = START + timedelta(minutes=i)
+    return {"id": str(i), "created_at": created_at, "updated_at": created_at, **fields}
+
+
+def _book(i, title="Dune", author="Frank Herbert"):
+    return _record(i, title=title, author=author, isbn=None)
+
+
+def _review(i, book_id="1", user_id="u", rating=4.0, comment="a fine book"):
+    return _record(i, user_id=user_id, book_id=book_id, rating=rating, comment=comment)
+
+
+@pytest.fixture
+def repositories():
+    store = MemoryStore()
+    books = MemoryBookRepository(store)
+    users = MemoryUserRepository(store)
+    reviews = MemoryReviewRepository(store)
+    asyncio.run(
+        users.create_user(
+            {**_record(0), "id": "u", "username": "u", "email": "u@example.com"}
+        )
+    )
+    return books, users, reviews, MemoryLeaderboardRepository(store)
+
+
+def test_pages_follow_created_at_then_id(repositories):
+    books = repositories[0]
+    # Inserted out of order, one at a time and in bulk
+    asyncio.run(books.create_book(_book(3)))
+    asyncio.run(books.create_books([_book(5), _book(1), _book(4)]))
+    asyncio.run(books.create_book(_book(2)))
+
+    first = asyncio.run(books.get_books(limit=2))
+    rest = asyncio.run(
+        books.get_books(limit=10, after=(first[-1]["created_at"], first[-1]["id"]))
+    )
+
+    assert [book["id"] for book in first + rest] == ["1", "2", "3", "4", "5"]
+
+
+def test_rows_are_copies(repositories):
+    books = repositories[0]
+    asyncio.run(books.create_book(_book(1)))
+
+    asyncio.run(books.get_book("1"))["title"] = "Changed"
+
+    assert asyncio.run(books.get_book("1"))["title"] == "Dune"
+
+
+def test_keys_are_enforced(repositories):
+    books, users, reviews, _ = repositories
+    asyncio.run(books.create_book(_book(1)))
+
+    with pytest.raises(IntegrityError):
+        asyncio.run(books.create_book(_book(1)))
+    with pytest.raises(IntegrityError):
+        asyncio.run(reviews.create_reviews([_review(10), _review(11, book_id="9")]))
+    assert asyncio.run(reviews.get_book_reviews("1")) is None
+
+    asyncio.run(reviews.create_review(_review(10)))
+    with pytest.raises(IntegrityError):
+        asyncio.run(books.delete_book("1"))
+    with pytest.raises(IntegrityError):
+        asyncio.run(users.delete_user("u"))
+
+
+def test_review_writes_keep_pages_and_stats_in_step(repositories):
+    books, _, reviews, _ = repositories
+    asyncio.run(books.create_book(_book(1)))
+    asyncio.run(reviews.create_reviews([_review(12, rating=2.0), _review(10)]))
+    asyncio.run(reviews.create_review(_review(11, rating=5.0)))
+
+    asyncio.run(reviews.update_review("11", {"rating": 3.0}))
+    asyncio.run(reviews.delete_review("10"))
+
+    page = asyncio.run(reviews.get_book_reviews("1"))
+    stats = asyncio.run(books.get_book_stats("1"))
+    assert [review["id"] for review in page] == ["11", "12"]
+    assert stats["review_count"] == 2
+    assert stats["average_rating"] == 2.5
+    assert stats["histogram"] == {"1": 0, "2": 1, "3": 1, "4": 0, "5": 0}
+    assert asyncio.run(reviews.find_rating_stats_drift()) == []
+
+
+def test_search_ranks_by_matching_words(repositories):
+    books, _, reviews, _ = repositories
+    asyncio.run(books.create_book(_book(1)))
+    asyncio.run(
+        reviews.create_reviews(
+            [
+                _review(10, comment="slow plot"),
+                _review(11, comment="slow, slow plot"),
+                _review(12, comment="slow plot but a twist"),
+            ]
+        )
+    )
+    asyncio.run(reviews.update_review("10", {"comment": "gripping"}))
+
+    results = asyncio.run(reviews.search_reviews("slow plot -twist"))
+    after = asyncio.run(reviews.search_reviews("plot", limit=1, after=(1.0, "11")))
+
+    assert [(review["id"], review["rank"]) for review in results] == [("11", 3.0)]
+    assert [review["id"] for review in after] == ["12"]
+
+
+def test_similar_books_tolerate_typos(repositories):
+    books = repositories[0]
+    asyncio.run(books.create_book(_book(1, title="Nineteen Eighty-Four")))
+    asyncio.run(books.create_book(_book(2, title="Brave New World")))
+
+    matches = asyncio.run(books.find_similar_books("ninteen"))
+
+    assert [book["id"] for book in matches] == ["1"]
+
+
+def test_leaderboards_rank_and_skip_fresh_boards(repositories):
+    books, _, reviews, leaderboards = repositories
+    asyncio.run(books.create_books([_book(1), _book(2)]))
+    now = START + timedelta(days=1)
+    asyncio.run(
+        reviews.create_reviews(
+            [
+                _review(10, book_id="1", rating=5.0),
+                _review(11, book_id="2", rating=3.0),
+                _review(12, book_id="2", rating=3.0),
+            ]
+        )
+    )
+
+    assert asyncio.run(leaderboards.refresh(now)) == ["top", "trending"]
+    assert asyncio.run(leaderboards.refresh(now, timedelta(hours=1))) == []
+
+    top = asyncio.run(leaderboards.get_board("top", limit=10))
+    trending = asyncio.run(leaderboards.get_board("trending", limit=1, offset=0))
+    assert [book["id"] for book in top["books"]] == ["1", "2"]
+    assert top["refreshed_at"] == now
+    assert [(b["id"], b["review_count"]) for b in trending["books"]] == [("2", 2)]
+
+
+def test_exports_skip_rows_deleted_while_streaming(repositories):
+    books = repositories[0]
+    asyncio.run(books.create_books([_book(1), _book(2), _book(3)]))
+
+    async def export():
+        exported = []
+        async for book in books.iter_books(since=START + timedelta(minutes=2)):
+            exported.append(book["id"])
+            await books.delete_book("3")
+        return exported
+
+    assert asyncio.run(export()) == ["2"]
+
+
+def test_rebuild_rating_stats_recomputes_from_reviews(repositories):
+    books, _, reviews, _ = repositories
+    asyncio.run(books.create_book(_book(1)))
+    asyncio.run(reviews.create_review(_review(10, rating=4.5)))
+    reviews.store.rating_stats["1"][0] = 7
+
+    assert asyncio.run(reviews.find_rating_stats_drift())[0]["stored_count"] == 7
+    assert asyncio.run(reviews.rebuild_rating_stats()) == 1
+    assert reviews.store.rating_stats["1"][:2] == [1, Decimal("4.5")]
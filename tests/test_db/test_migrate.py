@@ -0,0 +1,59 @@
+import asyncio
+import os
+import uuid
+
+import asyncpg
+import pytest
+
+from api.migrate import apply_migrations, load_migrations
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+def test_migrations_are_ordered_and_unique():
+    versions = [migration.version for migration in load_migrations()]
+
+    assert versions == sorted(set(versions))
+    assert versions[0] == 1
+
+
+def test_concurrent_index_migrations_run_outside_a_transaction():
+    for migration in load_migrations():
+        if "CONCURRENTLY" in migration.sql:
+            assert not migration.transactional
+            assert all(statement[-1] != ";" for statement in migration.statements())
+
+
+async def _upgrade_with_existing_reviews():
+    schema = f"migrate_test_{uuid.uuid4().hex[:8]}"
+    conn = await asyncpg.connect(TEST_POSTGRES_URL)
+    try:
+        await conn.execute(f"CREATE SCHEMA {schema}")
+        await conn.execute(f"SET search_path TO {schema}")
+        migrations = load_migrations()
+        await apply_migrations(conn, [m for m in migrations if m.version < 7])
+        await conn.execute("""
+            INSERT INTO users VALUES ('u1', 'ada', 'ada@example.com', '{}', now(), now());
+            INSERT INTO books (id, title, author, data, created_at, updated_at)
+            VALUES ('b1', 'Dune', 'Frank Herbert', '{}', now(), now());
+            INSERT INTO reviews (id, user_id, book_id, rating, comment, data, created_at, updated_at)
+            VALUES
+                ('r1', 'u1', 'b1', 4.5, 'Vast', '{}', now(), now()),
+                ('r2', 'u1', 'b1', 2.0, 'Slow', '{}', now(), now());
+            """)
+        await apply_migrations(conn, migrations)
+
+        return await conn.fetchrow("SELECT * FROM book_rating_stats")
+    finally:
+        await conn.execute(f"DROP SCHEMA {schema} CASCADE")
+        await conn.close()
+
+
+@pytest.mark.skipif(not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL is not set")
+def test_rating_stats_are_backfilled_from_existing_reviews():
+    stats = asyncio.run(_upgrade_with_existing_reviews())
+
+    assert stats["book_id"] == "b1"
+    assert stats["review_count"] == 2
+    assert stats["rating_sum"] == 6.5
+    assert (stats["stars_2"], stats["stars_5"]) == (1, 1)
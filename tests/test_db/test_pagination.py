@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import pytest
+
+from api.db.pagination import (
+    InvalidCursor,
+    decode_cursor,
+    decode_rank_cursor,
+    encode_cursor,
+    encode_rank_cursor,
+    next_cursor,
+    next_rank_cursor,
+)
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+
+    cursor = encode_cursor(created_at, "book-1")
+
+    assert decode_cursor(cursor) == (created_at, "book-1")
+
+
+def test_decode_cursor_rejects_garbage():
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
+
+
+def test_next_cursor_only_on_full_page():
+    items = [
+        {"id": "1", "created_at": datetime(2024, 1, 1)},
+        {"id": "2", "created_at": datetime(2024, 1, 2)},
+    ]
+
+    assert next_cursor(items, limit=3) is None
+    assert decode_cursor(next_cursor(items, limit=2)) == (datetime(2024, 1, 2), "2")
+
+
+def test_rank_cursor_round_trips_float_exactly():
+    rank = 0.0607927106320858
+
+    assert decode_rank_cursor(encode_rank_cursor(rank, "review-1")) == (
+        rank,
+        "review-1",
+    )
+
+
+def test_next_rank_cursor_uses_last_rank():
+    items = [{"id": "1", "rank": 0.5}, {"id": "2", "rank": 0.25}]
+
+    assert next_rank_cursor(items, limit=3) is None
+    assert decode_rank_cursor(next_rank_cursor(items, limit=2)) == (0.25, "2")
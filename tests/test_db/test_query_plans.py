@@ -0,0 +1,263 @@
+"""Plan regression checks for every query issued by api/db.
+
+These run against a real PostgreSQL instance pointed to by TEST_POSTGRES_URL
+and are skipped without one. The repositories are driven through a typical
+workload inside a throwaway schema, every statement they send is recorded,
+and each one is EXPLAINed with sequential scans disabled: a query that still
+plans a Seq Scan has no usable index.
+"""
+
+import asyncio
+import json
+import os
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import asyncpg
+import pytest
+
+from api.db.books import BookRepository
+from api.db.leaderboards import LeaderboardRepository
+from api.db.reviews import ReviewRepository
+from api.db.users import UserRepository
+from api.migrate import apply_migrations, load_migrations
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL is not set"
+)
+
+SEED_ROWS = 200
+
+
+class RecordingConnection:
+    def __init__(self, conn, queries):
+        self._conn = conn
+        self._queries = queries
+
+    def _record(self, query, args):
+        self._queries.setdefault(" ".join(query.split()), args)
+
+    async def fetch(self, query, *args, **kwargs):
+        self._record(query, args)
+        return await self._conn.fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query, *args, **kwargs):
+        self._record(query, args)
+        return await self._conn.fetchrow(query, *args, **kwargs)
+
+    async def fetchval(self, query, *args, **kwargs):
+        self._record(query, args)
+        return await self._conn.fetchval(query, *args, **kwargs)
+
+    async def execute(self, query, *args, **kwargs):
+        self._record(query, args)
+        return await self._conn.execute(query, *args, **kwargs)
+
+    async def executemany(self, query, args, **kwargs):
+        args = list(args)
+        self._record(query, tuple(args[0]))
+        return await self._conn.executemany(query, args, **kwargs)
+
+    def cursor(self, query, *args, **kwargs):
+        self._record(query, args)
+        return self._conn.cursor(query, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class RecordingPool:
+    def __init__(self, conn):
+        self._conn = conn
+        self.queries = {}
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield RecordingConnection(self._conn, self.queries)
+
+
+def _repositories(pool):
+    repositories = (UserRepository(), BookRepository(), ReviewRepository())
+    for repository in repositories:
+        repository.pool = pool
+
+    return repositories
+
+
+async def _run_workload(pool):
+    users, books, reviews = _repositories(pool)
+    start = datetime(2024, 1, 1)
+
+    await users.create_users(
+        [
+            {
+                "id": f"user-{i}",
+                "username": f"reader{i}",
+                "email": f"reader{i}@example.com",
+                "created_at": start + timedelta(minutes=i),
+                "updated_at": start + timedelta(minutes=i),
+            }
+            for i in range(SEED_ROWS)
+        ]
+    )
+    await books.create_books(
+        [
+            {
+                "id": f"book-{i}",
+                "title": f"Book {i}",
+                "author": f"Author number {i}",
+                "isbn": None,
+                "created_at": start + timedelta(minutes=i),
+                "updated_at": start + timedelta(minutes=i),
+            }
+            for i in range(SEED_ROWS)
+        ]
+    )
+    await reviews.create_reviews(
+        [
+            {
+                "id": f"review-{i}",
+                "user_id": f"user-{i % SEED_ROWS}",
+                "book_id": f"book-{i % 20}",
+                "rating": 1 + i % 5,
+                "comment": "A seeded review comment for plan checks",
+                "created_at": start + timedelta(minutes=i),
+                "updated_at": start + timedelta(minutes=i),
+            }
+            for i in range(SEED_ROWS * 5)
+        ]
+    )
+    await pool._conn.execute("ANALYZE users, books, reviews")
+
+    now = datetime.now()
+    user = await users.create_user(
+        {
+            "id": "user-new",
+            "username": "newreader",
+            "email": "new@example.com",
+            "created_at": now,
+            "updated_at": now,
+        }
+    )
+    book = await books.create_book(
+        {
+            "id": "book-new",
+            "title": "New Book",
+            "author": "A brand new author",
+            "isbn": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+    )
+    review = await reviews.create_review(
+        {
+            "id": "review-new",
+            "user_id": user["id"],
+            "book_id": book["id"],
+            "rating": 4.5,
+            "comment": "A fresh review written during the plan check",
+            "created_at": now,
+            "updated_at": now,
+        }
+    )
+
+    await users.get_user("user-1")
+    await users.get_users(limit=10)
+    await users.get_users(limit=10, after=(start, "user-0"))
+    async for _ in users.iter_users(since=start):
+        pass
+
+    await books.get_book("book-1")
+    await books.get_books(limit=10)
+    await books.get_books(limit=10, after=(start, "book-0"))
+    await books.get_book_stats("book-1")
+    await books.find_similar_books("Orwel", limit=10)
+    async for _ in books.iter_books(since=start):
+        pass
+
+    await reviews.find_missing_references(["user-1"], ["book-1"])
+    await reviews.get_review(review["id"])
+    await reviews.get_book_reviews("book-1", limit=10)
+    await reviews.get_book_reviews("book-1", limit=10, after=(start, "review-0"))
+    async for _ in reviews.iter_reviews(since=start):
+        pass
+    matches = await reviews.search_reviews("seeded comment", limit=10)
+    await reviews.search_reviews(
+        "seeded", limit=10, after=(matches[-1]["rank"], matches[-1]["id"])
+    )
+    await reviews.search_reviews("seeded", book_id="book-1", limit=10)
+    await reviews.search_reviews("seeded", book_id="book-1", limit=10, after=(1.0, ""))
+
+    leaderboards = LeaderboardRepository()
+    leaderboards.pool = pool
+    await leaderboards.refresh(now)
+    await leaderboards.get_board("top", limit=10)
+    await leaderboards.get_board("trending", limit=10, offset=10)
+
+    await users.update_user(user["id"], {"username": "renamed"})
+    await books.update_book(book["id"], {"title": "Renamed", "isbn": None})
+    await reviews.update_review(review["id"], {"rating": 2.0})
+    await reviews.delete_review(review["id"])
+    await books.delete_book(book["id"])
+    await users.delete_user(user["id"])
+
+
+def _seq_scans(plan):
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+
+    return found
+
+
+async def _collect_plans():
+    schema = f"plan_check_{uuid.uuid4().hex[:8]}"
+    admin = await asyncpg.connect(TEST_POSTGRES_URL)
+    await admin.execute(f"CREATE SCHEMA {schema}")
+    try:
+        conn = await asyncpg.connect(
+            TEST_POSTGRES_URL, server_settings={"search_path": schema}
+        )
+        try:
+            await apply_migrations(conn, load_migrations())
+            pool = RecordingPool(conn)
+            await _run_workload(pool)
+
+            await conn.execute("SET enable_seqscan = off")
+            plans = {}
+            for query, args in pool.queries.items():
+                if not query.upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+                    continue
+                result = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query}", *args)
+                plans[query] = json.loads(result)[0]["Plan"]
+
+            return plans
+        finally:
+            await conn.close()
+    finally:
+        await admin.execute(f"DROP SCHEMA {schema} CASCADE")
+        await admin.close()
+
+
+@pytest.fixture(scope="module")
+def query_plans():
+    return asyncio.run(_collect_plans())
+
+
+def test_workload_covers_queries(query_plans):
+    assert len(query_plans) >= 15
+
+
+def test_no_query_falls_back_to_seq_scan(query_plans):
+    offenders = {
+        query: scans
+        for query, plan in query_plans.items()
+        if (scans := _seq_scans(plan))
+    }
+
+    assert offenders == {}
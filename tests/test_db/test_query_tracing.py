@@ -0,0 +1,108 @@
+import asyncio
+import io
+import json
+import logging
+from contextlib import asynccontextmanager
+
+import pytest
+
+from api import tracing
+from api.db.books import BookRepository
+from api.db.pool import InstrumentedPool
+from api.tracing import JsonLinesExporter, RequestContext, Tracer
+
+
+class FakeConnection:
+    async def fetchrow(self, query, *args):
+        return {"id": args[0], "title": "1984"}
+
+
+class SlowAcquirePool:
+    async def acquire(self):
+        await asyncio.sleep(0.01)
+        return FakeConnection()
+
+    async def release(self, conn):
+        pass
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    stream = io.StringIO()
+    tracer = Tracer(JsonLinesExporter(stream=stream))
+    monkeypatch.setattr("api.tracing.tracer", tracer)
+    monkeypatch.setattr("api.db.base.tracer", tracer)
+
+    def exported():
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    return tracer, exported
+
+
+def _books():
+    books = BookRepository()
+    books.pool = InstrumentedPool(SlowAcquirePool())
+    return books
+
+
+def test_repository_spans_nest_under_the_request(spans):
+    tracer, exported = spans
+
+    async def run():
+        with tracer.span("GET /books/{book_id}"):
+            await _books().get_book("1")
+
+    asyncio.run(run())
+    query, request = exported()
+
+    assert query["name"] == "BookRepository.get_book"
+    assert query["parent_id"] == request["context"]["span_id"]
+    assert query["context"]["trace_id"] == request["context"]["trace_id"]
+    assert query["attributes"]["db.acquire_ms"] >= 5
+    assert query["attributes"]["db.rows"] == 1
+
+
+def test_request_context_adds_up_repository_calls():
+    context = RequestContext("req-1")
+
+    async def run():
+        tracing.request_context.set(context)
+        await _books().get_book("1")
+        await _books().get_book("2")
+
+    asyncio.run(run())
+
+    assert context.queries == 2
+    assert context.acquire_ms >= 10
+    assert context.db_ms >= context.acquire_ms
+
+
+def test_slow_queries_are_logged_with_the_request_id(monkeypatch, caplog):
+    monkeypatch.setattr("api.tracing.SLOW_QUERY_MS", 0)
+
+    async def run():
+        tracing.request_context.set(RequestContext("req-42"))
+        await _books().get_book("1")
+
+    with caplog.at_level(logging.WARNING, logger="api.db.slow_queries"):
+        asyncio.run(run())
+
+    entry = json.loads(caplog.records[-1].getMessage())
+    assert entry["query"] == "BookRepository.get_book"
+    assert entry["request_id"] == "req-42"
+    assert entry["rows"] == 1
+    assert entry["acquire_ms"] + entry["execute_ms"] == pytest.approx(
+        entry["duration_ms"], abs=0.01
+    )
+
+
+def test_failed_spans_record_the_error(spans):
+    tracer, exported = spans
+
+    with pytest.raises(RuntimeError):
+        with tracer.span("failing"):
+            raise RuntimeError("boom")
+
+    (span,) = exported()
+    assert span["status"] == "ERROR"
+    assert span["attributes"]["exception.type"] == "RuntimeError"
@@ -0,0 +1,24 @@
+from decimal import Decimal
+
+from api.db.reviews import rating_deltas, star_bucket
+
+
+def test_star_bucket_rounds_half_up():
+    assert star_bucket(1) == 1
+    assert star_bucket(2.4) == 2
+    assert star_bucket(Decimal("2.5")) == 3
+    assert star_bucket(4.5) == 5
+
+
+def test_rating_deltas_fold_changes_per_book():
+    deltas = rating_deltas(
+        [("1", 4.5, 1), ("1", 3.0, 1), ("2", 2.0, 1), ("2", 2.0, -1)]
+    )
+
+    assert deltas == {"1": [2, Decimal("7.5"), 0, 0, 1, 0, 1]}
+
+
+def test_rating_deltas_moves_review_between_buckets():
+    deltas = rating_deltas([("1", 2.0, -1), ("1", 4.0, 1)])
+
+    assert deltas == {"1": [0, Decimal("2.0"), 0, -1, 0, 1, 0]}
@@ -0,0 +1,204 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.db import base, replicas
+from api.db.books import BookRepository
+from api.db.replicas import (
+    Consistency,
+    ConsistencyMiddleware,
+    InvalidToken,
+    ReplicaRouter,
+    consistency,
+    format_lsn,
+    parse_lsn,
+)
+from api.services.singleflight import SingleFlight
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def fetchval(self, query, *args):
+        self.pool.queries.append(query)
+        if "replay" in query:
+            return (
+                self.pool.replay.pop(0)
+                if len(self.pool.replay) > 1
+                else self.pool.replay[0]
+            )
+        return self.pool.wal
+
+    async def fetchrow(self, query, *args):
+        return {"id": args[0], "served_by": self.pool.name}
+
+    async def fetch(self, query, *args):
+        return []
+
+    async def execute(self, query, *args):
+        self.pool.queries.append(query)
+        return "INSERT 0 1"
+
+
+class FakePool:
+    def __init__(self, name, replay=("0/0",), busy=0, wal="0/0"):
+        self.name = name
+        self.replay = list(replay)
+        self.busy = busy
+        self.wal = wal
+        self.waiting = 0
+        self.queries = []
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield FakeConnection(self)
+
+    def get_size(self):
+        return 10
+
+    def get_idle_size(self):
+        return 10 - self.busy
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    primary = FakePool("primary", wal="0/500")
+    standbys = [FakePool("replica-1"), FakePool("replica-2")]
+    monkeypatch.setattr(replicas, "get_replica_pools", lambda: standbys)
+    monkeypatch.setattr(base, "get_replica_pools", lambda: standbys)
+    monkeypatch.setattr(replicas, "replica_router", ReplicaRouter("round_robin", 50))
+    monkeypatch.setattr(base, "replica_router", replicas.replica_router)
+    return primary, standbys
+
+
+def _in_request(coroutine, read_after=None):
+    async def run():
+        state = Consistency(read_after)
+        consistency.set(state)
+        return await coroutine, state
+
+    return asyncio.run(run())
+
+
+def test_lsn_round_trips_and_rejects_garbage():
+    assert parse_lsn("16/B374D848") == (0x16 << 32) + 0xB374D848
+    assert format_lsn(parse_lsn("16/B374D848")) == "16/B374D848"
+    with pytest.raises(InvalidToken):
+        parse_lsn("not-a-token")
+
+
+def test_round_robin_and_least_busy_selection():
+    pools = [FakePool("a"), FakePool("b", busy=3), FakePool("c", busy=1)]
+
+    round_robin = ReplicaRouter("round_robin")
+    least_busy = ReplicaRouter("least_busy")
+
+    assert [round_robin._pick(pools).name for _ in range(4)] == ["a", "b", "c", "a"]
+    pools[0].busy = 5
+    assert least_busy._pick(pools).name == "c"
+
+
+def test_get_methods_read_from_replicas(pools):
+    primary, standbys = pools
+    books = BookRepository()
+    books.pool = primary
+
+    first = asyncio.run(books.get_book("1"))
+    second = asyncio.run(books.get_book("2"))
+
+    assert (first["served_by"], second["served_by"]) == ("replica-1", "replica-2")
+    # Without a token the replica's position is not even checked
+    assert standbys[0].queries == []
+    assert books.pool is primary
+
+
+def test_writes_hand_out_the_primarys_wal_position(pools):
+    primary, standbys = pools
+    books = BookRepository()
+    books.pool = primary
+    book = {"id": "1", "title": "Dune", "author": "Frank Herbert", "isbn": None}
+
+    _, state = _in_request(
+        books.create_book({**book, "created_at": None, "updated_at": None})
+    )
+
+    assert format_lsn(state.written) == "0/500"
+    assert "INSERT" in primary.queries[0]
+    assert standbys[0].queries == standbys[1].queries == []
+
+
+def test_token_reads_wait_for_replay(pools):
+    primary, standbys = pools
+    standbys[0].replay = ["0/100", "0/400", "0/600"]
+    router = replicas.replica_router
+
+    pool, _ = _in_request(router.read_pool(primary), read_after=parse_lsn("0/500"))
+
+    assert pool is standbys[0]
+    assert router.stats()["waited"] == 1
+    # The position seen is remembered, so the next read skips the check
+    standbys[0].queries.clear()
+    router._turn = iter([0])
+    pool, _ = _in_request(router.read_pool(primary), read_after=parse_lsn("0/500"))
+    assert pool is standbys[0] and standbys[0].queries == []
+
+
+def test_lagging_replicas_fall_back_to_the_primary(pools):
+    primary, standbys = pools
+    standbys[0].replay = ["0/100"]
+    router = ReplicaRouter("round_robin", max_wait_ms=0)
+
+    pool, _ = _in_request(router.read_pool(primary), read_after=parse_lsn("0/500"))
+
+    assert pool is primary
+    assert router.stats()["primary"] == 1
+
+
+def test_middleware_reads_and_issues_tokens():
+    app = FastAPI()
+    app.add_middleware(ConsistencyMiddleware)
+
+    @app.post("/write")
+    async def write():
+        consistency.get().written = parse_lsn("0/2A")
+        return {}
+
+    @app.get("/read")
+    async def read():
+        return {"read_after": consistency.get().read_after}
+
+    client = TestClient(app)
+    written = client.post("/write", headers={"X-Consistency-Token": "0/10"})
+    read = client.get("/read", headers={"X-Consistency-Token": "0/2A"})
+    plain = client.get("/read")
+    invalid = client.get("/read", headers={"X-Consistency-Token": "soon"})
+
+    assert written.headers["x-consistency-token"] == "0/2A"
+    assert read.json() == {"read_after": 0x2A}
+    assert "x-consistency-token" not in plain.headers
+    assert invalid.status_code == 400
+
+
+def test_token_reads_do_not_join_queries_in_flight():
+    flight = SingleFlight("test", enabled=True)
+    calls = []
+
+    async def query(key):
+        calls.append(key)
+        await asyncio.sleep(0)
+        return key
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do("k", query, "k"))
+        await asyncio.sleep(0)
+        consistency.set(Consistency(read_after=1))
+        await flight.do("k", query, "k")
+        await first
+
+    asyncio.run(scenario())
+
+    assert calls == ["k", "k"]
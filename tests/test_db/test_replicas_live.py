@@ -0,0 +1,89 @@
+"""Read-your-writes through a real primary and streaming replica.
+
+These run against the primary at TEST_POSTGRES_URL and a standby of it at
+TEST_REPLICA_URL (``docker compose -f docker-compose.yml -f
+docker-compose.replica.yml up db replica`` starts both), and are skipped
+without them. Everything is written to a throwaway schema, which reaches
+the replica through replication like any other change.
+"""
+
+import asyncio
+import os
+import uuid
+from datetime import datetime
+
+import asyncpg
+import pytest
+
+from api.db import base, replicas
+from api.db.books import BookRepository
+from api.db.pool import InstrumentedPool
+from api.db.replicas import Consistency, ReplicaRouter, consistency
+from api.migrate import apply_migrations, load_migrations
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+TEST_REPLICA_URL = os.getenv("TEST_REPLICA_URL")
+
+pytestmark = pytest.mark.skipif(
+    not (TEST_POSTGRES_URL and TEST_REPLICA_URL),
+    reason="TEST_POSTGRES_URL and TEST_REPLICA_URL are not set",
+)
+
+
+async def _scenario(monkeypatch):
+    schema = f"replica_test_{uuid.uuid4().hex[:8]}"
+    admin = await asyncpg.connect(TEST_POSTGRES_URL)
+    await admin.execute(f"CREATE SCHEMA {schema}")
+    settings = {"search_path": schema}
+    primary = InstrumentedPool(
+        await asyncpg.create_pool(TEST_POSTGRES_URL, server_settings=settings)
+    )
+    replica = InstrumentedPool(
+        await asyncpg.create_pool(TEST_REPLICA_URL, server_settings=settings)
+    )
+    try:
+        async with primary.acquire() as conn:
+            await apply_migrations(conn, load_migrations())
+        router = ReplicaRouter("round_robin", max_wait_ms=5000)
+        for module in (base, replicas):
+            monkeypatch.setattr(module, "get_replica_pools", lambda: [replica])
+        monkeypatch.setattr(base, "replica_router", router)
+
+        books = BookRepository()
+        books.pool = primary
+        now = datetime.now()
+        writer = Consistency()
+        consistency.set(writer)
+        await books.create_book(
+            {
+                "id": "book-1",
+                "title": "Dune",
+                "author": "Frank Herbert",
+                "isbn": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+
+        # A later request presenting the token reads from the replica, once
+        # it has replayed the write
+        consistency.set(Consistency(read_after=writer.written))
+        book = await books.get_book("book-1")
+        async with replica.acquire() as conn:
+            in_recovery = await conn.fetchval("SELECT pg_is_in_recovery()")
+        return writer.written, book, router.stats(), in_recovery
+    finally:
+        await primary.close()
+        await replica.close()
+        await admin.execute(f"DROP SCHEMA {schema} CASCADE")
+        await admin.close()
+
+
+def test_token_reads_see_the_write_on_the_replica(monkeypatch):
+    written, book, stats, in_recovery = asyncio.run(_scenario(monkeypatch))
+
+    assert in_recovery
+    assert written
+    assert book["title"] == "Dune"
+    assert stats["replica"] == 1
+    assert stats["primary"] == 0
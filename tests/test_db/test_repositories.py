@@ -0,0 +1,158 @@
+import asyncio
+import json
+import re
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import pytest
+
+from api import metrics
+from api.db.books import BookRepository
+from api.db.leaderboards import LeaderboardRepository
+from api.db.pool import InstrumentedPool
+from api.db.reviews import ReviewRepository
+from api.db.users import UserRepository
+
+REPOSITORIES = (
+    BookRepository,
+    UserRepository,
+    ReviewRepository,
+    LeaderboardRepository,
+)
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    async def fetch(self, query, *args):
+        self.queries.append((query, args))
+        return self.rows
+
+    async def fetchrow(self, query, *args):
+        self.queries.append((query, args))
+        return self.rows[0] if self.rows else None
+
+
+class FakePool:
+    def __init__(self, rows):
+        self.conn = FakeConnection(rows)
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+def _repository(cls, rows):
+    repository = cls()
+    repository.pool = FakePool(rows)
+    return repository
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        pytest.param(sql, id=f"{cls.__name__}.{name}")
+        for cls in REPOSITORIES
+        for name, sql in cls.statements.items()
+    ],
+)
+def test_statements_project_explicit_columns(sql):
+    assert not re.search(r"(SELECT|RETURNING)\s+(\w+\.)?\*", sql)
+    # data is written on insert and update but never read back
+    assert not re.search(r"(SELECT|RETURNING)[^;]*\bdata\b", sql.split("FROM")[0])
+
+
+def test_statement_text_is_stable_between_calls():
+    created_at = datetime(2024, 1, 1)
+    row = {"id": "1", "title": "Dune", "created_at": created_at}
+    books = _repository(BookRepository, [row])
+
+    asyncio.run(books.get_books(limit=10))
+    asyncio.run(books.get_books(limit=20))
+    asyncio.run(books.get_books(limit=10, after=(created_at, "1")))
+
+    first, second, third = (query for query, _ in books.pool.conn.queries)
+    assert first is second
+    assert third == BookRepository.statements["get_books_after"]
+    assert books.pool.conn.queries[2][1] == (created_at, "1", 10)
+
+
+def test_fetch_helpers_return_plain_dicts():
+    row = {"id": "r1", "book_id": "b1", "rating": 4}
+    reviews = _repository(ReviewRepository, [row])
+
+    assert asyncio.run(reviews.get_book_reviews("b1", limit=5)) == [row]
+    assert asyncio.run(reviews.get_review("r1")) == row
+
+
+def test_empty_results_keep_their_sentinels():
+    reviews = _repository(ReviewRepository, [])
+    users = _repository(UserRepository, [])
+
+    assert asyncio.run(reviews.get_book_reviews("b1")) is None
+    assert asyncio.run(reviews.get_review("missing")) == {}
+    assert asyncio.run(users.get_user("missing")) is None
+
+
+def test_data_json_keeps_full_copy_by_default():
+    books = BookRepository()
+    books.lean_data = False
+    book = {"id": "1", "title": "Dune", "created_at": datetime(2024, 1, 1)}
+
+    assert json.loads(books.data_json(book)) == {
+        "id": "1",
+        "title": "Dune",
+        "created_at": "2024-01-01T00:00:00",
+    }
+
+
+def test_lean_data_json_keeps_only_extra_attributes():
+    books = BookRepository()
+    books.lean_data = True
+    book = {"id": "1", "title": "Dune", "isbn": None, "edition": 2}
+
+    assert json.loads(books.data_json(book)) == {"edition": 2}
+
+
+def test_repository_methods_are_timed_by_name():
+    books = _repository(BookRepository, [])
+    before = sum(
+        metrics.db_latency.values.get(("BookRepository", "get_book"), [[0]])[0]
+    )
+
+    asyncio.run(books.get_book("1"))
+
+    series = metrics.db_latency.values[("BookRepository", "get_book")]
+    assert sum(series[0]) == before + 1
+
+
+def test_instrumented_pool_counts_waiters():
+    class SlowPool:
+        def __init__(self):
+            self.release_calls = 0
+            self.ready = asyncio.Event()
+
+        async def acquire(self):
+            await self.ready.wait()
+            return "conn"
+
+        async def release(self, conn):
+            self.release_calls += 1
+
+    async def run():
+        raw = SlowPool()
+        pool = InstrumentedPool(raw)
+
+        async def use():
+            async with pool.acquire() as conn:
+                return conn
+
+        task = asyncio.ensure_future(use())
+        await asyncio.sleep(0)
+        waiting = pool.waiting
+        raw.ready.set()
+        return waiting, await task, pool.waiting, raw.release_calls
+
+    assert asyncio.run(run()) == (1, "conn", 0, 1)
@@ -0,0 +1,324 @@
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from api.compact import compact
+from api.db import backend, sqlite
+from api.db.sqlite import (
+    SqliteBookRepository,
+    SqliteDatabase,
+    SqliteLeaderboardRepository,
+    SqliteReviewRepository,
+    SqliteUserRepository,
+    _fts_query,
+)
+from api.repair import repair_rating_stats
+
+START = datetime(2024, 1, 1)
+
+
+def _record(i, **fields):
+    created_at = START + timedelta(minutes=i)
+    return {"id": str(i), "created_at": created_at, "updated_at": created_at, **fields}
+
+
+def _book(i, title="Dune", author="Frank Herbert"):
+    return _record(i, title=title, author=author, isbn=None)
+
+
+def _review(i, book_id="1", user_id="u", rating=4.0, comment="a fine book"):
+    return _record(i, user_id=user_id, book_id=book_id, rating=rating, comment=comment)
+
+
+@pytest.fixture
+def run(tmp_path):
+    """Run ``scenario(books, users, reviews, leaderboards)`` on a fresh database.
+
+    The connections live on one event loop, so each test is one coroutine.
+    """
+
+    def run(scenario):
+        async def main():
+            database = SqliteDatabase(str(tmp_path / "test.db"), readers=2)
+            await database.open()
+            users = SqliteUserRepository(database)
+            await users.create_user(
+                {**_record(0), "id": "u", "username": "u", "email": "u@example.com"}
+            )
+            try:
+                return await scenario(
+                    SqliteBookRepository(database),
+                    users,
+                    SqliteReviewRepository(database),
+                    SqliteLeaderboardRepository(database),
+                )
+            finally:
+                await database.close()
+
+        return asyncio.run(main())
+
+    return run
+
+
+def test_opens_in_wal_mode(tmp_path):
+    async def main():
+        database = SqliteDatabase(str(tmp_path / "test.db"), readers=1)
+        await database.open()
+        async with database.read() as conn:
+            async with conn.execute("PRAGMA journal_mode") as cursor:
+                mode = (await cursor.fetchone())[0]
+        await database.close()
+        return mode
+
+    assert asyncio.run(main()) == "wal"
+
+
+def test_pages_follow_created_at_then_id(run):
+    async def scenario(books, *_):
+        await books.create_book(_book(3))
+        await books.create_books([_book(5), _book(1), _book(4)])
+        await books.create_book(_book(2))
+
+        first = await books.get_books(limit=2)
+        rest = await books.get_books(
+            limit=10, after=(first[-1]["created_at"], first[-1]["id"])
+        )
+        return first + rest
+
+    page = run(scenario)
+
+    assert [book["id"] for book in page] == ["1", "2", "3", "4", "5"]
+    assert page[0]["created_at"] == START + timedelta(minutes=1)
+
+
+def test_keys_are_enforced(run):
+    async def scenario(books, users, reviews, _):
+        await books.create_book(_book(1))
+        with pytest.raises(sqlite3.IntegrityError):
+            await books.create_book(_book(1))
+        # The failed batch is rolled back as a whole
+        with pytest.raises(sqlite3.IntegrityError):
+            await reviews.create_reviews([_review(10), _review(11, book_id="9")])
+        assert await reviews.get_book_reviews("1") is None
+
+        await reviews.create_review(_review(10))
+        with pytest.raises(sqlite3.IntegrityError):
+            await books.delete_book("1")
+        with pytest.raises(sqlite3.IntegrityError):
+            await users.delete_user("u")
+        return await reviews.find_missing_references(["u", "x"], ["1", "9"])
+
+    assert run(scenario) == ({"x"}, {"9"})
+
+
+def test_review_writes_keep_pages_and_stats_in_step(run):
+    async def scenario(books, _, reviews, __):
+        await books.create_book(_book(1))
+        await reviews.create_reviews([_review(12, rating=2.0), _review(10)])
+        created = await reviews.create_review(_review(11, rating=5.0))
+
+        updated = await reviews.update_review("11", {"rating": 3.0})
+        await reviews.delete_review("10")
+
+        page = await reviews.get_book_reviews("1")
+        stats = await books.get_book_stats("1")
+        return created, updated, page, stats, await reviews.find_rating_stats_drift()
+
+    created, updated, page, stats, drift = run(scenario)
+
+    assert created["rating"] == 5.0 and isinstance(created["rating"], float)
+    assert updated["rating"] == 3.0
+    assert [review["id"] for review in page] == ["11", "12"]
+    assert stats["review_count"] == 2
+    assert stats["average_rating"] == 2.5
+    assert stats["histogram"] == {"1": 0, "2": 1, "3": 1, "4": 0, "5": 0}
+    assert drift == []
+
+
+def test_fractional_ratings_do_not_report_drift(run):
+    async def scenario(books, _, reviews, __):
+        await books.create_book(_book(1))
+        ratings = [4.1, 2.7, 3.3, 1.9, 4.6]
+        await reviews.create_reviews(
+            [_review(10 + i, rating=rating) for i, rating in enumerate(ratings)]
+        )
+        await reviews.delete_review("11")
+        await reviews.update_review("12", {"rating": 0.7})
+        await reviews.create_review(_review(20, rating=3.6))
+
+        return await reviews.find_rating_stats_drift(), await books.get_book_stats("1")
+
+    drift, stats = run(scenario)
+
+    assert drift == []
+    assert stats["average_rating"] == round((4.1 + 0.7 + 1.9 + 4.6 + 3.6) / 5, 2)
+
+
+def test_rebuild_rating_stats_recomputes_from_reviews(run):
+    async def scenario(books, _, reviews, __):
+        await books.create_book(_book(1))
+        await reviews.create_review(_review(10, rating=4.5))
+        async with reviews.database.write() as conn:
+            await conn.execute("UPDATE book_rating_stats SET review_count = 7")
+
+        drift = await reviews.find_rating_stats_drift()
+        rebuilt = await reviews.rebuild_rating_stats()
+        return drift, rebuilt, await books.get_book_stats("1")
+
+    drift, rebuilt, stats = run(scenario)
+
+    assert drift[0]["stored_count"] == 7
+    assert rebuilt == 1
+    assert (stats["review_count"], stats["average_rating"]) == (1, 4.5)
+
+
+def test_fts_query_translates_web_search_syntax():
+    assert _fts_query('slow "plot twist" -boring') == (
+        '"slow" AND "plot twist" NOT "boring"'
+    )
+    assert _fts_query("dragons or wizards") == '("dragons" OR "wizards")'
+    assert _fts_query("-only !") is None
+
+
+def test_search_ranks_matches_and_follows_edits(run):
+    async def scenario(books, _, reviews, __):
+        await books.create_book(_book(1))
+        await reviews.create_reviews(
+            [
+                _review(10, comment="slow plot"),
+                _review(11, comment="slow, slow plots"),
+                _review(12, comment="slow plot but a twist"),
+            ]
+        )
+        await reviews.update_review("10", {"comment": "gripping"})
+
+        results = await reviews.search_reviews("slow plot -twist")
+        first = await reviews.search_reviews("plot", book_id="1", limit=1)
+        rest = await reviews.search_reviews(
+            "plot", limit=10, after=(first[0]["rank"], first[0]["id"])
+        )
+        return results, first + rest
+
+    results, pages = run(scenario)
+
+    assert [review["id"] for review in results] == ["11"]
+    assert sorted(review["id"] for review in pages) == ["11", "12"]
+    assert pages[0]["rank"] >= pages[1]["rank"]
+
+
+def test_similar_books_tolerate_typos(run):
+    async def scenario(books, *_):
+        await books.create_book(_book(1, title="Nineteen Eighty-Four"))
+        await books.create_book(_book(2, title="Brave New World"))
+        await books.update_book("2", {"title": "Ninety Days"})
+
+        return await books.find_similar_books("ninteen")
+
+    assert [book["id"] for book in run(scenario)] == ["1"]
+
+
+def test_leaderboards_rank_and_skip_fresh_boards(run):
+    now = START + timedelta(days=1)
+
+    async def scenario(books, _, reviews, leaderboards):
+        await books.create_books([_book(1), _book(2)])
+        await reviews.create_reviews(
+            [
+                _review(10, book_id="1", rating=5.0),
+                _review(11, book_id="2", rating=3.0),
+                _review(12, book_id="2", rating=3.0),
+            ]
+        )
+
+        refreshed = await leaderboards.refresh(now)
+        skipped = await leaderboards.refresh(now, timedelta(hours=1))
+        top = await leaderboards.get_board("top", limit=10)
+        trending = await leaderboards.get_board("trending", limit=1)
+        return refreshed, skipped, top, trending
+
+    refreshed, skipped, top, trending = run(scenario)
+
+    assert refreshed == ["top", "trending"]
+    assert skipped == []
+    assert [book["id"] for book in top["books"]] == ["1", "2"]
+    assert top["refreshed_at"] == now
+    assert [(b["id"], b["review_count"]) for b in trending["books"]] == [("2", 2)]
+
+
+def test_reads_run_while_a_write_is_open(run):
+    async def scenario(books, *_):
+        await books.create_book(_book(1))
+        async with books.database.write() as conn:
+            await conn.execute("UPDATE books SET title = 'Changed'")
+            # Readers see the last commit, without waiting for the writer
+            during = await asyncio.wait_for(books.get_book("1"), timeout=1)
+        return during, await books.get_book("1")
+
+    during, after = run(scenario)
+
+    assert during["title"] == "Dune"
+    assert after["title"] == "Changed"
+
+
+def test_exports_stream_rows_since(run):
+    async def scenario(books, *_):
+        await books.create_books([_book(1), _book(2), _book(3)])
+        return [
+            book["id"]
+            async for book in books.iter_books(since=START + timedelta(minutes=2))
+        ]
+
+    assert run(scenario) == ["2", "3"]
+
+
+def test_compact_data_strips_typed_columns(run):
+    async def scenario(books, *_):
+        await books.create_books([_book(1), _book(2)])
+        before = await books.relation_sizes()
+        compacted = await books.compact_data(batch_size=1)
+        async with books.database.read() as conn:
+            async with conn.execute("SELECT data FROM books") as cursor:
+                data = [row["data"] for row in await cursor.fetchall()]
+        after = await books.relation_sizes()
+        return compacted, data, await books.compact_data(), before, after
+
+    compacted, data, again, before, after = run(scenario)
+
+    assert compacted == 2
+    assert data == ["{}", "{}"]
+    assert again == 0
+    assert after["data"] == len("{}") * 2 < before["data"]
+
+
+@pytest.fixture
+def sqlite_backend(monkeypatch, tmp_path):
+    monkeypatch.setattr(backend, "DB_BACKEND", "sqlite")
+    monkeypatch.setattr(sqlite, "SQLITE_PATH", str(tmp_path / "test.db"))
+
+
+def test_repair_cli_fixes_drift_in_the_sqlite_file(run, sqlite_backend):
+    async def scenario(books, _, reviews, __):
+        await books.create_book(_book(1))
+        await reviews.create_review(_review(10, rating=4.5))
+        async with reviews.database.write() as conn:
+            await conn.execute("UPDATE book_rating_stats SET review_count = 7")
+
+    run(scenario)
+
+    assert asyncio.run(repair_rating_stats()) == 1
+    assert asyncio.run(repair_rating_stats(fix=True)) == 0
+    assert asyncio.run(repair_rating_stats()) == 0
+
+
+def test_compact_cli_runs_on_the_sqlite_file(run, sqlite_backend, tmp_path):
+    async def scenario(books, *_):
+        await books.create_books([_book(1), _book(2)])
+
+    run(scenario)
+    asyncio.run(compact(batch_size=1))
+
+    with sqlite3.connect(tmp_path / "test.db") as conn:
+        data = [row[0] for row in conn.execute("SELECT data FROM books")]
+    assert data == ["{}", "{}"]
@@ -0,0 +1,33 @@
+import json
+from datetime import datetime
+
+from api.db.updates import build_set_clause
+
+
+def test_set_clause_only_writes_updatable_columns():
+    clause, params = build_set_clause(
+        {"title": "Animal Farm", "id": "2", "isbn": None},
+        ("title", "author", "isbn", "updated_at"),
+    )
+
+    assert clause == "title = $2, isbn = $3, data = data || $4::jsonb"
+    assert params[:2] == ["Animal Farm", None]
+    assert json.loads(params[2]) == {"title": "Animal Farm", "isbn": None}
+
+
+def test_set_clause_serializes_timestamps_into_data():
+    updated_at = datetime(2024, 3, 1, 8, 0)
+
+    clause, params = build_set_clause({"updated_at": updated_at}, ("updated_at",))
+
+    assert clause == "updated_at = $2, data = data || $3::jsonb"
+    assert params == [updated_at, '{"updated_at": "2024-03-01T08:00:00"}']
+
+
+def test_set_clause_can_leave_data_untouched():
+    clause, params = build_set_clause(
+        {"title": "Animal Farm"}, ("title", "updated_at"), merge_data=False
+    )
+
+    assert clause == "title = $2"
+    assert params == ["Animal Farm"]
@@ -1,10 +1,11 @@
+import time
 from unittest.mock import AsyncMock
 
 import pytest
 from fastapi.testclient import TestClient
 
 from api.main import app
-from api.routers.books import get_book_service
+from api.routers.books import get_book_service, get_leaderboard_service
 from api.routers.reviews import get_review_service
 from api.routers.users import get_user_service
 
@@ -84,14 +85,39 @@ def mock_book_service():
         "isbn": "1234567890",
     }
 
-    service.delete_book.return_value = {"detail": "Deleted book 1"}
-    service.delete_books.return_value = {"detail": "Deleted all books"}
+    service.delete_book.return_value = "1"
+    service.delete_books.return_value = 2
 
     app.dependency_overrides[get_book_service] = lambda: service
     yield service
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def mock_leaderboard_service():
+    service = AsyncMock()
+    service.get_board.return_value = {
+        "board": "top",
+        "refreshed_at": "2024-01-01T08:00:00",
+        "books": [
+            {
+                "position": 1,
+                "id": "1",
+                "title": "1984",
+                "author": "George Orwell",
+                "isbn": None,
+                "score": 4.6,
+                "review_count": 120,
+                "average_rating": 4.7,
+            }
+        ],
+    }
+
+    app.dependency_overrides[get_leaderboard_service] = lambda: service
+    yield service
+    app.dependency_overrides.clear()
+
+
 @pytest.fixture
 def mock_review_service():
     class MockService:
@@ -102,7 +128,7 @@ def mock_review_service():
             self.update_review = self.db.update_review
             self.delete_review = self.db.delete_review
 
-        async def get_book_reviews(self, book_id):
+        async def get_book_reviews(self, book_id, limit=None, after=None):
             return [
                 {
                     "id": "100",
@@ -138,7 +164,7 @@ def mock_review_service():
         "comment": "This was such an interesting read. Got to learn a lot and I have been applying some of the lessons I learned and I can already see some difference.",
     }
 
-    service.delete_review.return_value = {"detail": "Deleted review 100"}
+    service.delete_review.return_value = "100"
 
     app.dependency_overrides[get_review_service] = lambda: service
     yield service
@@ -190,8 +216,8 @@ def mock_user_service():
         "email": "fredz@example.com",
     }
 
-    service.delete_user.return_value = {"detail": "Deleted user 01"}
-    service.delete_users.return_value = {"detail": "Deleted all users"}
+    service.delete_user.return_value = "01"
+    service.delete_users.return_value = 2
 
     app.dependency_overrides[get_user_service] = lambda: service
     yield service
@@ -267,3 +293,13 @@ def mock_user_service_error():
     app.dependency_overrides[get_user_service] = lambda: service
     yield service
     app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def local_time_ahead_of_utc(monkeypatch):
+    # POSIX zone three hours ahead of UTC, so local and UTC timestamps differ
+    monkeypatch.setenv("TZ", "UTC-3")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
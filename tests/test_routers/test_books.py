@@ -1,3 +1,7 @@
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+
 def test_create_book_success(client, mock_book_service, book_payload):
     response = client.post("/books/", json=book_payload)
 
@@ -98,3 +102,167 @@ def test_delete_books_success(client, mock_book_service):
     response = client.delete("/books")
 
     assert response.json()["detail"] == "Deleted all books"
+
+
+def test_get_books_passes_page_params(client, mock_book_service):
+    response = client.get("/books?limit=5")
+
+    assert response.status_code == 200
+    assert response.json()["next_cursor"] is None
+
+    mock_book_service.get_books.assert_awaited_once_with(limit=5, after=None)
+
+
+def test_get_books_invalid_cursor(client, mock_book_service):
+    response = client.get("/books?cursor=not-a-cursor")
+
+    assert response.status_code == 400
+    assert "Invalid cursor" in response.json()["detail"]
+
+
+def test_create_books_bulk_reports_per_item_results(client, mock_book_service):
+    mock_book_service.create_books = AsyncMock(side_effect=lambda books: books)
+    payload = [
+        {"title": "1984", "author": "George Orwell", "isbn": "1234567890"},
+        {"title": "Too short", "author": "Nobody"},
+        {"title": "Animal Farm", "author": "George Orwell"},
+    ]
+
+    response = client.post("/books/bulk", json=payload)
+    body = response.json()
+
+    assert response.status_code == 200
+    (records,) = mock_book_service.create_books.await_args.args
+    assert body["created"] == [
+        {"index": 0, "id": records[0]["id"]},
+        {"index": 2, "id": records[1]["id"]},
+    ]
+    assert [error["index"] for error in body["errors"]] == [1]
+    assert all(record["created_at"] for record in records)
+
+
+def test_create_books_bulk_rejects_non_array(client, mock_book_service):
+    response = client.post("/books/bulk", json={"title": "1984"})
+
+    assert response.status_code == 400
+    assert "JSON array" in response.json()["detail"]
+
+
+def test_get_book_stats_success(client, mock_book_service):
+    stats = {
+        "book_id": "1",
+        "review_count": 2,
+        "average_rating": 4.25,
+        "histogram": {"1": 0, "2": 0, "3": 0, "4": 1, "5": 1},
+    }
+    mock_book_service.get_book_stats = AsyncMock(return_value=stats)
+
+    response = client.get("/books/1/stats")
+
+    assert response.status_code == 200
+    assert response.json() == stats
+
+
+def test_get_book_stats_failure(client, mock_book_service):
+    mock_book_service.get_book_stats = AsyncMock(return_value=None)
+
+    response = client.get("/books/200/stats")
+
+    assert response.status_code == 404
+
+
+def test_get_book_with_stats(client, mock_book_service):
+    stats = {
+        "book_id": "1",
+        "review_count": 0,
+        "average_rating": None,
+        "histogram": {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0},
+    }
+    mock_book_service.get_book_stats = AsyncMock(return_value=stats)
+
+    response = client.get("/books/1?include_stats=true")
+
+    assert response.status_code == 200
+    assert response.json()["stats"] == stats
+
+
+def test_get_books_serializes_timestamps(client, mock_book_service):
+    created_at = datetime(2024, 1, 1, 8, 30)
+    mock_book_service.get_books.return_value = [
+        {
+            "id": "1",
+            "title": "1984",
+            "author": "George Orwell",
+            "isbn": None,
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+    ]
+
+    response = client.get("/books")
+
+    assert response.json()["books"][0]["created_at"] == "2024-01-01T08:30:00"
+    assert response.json()["books"][0]["isbn"] is None
+
+
+def test_delete_book_is_a_single_call(client, mock_book_service):
+    response = client.delete("/books/1")
+
+    assert response.status_code == 200
+    mock_book_service.delete_book.assert_awaited_once_with("1")
+    mock_book_service.get_book.assert_not_awaited()
+
+
+def test_delete_books_reports_count(client, mock_book_service):
+    response = client.delete("/books")
+
+    assert response.json()["deleted"] == 2
+
+
+def test_create_book_inserts_a_complete_record(client, mock_book_service, book_payload):
+    client.post("/books/", json=book_payload)
+
+    (record,) = mock_book_service.create_book.await_args.args
+    assert {**book_payload, "id": record["id"]}.items() <= record.items()
+    assert record["created_at"] == record["updated_at"]
+
+
+def test_suggest_books_success(client, mock_book_service):
+    suggestions = [{"id": "1", "title": "1984", "author": "George Orwell"}]
+    mock_book_service.suggest_books = AsyncMock(return_value=suggestions)
+
+    response = client.get("/books/suggest?prefix=orw&limit=5")
+
+    assert response.status_code == 200
+    assert response.json() == suggestions
+    mock_book_service.suggest_books.assert_awaited_once_with("orw", limit=5, fuzzy=True)
+    mock_book_service.get_book.assert_not_awaited()
+
+
+def test_suggest_books_requires_prefix(client, mock_book_service):
+    response = client.get("/books/suggest?prefix=")
+
+    assert response.status_code == 422
+
+
+def test_get_top_books(client, mock_leaderboard_service, mock_book_service):
+    response = client.get("/books/top?limit=5&offset=10")
+
+    assert response.status_code == 200
+    assert response.json()["refreshed_at"] == "2024-01-01T08:00:00"
+    assert response.json()["books"][0]["position"] == 1
+    mock_leaderboard_service.get_board.assert_awaited_once_with("top", 5, 10)
+    mock_book_service.get_book.assert_not_awaited()
+
+
+def test_get_trending_books(client, mock_leaderboard_service):
+    response = client.get("/books/trending")
+
+    assert response.status_code == 200
+    mock_leaderboard_service.get_board.assert_awaited_once_with("trending", 10, 0)
+
+
+def test_get_top_books_rejects_negative_offset(client, mock_leaderboard_service):
+    response = client.get("/books/top?offset=-1")
+
+    assert response.status_code == 422
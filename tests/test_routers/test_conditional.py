@@ -0,0 +1,99 @@
+from datetime import datetime
+
+
+def test_get_book_returns_etag_and_304(client, mock_book_service):
+    first = client.get("/books/1")
+    etag = first.headers["etag"]
+
+    second = client.get("/books/1", headers={"If-None-Match": etag})
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+
+
+def test_get_book_etag_changes_with_update(client, mock_book_service):
+    book = {
+        "id": "1",
+        "title": "1984",
+        "author": "George Orwell",
+        "updated_at": datetime(2024, 1, 1),
+    }
+    mock_book_service.get_book.return_value = book
+    etag = client.get("/books/1").headers["etag"]
+
+    mock_book_service.get_book.return_value = {
+        **book,
+        "updated_at": datetime(2024, 2, 1),
+    }
+    response = client.get("/books/1", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_get_users_sees_deletions_despite_if_modified_since(client, mock_user_service):
+    users = [
+        {
+            "id": "01",
+            "username": "fredm",
+            "email": "fredm@example.com",
+            "updated_at": datetime(2024, 1, 1, 12),
+        },
+        {
+            "id": "02",
+            "username": "alext",
+            "email": "alext@example.com",
+            "updated_at": datetime(2024, 1, 2, 12),
+        },
+    ]
+    mock_user_service.get_users.return_value = users
+    first = client.get("/users")
+
+    # Deleting the older user leaves the newest updated_at in the page alone
+    mock_user_service.get_users.return_value = users[1:]
+    since = client.get(
+        "/users", headers={"If-Modified-Since": "Tue, 02 Jan 2024 12:00:00 GMT"}
+    )
+    etag = client.get("/users", headers={"If-None-Match": first.headers["etag"]})
+
+    assert "last-modified" not in first.headers
+    assert since.status_code == 200
+    assert [user["id"] for user in since.json()["users"]] == ["02"]
+    assert etag.status_code == 200
+
+
+def test_get_user_honours_if_modified_since(
+    client, mock_user_service, local_time_ahead_of_utc
+):
+    mock_user_service.get_user.return_value = {
+        "id": "01",
+        "username": "fredm",
+        "email": "fredm@example.com",
+        "updated_at": datetime(2024, 1, 2, 12),
+    }
+
+    first = client.get("/users/01")
+    fresh = client.get(
+        "/users/01", headers={"If-Modified-Since": first.headers["last-modified"]}
+    )
+    unknown_zone = client.get(
+        "/users/01", headers={"If-Modified-Since": "Tue, 02 Jan 2024 09:00:00 -0000"}
+    )
+    stale = client.get(
+        "/users/01", headers={"If-Modified-Since": "Tue, 02 Jan 2024 08:59:59 GMT"}
+    )
+
+    # updated_at is naive local time, so 12:00 here is 09:00 GMT
+    assert first.headers["last-modified"] == "Tue, 02 Jan 2024 09:00:00 GMT"
+    assert fresh.status_code == unknown_zone.status_code == 304
+    assert stale.status_code == 200
+
+
+def test_get_book_reviews_304_on_matching_etag(client, mock_review_service):
+    etag = client.get("/books/1/reviews").headers["etag"]
+
+    response = client.get("/books/1/reviews", headers={"If-None-Match": f"W/{etag}"})
+
+    assert response.status_code == 304
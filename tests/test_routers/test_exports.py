@@ -0,0 +1,88 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+
+def _rows(*rows):
+    async def generate():
+        for row in rows:
+            yield row
+
+    return generate()
+
+
+def test_export_books_ndjson(client, mock_book_service):
+    created_at = datetime(2024, 1, 1, 9, 30)
+    mock_book_service.export_books = lambda since: _rows(
+        {
+            "id": "1",
+            "title": "1984",
+            "author": "George Orwell",
+            "isbn": None,
+            "created_at": created_at,
+        },
+        {
+            "id": "2",
+            "title": "Animal Farm",
+            "author": "George Orwell",
+            "isbn": None,
+            "created_at": created_at,
+        },
+    )
+
+    response = client.get("/export/books")
+    lines = response.text.splitlines()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert len(lines) == 2
+    assert json.loads(lines[0])["created_at"] == "2024-01-01T09:30:00"
+
+
+def test_export_reviews_csv(client, mock_review_service):
+    since = []
+    created_at = datetime(2024, 1, 1, 9, 30)
+
+    def export_reviews(value):
+        since.append(value)
+        return _rows(
+            {
+                "id": "100",
+                "user_id": "10",
+                "book_id": "1",
+                "rating": Decimal("4.5"),
+                "comment": "Loved every page of it",
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+        )
+
+    mock_review_service.export_reviews = export_reviews
+
+    response = client.get("/export/reviews?format=csv&since=2023-12-31T00:00:00")
+    lines = response.text.splitlines()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert lines[0] == "id,user_id,book_id,rating,comment,created_at,updated_at"
+    assert lines[1].startswith("100,10,1,4.5,")
+    assert since == [datetime(2023, 12, 31)]
+
+
+def test_export_converts_aware_since_to_local_time(
+    client, mock_book_service, local_time_ahead_of_utc
+):
+    since = []
+
+    def export_books(value):
+        since.append(value)
+        return _rows()
+
+    mock_book_service.export_books = export_books
+
+    utc = client.get("/export/books?since=2020-01-01T00:00:00Z")
+    offset = client.get("/export/books", params={"since": "2020-01-01T02:00:00+02:00"})
+
+    assert utc.status_code == offset.status_code == 200
+    # Stored timestamps are naive local time, so 00:00 UTC is 03:00 here
+    assert since == [datetime(2020, 1, 1, 3), datetime(2020, 1, 1, 3)]
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from api.db import backend
+from api.db.memory import memory_store
+
+
+@pytest.fixture
+def memory_backend(monkeypatch):
+    monkeypatch.setattr(backend, "DB_BACKEND", "memory")
+    yield memory_store
+    memory_store.clear()
+
+
+def test_routes_run_against_the_memory_backend(client, memory_backend):
+    user = client.post(
+        "/users/", json={"username": "ada_l", "email": "ada@example.com"}
+    ).json()["user"]
+    book = client.post(
+        "/books/", json={"title": "Dune", "author": "Frank Herbert", "isbn": "1"}
+    ).json()["book"]
+
+    created = client.post(
+        f"/books/{book['id']}/reviews",
+        json={
+            "user_id": user["id"],
+            "book_id": book["id"],
+            "rating": 4.5,
+            "comment": "Sprawling and strange",
+        },
+    )
+    reviews = client.get(f"/books/{book['id']}/reviews")
+    stats = client.get(f"/books/{book['id']}/stats")
+
+    assert created.status_code == 200
+    assert [review["comment"] for review in reviews.json()] == ["Sprawling and strange"]
+    assert stats.json()["review_count"] == 1
+    assert len(memory_backend.reviews) == 1
+
+
+def test_exports_accept_a_utc_since(client, memory_backend):
+    client.post(
+        "/books/", json={"title": "Dune", "author": "Frank Herbert", "isbn": "1"}
+    )
+
+    exported = client.get("/export/books?since=2020-01-01T00:00:00Z")
+
+    assert exported.status_code == 200
+    assert [json.loads(line)["title"] for line in exported.text.splitlines()] == [
+        "Dune"
+    ]
@@ -0,0 +1,49 @@
+from api import metrics
+from api.metrics import Counter, Histogram
+
+
+def test_metrics_endpoint_serves_prometheus_text(client):
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert 'cache_hit_ratio{cache="books"}' in response.text
+
+
+def test_requests_are_labelled_by_route_template(client, mock_book_service):
+    client.get("/books/1")
+    client.get("/books/2")
+
+    series = metrics.http_latency.values[("GET", "/books/{book_id}")]
+    assert sum(series[0]) >= 2
+    assert ("GET", "/books/1") not in metrics.http_latency.values
+    assert metrics.http_requests.values[("GET", "/books/{book_id}", "200")] >= 2
+
+
+def test_unknown_paths_share_one_label(client):
+    client.get("/no/such/path")
+
+    assert ("GET", "/no/such/path", "404") not in metrics.http_requests.values
+    assert metrics.http_requests.values[("GET", "unmatched", "404")] >= 1
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_seconds", "Test", ("route",), buckets=(0.1, 1))
+    histogram.observe(("/a",), 0.05)
+    histogram.observe(("/a",), 0.5)
+    histogram.observe(("/a",), 5)
+
+    lines = histogram.render()
+
+    assert 'test_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{route="/a"} 3' in lines
+
+
+def test_counter_escapes_label_values():
+    counter = Counter("test_total", "Test", ("path",))
+    counter.inc(('say "hi"',))
+
+    assert counter.render()[-1] == 'test_total{path="say \\"hi\\""} 1'
@@ -0,0 +1,28 @@
+import io
+import json
+
+from api.tracing import JsonLinesExporter, Tracer
+
+
+def test_responses_carry_a_request_id(client, mock_book_service):
+    response = client.get("/books/1")
+
+    assert len(response.headers["x-request-id"]) == 32
+
+
+def test_incoming_request_id_is_kept(client, mock_book_service):
+    response = client.get("/books/1", headers={"X-Request-ID": "abc-123"})
+
+    assert response.headers["x-request-id"] == "abc-123"
+
+
+def test_request_span_is_named_after_the_route(client, mock_book_service, monkeypatch):
+    stream = io.StringIO()
+    monkeypatch.setattr("api.tracing.tracer", Tracer(JsonLinesExporter(stream=stream)))
+
+    client.get("/books/1", headers={"X-Request-ID": "abc-123"})
+
+    span = json.loads(stream.getvalue().splitlines()[-1])
+    assert span["name"] == "GET /books/{book_id}"
+    assert span["attributes"]["http.status_code"] == 200
+    assert span["attributes"]["request.id"] == "abc-123"
@@ -0,0 +1,27 @@
+from datetime import datetime
+from decimal import Decimal
+
+import orjson
+from fastapi import Response
+
+from api.routers.responses import ORJSONResponse, rows_response
+
+
+def test_orjson_response_encodes_database_types():
+    response = ORJSONResponse(
+        [{"rating": Decimal("4.5"), "created_at": datetime(2024, 1, 1, 8, 30)}]
+    )
+
+    assert orjson.loads(response.body) == [
+        {"rating": 4.5, "created_at": "2024-01-01T08:30:00"}
+    ]
+
+
+def test_rows_response_keeps_route_headers():
+    route_response = Response()
+    route_response.headers["ETag"] = '"abc"'
+
+    response = rows_response({"books": []}, route_response)
+
+    assert response.headers["etag"] == '"abc"'
+    assert response.headers["content-type"] == "application/json"
@@ -1,3 +1,10 @@
+import json
+from unittest.mock import AsyncMock
+
+from api.db.pagination import decode_rank_cursor
+from api.services.ingest import ReviewBatcher
+
+
 def test_create_review_success(client, mock_review_service, review_payload):
     response = client.post("/books/1/reviews", json=review_payload)
 
@@ -65,3 +72,95 @@ def test_delete_review_failure(client, mock_review_service_error):
 
     assert response.status_code == 404
     assert response.json()["detail"] == "Review not found"
+
+
+def test_create_reviews_bulk_accepts_ndjson(
+    client, mock_review_service, review_payload
+):
+    mock_review_service.create_reviews = AsyncMock(
+        return_value=(
+            [{"index": 0, "id": "200"}],
+            [{"index": 1, "errors": ["Book not found"]}],
+        )
+    )
+    invalid = {**review_payload, "rating": 9}
+    body = "\n".join(
+        json.dumps(item) for item in [review_payload, review_payload, invalid]
+    )
+
+    response = client.post(
+        "/reviews/bulk",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["created"] == [{"index": 0, "id": "200"}]
+    assert [error["index"] for error in response.json()["errors"]] == [1, 2]
+
+
+def test_delete_review_is_a_single_call(client, mock_review_service):
+    response = client.delete("/reviews/100")
+
+    assert response.status_code == 200
+    mock_review_service.delete_review.assert_awaited_once_with("100")
+    mock_review_service.get_review.assert_not_awaited()
+
+
+def test_search_reviews_pages_by_rank(client, mock_review_service):
+    mock_review_service.search_reviews = AsyncMock(
+        return_value=[
+            {"id": "100", "book_id": "1", "comment": "gripping plot", "rank": 0.6},
+            {"id": "101", "book_id": "1", "comment": "plot twists", "rank": 0.3},
+        ]
+    )
+
+    response = client.get("/reviews/search?q=plot&book_id=1&limit=2")
+    body = response.json()
+
+    assert response.status_code == 200
+    assert [review["id"] for review in body["reviews"]] == ["100", "101"]
+    assert decode_rank_cursor(body["next_cursor"]) == (0.3, "101")
+    mock_review_service.search_reviews.assert_awaited_once_with(
+        "plot", book_id="1", limit=2, after=None
+    )
+
+
+def test_search_reviews_requires_a_query(client, mock_review_service):
+    response = client.get("/reviews/search?q=")
+
+    assert response.status_code == 422
+
+
+def test_search_reviews_rejects_invalid_cursor(client, mock_review_service):
+    response = client.get("/reviews/search?q=plot&cursor=garbage")
+
+    assert response.status_code == 400
+
+
+def test_create_review_queues_in_async_mode(
+    client, mock_review_service, review_payload, monkeypatch
+):
+    batcher = ReviewBatcher(enabled=True, max_queue=1)
+    monkeypatch.setattr("api.routers.reviews.review_batcher", batcher)
+
+    response = client.post("/books/1/reviews", json=review_payload)
+
+    assert response.status_code == 202
+    assert response.json()["id"]
+    assert batcher.stats()["queued"] == 1
+    mock_review_service.create_review.assert_not_awaited()
+
+
+def test_create_review_full_queue_is_unavailable(
+    client, mock_review_service, review_payload, monkeypatch
+):
+    batcher = ReviewBatcher(enabled=True, max_queue=1)
+    batcher.submit({"id": "queued"})
+    monkeypatch.setattr("api.routers.reviews.review_batcher", batcher)
+
+    response = client.post("/books/1/reviews", json=review_payload)
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert batcher.stats()["rejected"] == 1
@@ -0,0 +1,43 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from api.db import backend, sqlite
+from api.main import app
+from api.services.suggest import book_index
+
+
+@pytest.fixture
+def sqlite_client(monkeypatch, tmp_path):
+    monkeypatch.setattr(backend, "DB_BACKEND", "sqlite")
+    monkeypatch.setattr(sqlite, "SQLITE_PATH", str(tmp_path / "api.db"))
+    # Building the process-wide suggestion index would leak into other tests
+    monkeypatch.setattr(book_index, "enabled", False)
+    # Entering the client runs the lifespan, which opens the database
+    with TestClient(app) as client:
+        yield client
+
+
+def test_routes_run_against_the_sqlite_backend(sqlite_client, tmp_path):
+    user = sqlite_client.post(
+        "/users/", json={"username": "ada_l", "email": "ada@example.com"}
+    ).json()["user"]
+    book = sqlite_client.post(
+        "/books/", json={"title": "Dune", "author": "Frank Herbert", "isbn": "1"}
+    ).json()["book"]
+
+    created = sqlite_client.post(
+        f"/books/{book['id']}/reviews",
+        json={
+            "user_id": user["id"],
+            "book_id": book["id"],
+            "rating": 4.5,
+            "comment": "Sprawling and strange",
+        },
+    )
+    reviews = sqlite_client.get(f"/books/{book['id']}/reviews")
+    stats = sqlite_client.get(f"/books/{book['id']}/stats")
+
+    assert created.status_code == 200
+    assert [review["comment"] for review in reviews.json()] == ["Sprawling and strange"]
+    assert stats.json()["review_count"] == 1
+    assert (tmp_path / "api.db").exists()
@@ -100,3 +100,10 @@ def test_delete_users_success(client, mock_user_service):
     response = client.delete("/users")
 
     assert response.json()["detail"] == "Deleted all users"
+
+
+def test_get_users_invalid_cursor(client, mock_user_service):
+    response = client.get("/users?cursor=not-a-cursor")
+
+    assert response.status_code == 400
+    assert "Invalid cursor" in response.json()["detail"]
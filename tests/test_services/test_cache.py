@@ -0,0 +1,141 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+from api.services.books import BookService
+from api.services.cache import MISSING, TTLCache
+from api.services.singleflight import SingleFlight
+from api.services.suggest import PrefixIndex
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_expires_entries_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache("test", ttl=10, negative_ttl=1, clock=clock)
+
+    cache.set("1", {"id": "1"})
+    clock.now = 9
+    assert cache.get("1") == {"id": "1"}
+
+    clock.now = 10
+    assert cache.get("1") is MISSING
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_keeps_negative_entries_briefly():
+    clock = FakeClock()
+    cache = TTLCache("test", ttl=10, negative_ttl=1, clock=clock)
+
+    cache.set("404", None)
+    assert cache.get("404") is None
+
+    clock.now = 1
+    assert cache.get("404") is MISSING
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache("test", max_entries=2)
+
+    cache.set("1", "a")
+    cache.set("2", "b")
+    cache.get("1")
+    cache.set("3", "c")
+
+    assert cache.get("2") is MISSING
+    assert cache.get("1") == "a"
+    assert cache.get("3") == "c"
+
+
+def test_disabled_cache_never_stores():
+    cache = TTLCache("test", enabled=False)
+
+    cache.set("1", "a")
+
+    assert cache.get("1") is MISSING
+
+
+def test_book_service_reads_through_and_invalidates():
+    db = AsyncMock()
+    db.get_book.return_value = {"id": "1", "title": "1984", "created_at": None}
+    db.update_book.return_value = {"id": "1", "title": "1984 (Updated)"}
+    service = BookService(db, cache=TTLCache("books"))
+
+    async def scenario():
+        await service.get_book("1")
+        await service.get_book("1")
+        await service.update_book("1", {"title": "1984 (Updated)"})
+        await service.get_book("1")
+
+    asyncio.run(scenario())
+
+    # The update invalidates the cached row, so only the last read goes back to the db
+    assert db.get_book.await_count == 2
+
+
+class BlockingBooks:
+    """Serves the stored row, holding the first read until ``release`` is set."""
+
+    def __init__(self):
+        self.row = {"id": "1", "title": "1984", "created_at": None}
+        self.reading = asyncio.Event()
+        self.release = asyncio.Event()
+        self.reads = 0
+
+    async def get_book(self, book_id):
+        row = dict(self.row)
+        self.reads += 1
+        if self.reads == 1:
+            self.reading.set()
+            await self.release.wait()
+        return row
+
+    async def update_book(self, book_id, fields):
+        self.row = {**self.row, **fields}
+        return dict(self.row)
+
+
+def test_read_started_before_an_update_is_not_cached_over_it():
+    db = BlockingBooks()
+    service = BookService(
+        db,
+        cache=TTLCache("books"),
+        index=PrefixIndex(enabled=True),
+        flight=SingleFlight("books", enabled=False),
+    )
+
+    async def scenario():
+        stale = asyncio.ensure_future(service.get_book("1"))
+        await db.reading.wait()
+        await service.update_book("1", {"title": "1984 (Updated)"})
+        db.release.set()
+        return await stale, await service.get_book("1")
+
+    stale, fresh = asyncio.run(scenario())
+
+    assert stale["title"] == "1984"
+    assert fresh["title"] == "1984 (Updated)"
+
+
+def test_generations_survive_being_dropped_and_cleared():
+    cache = TTLCache("test", max_entries=1)
+    generation = cache.generation("a")
+
+    cache.invalidate("a")
+    # Dropping "a"'s generation must not make it look untouched again
+    cache.invalidate("b")
+    cache.set("a", "stale", generation)
+    assert cache.get("a") is MISSING
+
+    generation = cache.generation("c")
+    cache.clear()
+    cache.set("c", "stale", generation)
+    assert cache.get("c") is MISSING
+
+    cache.set("c", "fresh", cache.generation("c"))
+    assert cache.get("c") == "fresh"
@@ -0,0 +1,94 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from api.services.ingest import ReviewBatcher, write_reviews
+
+
+def _reviews(count):
+    return [{"id": str(i), "book_id": "1", "rating": 4} for i in range(count)]
+
+
+def test_batcher_groups_queued_reviews():
+    writer = AsyncMock(side_effect=lambda batch: len(batch))
+    batcher = ReviewBatcher(enabled=True, max_rows=3, max_delay_ms=1000, writer=writer)
+
+    async def run():
+        batcher.start()
+        for review in _reviews(7):
+            batcher.submit(review)
+        await batcher.stop()
+
+    asyncio.run(run())
+
+    assert [len(call.args[0]) for call in writer.await_args_list] == [3, 3, 1]
+    assert batcher.stats()["written"] == 7
+
+
+def test_batcher_flushes_after_the_delay():
+    writer = AsyncMock(side_effect=lambda batch: len(batch))
+    batcher = ReviewBatcher(enabled=True, max_rows=100, max_delay_ms=10, writer=writer)
+
+    async def run():
+        batcher.start()
+        batcher.submit(_reviews(1)[0])
+        await asyncio.sleep(0.1)
+        flushed = writer.await_count
+        await batcher.stop()
+        return flushed
+
+    assert asyncio.run(run()) == 1
+
+
+def test_batcher_rejects_when_full():
+    batcher = ReviewBatcher(enabled=True, max_queue=2)
+    batcher.submit({"id": "1"})
+    batcher.submit({"id": "2"})
+
+    with pytest.raises(asyncio.QueueFull):
+        batcher.submit({"id": "3"})
+    assert batcher.stats()["rejected"] == 1
+
+
+def test_batcher_counts_failed_batches_as_dropped():
+    writer = AsyncMock(side_effect=RuntimeError("database is down"))
+    batcher = ReviewBatcher(enabled=True, writer=writer)
+
+    async def run():
+        batcher.start()
+        batcher.submit({"id": "1"})
+        await batcher.stop()
+
+    asyncio.run(run())
+
+    assert batcher.stats()["dropped"] == 1
+
+
+def test_batcher_refuses_reviews_once_stopping():
+    batcher = ReviewBatcher(enabled=True, writer=AsyncMock(return_value=0))
+
+    async def run():
+        batcher.start()
+        await batcher.stop()
+
+    asyncio.run(run())
+
+    with pytest.raises(asyncio.QueueFull):
+        batcher.submit({"id": "1"})
+
+
+def test_write_reviews_falls_back_to_single_inserts():
+    service = AsyncMock()
+    service.create_reviews.side_effect = RuntimeError("foreign key violation")
+    service.create_review.side_effect = [{"id": "0"}, RuntimeError("missing book")]
+
+    with patch("api.services.ingest.review_repository") as repository, patch(
+        "api.services.ingest.ReviewService", return_value=service
+    ):
+        repository.return_value.__aenter__ = AsyncMock()
+        repository.return_value.__aexit__ = AsyncMock(return_value=False)
+        written = asyncio.run(write_reviews(_reviews(2)))
+
+    assert written == 1
+    assert service.create_review.await_count == 2
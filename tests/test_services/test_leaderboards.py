@@ -0,0 +1,45 @@
+import asyncio
+from datetime import timedelta
+from unittest.mock import AsyncMock
+
+from api.services.leaderboards import LeaderboardRefresher, LeaderboardService
+
+
+def test_refresh_passes_the_minimum_age():
+    db = AsyncMock()
+    db.refresh.return_value = ["top"]
+
+    refreshed = asyncio.run(
+        LeaderboardService(db).refresh(min_age=timedelta(minutes=2))
+    )
+
+    assert refreshed == ["top"]
+    assert db.refresh.await_args.args[1] == timedelta(minutes=2)
+
+
+def test_refresher_keeps_running_after_a_failed_refresh():
+    refresher = LeaderboardRefresher(interval=0.01)
+    refresher.refresh_once = AsyncMock(side_effect=[RuntimeError("down"), ["top"]])
+
+    async def run():
+        refresher.start()
+        while refresher.refresh_once.await_count < 2:
+            await asyncio.sleep(0.01)
+        await refresher.stop()
+
+    asyncio.run(run())
+
+    assert refresher.refresh_once.await_count >= 2
+
+
+def test_refresher_is_disabled_by_a_zero_interval():
+    refresher = LeaderboardRefresher(interval=0)
+    refresher.refresh_once = AsyncMock()
+
+    async def run():
+        refresher.start()
+        await refresher.stop()
+
+    asyncio.run(run())
+
+    refresher.refresh_once.assert_not_awaited()
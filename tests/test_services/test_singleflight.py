@@ -0,0 +1,151 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from api.services.books import BookService
+from api.services.cache import MISSING, TTLCache
+from api.services.singleflight import SingleFlight
+from api.services.suggest import PrefixIndex
+
+
+class SlowQuery:
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self, *args):
+        self.calls += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_calls_share_one_query():
+    flight = SingleFlight("test")
+
+    async def run():
+        query = SlowQuery(result={"id": "1"})
+        waiters = [asyncio.ensure_future(flight.do("1", query, "1")) for _ in range(5)]
+        await asyncio.sleep(0)
+        query.release.set()
+        return query, await asyncio.gather(*waiters)
+
+    query, results = asyncio.run(run())
+
+    assert query.calls == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats()["shared"] == 4
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_different_keys_do_not_share():
+    flight = SingleFlight("test")
+
+    async def run():
+        query = SlowQuery(result=[])
+        waiters = [asyncio.ensure_future(flight.do(key, query)) for key in "ab"]
+        await asyncio.sleep(0)
+        query.release.set()
+        await asyncio.gather(*waiters)
+        return query
+
+    assert asyncio.run(run()).calls == 2
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight("test")
+
+    async def run():
+        query = SlowQuery(error=RuntimeError("database is down"))
+        waiters = [asyncio.ensure_future(flight.do("1", query)) for _ in range(3)]
+        await asyncio.sleep(0)
+        query.release.set()
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_cancelled_waiter_does_not_cancel_the_query():
+    flight = SingleFlight("test")
+
+    async def run():
+        query = SlowQuery(result="done")
+        first = asyncio.ensure_future(flight.do("1", query))
+        second = asyncio.ensure_future(flight.do("1", query))
+        await asyncio.sleep(0)
+        first.cancel()
+        query.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_forget_starts_a_fresh_query():
+    flight = SingleFlight("test")
+
+    async def run():
+        query = SlowQuery(result="old")
+        first = asyncio.ensure_future(flight.do("1", query))
+        await asyncio.sleep(0)
+        flight.forget("1")
+        second = asyncio.ensure_future(flight.do("1", query))
+        await asyncio.sleep(0)
+        query.release.set()
+        await asyncio.gather(first, second)
+        return query
+
+    assert asyncio.run(run()).calls == 2
+
+
+def test_book_service_coalesces_cache_misses():
+    db = AsyncMock()
+    query = SlowQuery(result={"id": "1", "title": "1984"})
+    db.get_book = query
+    service = BookService(
+        db, cache=TTLCache("test", ttl=10), flight=SingleFlight("test")
+    )
+
+    async def run():
+        waiters = [asyncio.ensure_future(service.get_book("1")) for _ in range(10)]
+        await asyncio.sleep(0)
+        query.release.set()
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(run())
+
+    assert query.calls == 1
+    assert results == [{"id": "1", "title": "1984"}] * 10
+
+
+def test_update_during_a_shared_read_is_not_cached_over():
+    db = AsyncMock()
+    query = SlowQuery(result={"id": "1", "title": "1984"})
+    db.get_book = query
+    db.update_book.return_value = {"id": "1", "title": "1984 (Updated)"}
+    cache = TTLCache("test", ttl=10)
+    service = BookService(
+        db, cache=cache, index=PrefixIndex(enabled=True), flight=SingleFlight("test")
+    )
+
+    async def run():
+        waiters = [asyncio.ensure_future(service.get_book("1")) for _ in range(3)]
+        await asyncio.sleep(0)
+        await service.update_book("1", {"title": "1984 (Updated)"})
+        query.release.set()
+        return await asyncio.gather(*waiters)
+
+    joined = asyncio.run(run())
+
+    assert query.calls == 1
+    # Callers that joined before the update still get its result, but none
+    # of them caches it over the update
+    assert joined == [{"id": "1", "title": "1984"}] * 3
+    assert cache.get("1") is MISSING
@@ -0,0 +1,201 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+from api.db import backend
+from api.db.memory import memory_store
+from api.services.books import BookService, SuggestIndexRefresher
+from api.services.cache import TTLCache
+from api.services.suggest import PrefixIndex, normalize
+
+BOOKS = [
+    {"id": "1", "title": "Animal Farm", "author": "George Orwell"},
+    {"id": "2", "title": "Nineteen Eighty-Four", "author": "George Orwell"},
+    {"id": "3", "title": "Les Misérables", "author": "Victor Hugo"},
+]
+
+
+def _index():
+    index = PrefixIndex(enabled=True)
+    index.build(BOOKS)
+    return index
+
+
+def _ids(books):
+    return [book["id"] for book in books]
+
+
+def test_normalize_folds_case_accents_and_spacing():
+    assert normalize("  Les  MISÉRABLES ") == "les miserables"
+
+
+def test_suggest_matches_title_and_author_prefixes():
+    index = _index()
+
+    assert _ids(index.suggest("anim")) == ["1"]
+    assert sorted(_ids(index.suggest("george"))) == ["1", "2"]
+
+
+def test_suggest_matches_later_words():
+    index = _index()
+
+    assert _ids(index.suggest("farm")) == ["1"]
+    assert _ids(index.suggest("eighty")) == ["2"]
+
+
+def test_suggest_ignores_case_and_accents():
+    assert _ids(_index().suggest("MISER")) == ["3"]
+
+
+def test_suggest_limits_and_dedupes():
+    index = _index()
+
+    # "orwell" and "george orwell" are both keys of each Orwell book
+    assert sorted(_ids(index.suggest("o"))) == ["1", "2"]
+    assert len(index.suggest("george", limit=1)) == 1
+    assert index.suggest("   ") == []
+
+
+def test_add_replaces_and_remove_drops_entries():
+    index = _index()
+
+    index.add({"id": "1", "title": "Homage to Catalonia", "author": "George Orwell"})
+    assert _ids(index.suggest("anim")) == []
+    assert _ids(index.suggest("homage")) == ["1"]
+
+    index.remove("1")
+    assert _ids(index.suggest("homage")) == []
+    assert len(index) == 2
+
+
+def test_add_is_ignored_until_built():
+    index = PrefixIndex(enabled=True)
+    index.add(BOOKS[0])
+
+    assert not index.ready
+    assert len(index) == 0
+
+
+def test_service_tops_up_with_fuzzy_matches():
+    db = AsyncMock()
+    db.find_similar_books.return_value = [
+        {"id": "1", "title": "Animal Farm", "author": "George Orwell", "score": 0.6},
+        {
+            "id": "4",
+            "title": "Orwell's Roses",
+            "author": "Rebecca Solnit",
+            "score": 0.5,
+        },
+    ]
+    service = BookService(db, cache=TTLCache("test", ttl=10), index=_index())
+
+    suggestions = asyncio.run(service.suggest_books("orwel", limit=3))
+
+    assert sorted(_ids(suggestions[:2])) == ["1", "2"]
+    assert _ids(suggestions[2:]) == ["4"]
+    db.find_similar_books.assert_awaited_once_with("orwel", 3)
+
+
+def test_service_skips_fuzzy_for_short_prefixes():
+    db = AsyncMock()
+    service = BookService(db, cache=TTLCache("test", ttl=10), index=_index())
+
+    assert _ids(asyncio.run(service.suggest_books("an"))) == ["1"]
+    db.find_similar_books.assert_not_awaited()
+
+
+def test_add_many_matches_adding_one_at_a_time():
+    index, one_by_one = _index(), _index()
+    books = [
+        {"id": "1", "title": "Homage to Catalonia", "author": "George Orwell"},
+        {"id": "4", "title": "Burmese Days", "author": "George Orwell"},
+        {"id": "5", "title": "Animal Dreams", "author": "Barbara Kingsolver"},
+    ]
+
+    index.add_many(books)
+    for book in books:
+        one_by_one.add(book)
+
+    assert index._entries == one_by_one._entries
+    assert _ids(index.suggest("anim")) == ["5"]
+    assert len(index) == 5
+
+
+def test_rebuild_replaces_the_index():
+    async def titles():
+        for book in BOOKS[1:]:
+            yield book
+
+    index = _index()
+    asyncio.run(index.rebuild(titles()))
+
+    assert _ids(index.suggest("anim")) == []
+    assert _ids(index.suggest("nine")) == ["2"]
+    assert len(index) == 2
+
+
+def test_rebuild_replays_writes_made_while_it_ran():
+    index = _index()
+
+    async def titles():
+        # Rows read before the writes below committed
+        for book in BOOKS:
+            yield book
+        index.remove("2")
+        index.add({"id": "4", "title": "Burmese Days", "author": "George Orwell"})
+
+    asyncio.run(index.rebuild(titles()))
+
+    assert sorted(_ids(index.suggest("george"))) == ["1", "4"]
+    assert len(index) == 3
+
+
+def test_refresher_builds_then_keeps_rebuilding():
+    index = PrefixIndex(enabled=True)
+    refresher = SuggestIndexRefresher(index, interval=0.01)
+    refresher.refresh_once = AsyncMock(side_effect=[RuntimeError("down"), 3, 3])
+
+    async def scenario():
+        refresher.start()
+        while refresher.refresh_once.await_count < 3:
+            await asyncio.sleep(0.01)
+        await refresher.stop()
+
+    asyncio.run(scenario())
+
+    assert refresher.refresh_once.await_count >= 3
+
+
+def test_refresher_builds_once_with_a_zero_interval():
+    refresher = SuggestIndexRefresher(PrefixIndex(enabled=True), interval=0)
+    refresher.refresh_once = AsyncMock(return_value=3)
+
+    async def scenario():
+        refresher.start()
+        await asyncio.sleep(0.05)
+        await refresher.stop()
+
+    asyncio.run(scenario())
+
+    refresher.refresh_once.assert_awaited_once()
+
+
+def test_refresh_picks_up_writes_from_other_workers(monkeypatch):
+    monkeypatch.setattr(backend, "DB_BACKEND", "memory")
+    index = _index()
+    refresher = SuggestIndexRefresher(index, interval=0)
+
+    async def scenario():
+        # Written straight to the store, as another worker would
+        async with backend.book_repository() as db:
+            for book in BOOKS[1:]:
+                await db.create_book({**book, "isbn": None})
+
+        await refresher.refresh_once()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        memory_store.clear()
+
+    assert _ids(index.suggest("anim")) == []
+    assert sorted(_ids(index.suggest("george"))) == ["2"]